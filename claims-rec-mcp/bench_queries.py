@@ -0,0 +1,147 @@
+"""Per-call latency of every tool statement, prepared vs. unprepared.
+
+Runs each statement from queries.py on a single connection, first with
+prepare=False (parse + plan every call) and then with prepare=True (plan once),
+and prints mean/p50/p95 latency in microseconds. Use --populate to add
+synthetic rows first so the numbers reflect a realistically sized table:
+
+    TEST_DB_HOST=localhost TEST_DB_PORT=1339 python bench_queries.py --populate 3000000 --iterations 2000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import psycopg
+
+import queries
+from db import conninfo
+
+# Synthetic rows that satisfy every CHECK constraint on tanzania_claims
+POPULATE = """
+    INSERT INTO tanzania_claims (
+        claim_number, patient_id, patient_first_name, patient_last_name, patient_dob, patient_gender,
+        patient_region, insurance_scheme, provider_name, provider_type, provider_region,
+        service_date, service_type, diagnosis_code, diagnosis_description, procedure_code,
+        submitted_amount, allowed_amount, claim_status, received_date
+    )
+    SELECT
+        'BENCH-' || lpad(g::text, 9, '0'),
+        'BPAT-' || (g %% 250000),
+        'First' || (g %% 997), 'Last' || (g %% 1009),
+        DATE '1950-01-01' + (g %% 25000)::int,
+        (ARRAY['M', 'F'])[1 + g %% 2],
+        (ARRAY['Dar es Salaam', 'Mwanza', 'Arusha', 'Dodoma', 'Zanzibar North', 'Zanzibar Central', 'Zanzibar South'])[1 + g %% 7],
+        (ARRAY['National Health Insurance Fund (NHIF)', 'Community Health Fund (CHF)', 'Private Insurance', 'Self-Pay'])[1 + g %% 4],
+        'Provider ' || (g %% 500),
+        (ARRAY['District Hospital', 'Health Center', 'Dispensary', 'Referral Hospital'])[1 + g %% 4],
+        (ARRAY['Dar es Salaam', 'Mwanza', 'Zanzibar North', 'Zanzibar South'])[1 + g %% 4],
+        CURRENT_DATE - (g %% 730)::int,
+        (ARRAY['Outpatient Consultation', 'Inpatient Admission', 'Laboratory Test', 'Pharmacy'])[1 + g %% 4],
+        'D' || (g %% 400),
+        (ARRAY['Malaria', 'Typhoid fever', 'Upper respiratory tract infection', 'Hypertension', 'Diabetes mellitus'])[1 + g %% 5],
+        'P' || (g %% 300),
+        1000 + (g %% 500000), 1000 + (g %% 450000),
+        (ARRAY['Pending', 'Approved', 'Approved', 'Rejected'])[1 + g %% 4],
+        CURRENT_DATE - (g %% 700)::int
+    FROM generate_series(%(start)s::bigint, %(stop)s::bigint) AS g
+    ON CONFLICT (claim_number) DO NOTHING
+"""
+
+# search_claims lookups: a misspelled patient name, a partial provider name and a diagnosis
+SEARCH_QUERIES = ["Frist12 Last345", "Provider 4", "typhoid fever"]
+
+
+def search_params(query: str) -> dict:
+    return {
+        "query": query, "status": None, "region": None, "service_date_from": None, "service_date_to": None,
+        "candidates": 1000, "limit": 10,
+    }
+
+
+SAMPLE_KEYS = """
+    SELECT claim_number, patient_id FROM tanzania_claims TABLESAMPLE SYSTEM (1) LIMIT 1000
+"""
+
+SUMMARY_FILTERS = {
+    "claim_status": None, "insurance_scheme": None, "patient_region": None, "provider_type": None,
+    "service_type": None, "month_from": None, "month_to": None, "limit": 1002,
+}
+
+
+def statements(keys):
+    claim_numbers = [key[0] for key in keys]
+    patient_ids = [key[1] for key in keys]
+    return [
+        ("list_recent_claims", queries.LIST_RECENT_CLAIMS, lambda i: {"limit": 5}),
+        ("list_old_pending_claims", queries.LIST_OLD_PENDING_CLAIMS, lambda i: {"days_old": 30, "limit": 50}),
+        ("list_claims_by_status", queries.LIST_CLAIMS_BY_STATUS, lambda i: {"status": "Pending", "limit": 50}),
+        ("list_claims_by_status_older_than", queries.LIST_CLAIMS_BY_STATUS_OLDER_THAN,
+         lambda i: {"status": "Approved", "days_old": 90, "limit": 50}),
+        ("get_claim_by_number", queries.GET_CLAIM_BY_NUMBER,
+         lambda i: {"claim_number": claim_numbers[i % len(claim_numbers)]}),
+        ("get_claim_by_patient_id", queries.GET_CLAIMS_BY_PATIENT_ID,
+         lambda i: {"patient_id": patient_ids[i % len(patient_ids)]}),
+        ("check_claim_status", queries.CHECK_CLAIM_STATUS,
+         lambda i: {"claim_number": claim_numbers[i % len(claim_numbers)]}),
+        ("summarize_claims_by_region_scheme", queries.summarize_claims_statement(("region", "scheme"), SUMMARY_FILTERS),
+         lambda i: dict(SUMMARY_FILTERS, claim_status="Pending")),
+        ("summarize_claims_by_month", queries.summarize_claims_statement(("month",), SUMMARY_FILTERS),
+         lambda i: SUMMARY_FILTERS),
+        ("search_claims", queries.SEARCH_CLAIMS, lambda i: search_params(SEARCH_QUERIES[i % len(SEARCH_QUERIES)])),
+    ]
+
+
+async def populate(conn, rows: int, chunk: int = 200000):
+    for start in range(1, rows + 1, chunk):
+        await conn.execute(POPULATE, {"start": start, "stop": min(start + chunk - 1, rows)})
+        await conn.commit()
+    await conn.execute("ANALYZE tanzania_claims")
+    await conn.commit()
+
+
+async def time_statement(conn, sql, params_for, iterations: int, prepare: bool) -> dict:
+    latencies = []
+    async with conn.cursor() as cur:
+        for i in range(iterations):
+            started = time.perf_counter()
+            await cur.execute(sql, params_for(i), prepare=prepare)
+            await cur.fetchall()
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        "mean_us": round(statistics.fmean(latencies) * 1e6),
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6),
+        "p95_us": round(latencies[int(len(latencies) * 0.95) - 1] * 1e6),
+    }
+
+
+async def run(args):
+    async with await psycopg.AsyncConnection.connect(conninfo, prepare_threshold=None) as conn:
+        if args.populate:
+            await populate(conn, args.populate)
+        keys = await (await conn.execute(SAMPLE_KEYS)).fetchall()
+        if not keys:
+            raise SystemExit("tanzania_claims is empty, use --populate")
+        await conn.commit()
+        await conn.set_autocommit(True)
+
+        results = []
+        for name, sql, params_for in statements(keys):
+            unprepared = await time_statement(conn, sql, params_for, args.iterations, prepare=False)
+            prepared = await time_statement(conn, sql, params_for, args.iterations, prepare=True)
+            results.append({"statement": name, "unprepared": unprepared, "prepared": prepared})
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--populate", type=int, default=0, help="insert this many synthetic rows first")
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Response mapping and serialization cost, and response size, per tool.
+
+Fetches each tool's rows once, then times turning them into the response with
+the compiled projection from mapping.py, serializing it with json.dumps(indent=2)
+(the old format) and with orjson compact output, and reports the size of both:
+
+    TEST_DB_HOST=localhost TEST_DB_PORT=1339 python bench_serialization.py --iterations 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import orjson
+import psycopg
+
+import mapping
+import queries
+from bench_queries import SAMPLE_KEYS
+from db import conninfo
+
+
+def cases(claim_number: str, patient_id: str):
+    page = {"limit": 100}
+    amounts = mapping.CLAIM_DETAIL.only(["financial", "status"])
+    return [
+        ("list_recent_claims", queries.LIST_RECENT_CLAIMS, page, mapping.RECENT_CLAIM),
+        ("list_old_pending_claims", queries.LIST_OLD_PENDING_CLAIMS, dict(page, days_old=30), mapping.OLD_PENDING_CLAIM),
+        ("list_claims_by_status", queries.LIST_CLAIMS_BY_STATUS, dict(page, status="Pending"), mapping.CLAIM_BY_STATUS),
+        ("get_claim_by_number", queries.GET_CLAIM_BY_NUMBER, {"claim_number": claim_number}, mapping.CLAIM_DETAIL),
+        ("get_claim_by_patient_id", queries.GET_CLAIMS_BY_PATIENT_ID, {"patient_id": patient_id}, mapping.CLAIM_DETAIL),
+        ("get_claim_by_patient_id[financial,status]", queries.get_claims_by_patient_id_statement(amounts.columns),
+         {"patient_id": patient_id}, amounts),
+        ("check_claim_status", queries.CHECK_CLAIM_STATUS, {"claim_number": claim_number}, mapping.CLAIM_STATUS),
+    ]
+
+
+def per_call_us(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - started) / iterations * 1e6, 1)
+
+
+async def run(args):
+    async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as conn:
+        keys = await (await conn.execute(SAMPLE_KEYS)).fetchall()
+        if not keys:
+            raise SystemExit("tanzania_claims is empty, use bench_queries.py --populate")
+        claim_number, patient_id = keys[0]
+
+        results = []
+        for tool, sql, params, projection in cases(claim_number, patient_id):
+            cur = await conn.execute(sql, params)
+            rows = await cur.fetchall()
+            project = projection.compile(tuple(col.name for col in cur.description))
+            response = {"success": True, "count": len(rows), "claims": [project(row) for row in rows]}
+
+            pretty = json.dumps(response, indent=2)
+            compact = orjson.dumps(response)
+            results.append({
+                "tool": tool,
+                "rows": len(rows),
+                "map_us": per_call_us(lambda: [project(row) for row in rows], args.iterations),
+                "json_indent_us": per_call_us(lambda: json.dumps(response, indent=2), args.iterations),
+                "orjson_compact_us": per_call_us(lambda: orjson.dumps(response).decode(), args.iterations),
+                "json_indent_bytes": len(pretty.encode()),
+                "orjson_compact_bytes": len(compact),
+            })
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
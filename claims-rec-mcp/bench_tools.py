@@ -0,0 +1,310 @@
+"""Latency and throughput of every MCP tool through the server's HTTP transport.
+
+Unlike loadtest.py, which calls the tool functions in-process, this drives a
+running server the way n8n does: each worker holds its own MCP session over
+streamable HTTP, so the numbers include JSON-RPC framing, argument validation
+and the transport. Each tool runs on its own for --duration seconds at every
+--concurrency level, after a warm-up, and p50/p95/p99 latency and calls/sec are
+written to a JSON file so runs can be compared:
+
+    TEST_DB_HOST=localhost TEST_DB_PORT=1339 python bench_tools.py --url http://localhost:7711/mcp --concurrency 1,8,32
+    python bench_tools.py --compare bench-results/before.json bench-results/after.json
+
+Claim numbers, patients and names for the calls are sampled from the database
+first, so lookups spread over the whole table; load it with generate_claims.py.
+approve_claim, reject_claim and bulk_update_claim_status only change claims
+from generate_claims.py (skipped if there are none, or with --read-only), and
+ingest_claims runs as a dry run.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import subprocess
+import time
+from contextlib import AsyncExitStack
+from datetime import date, datetime, timezone
+
+import orjson
+import psycopg
+from fastmcp import Client
+from psycopg.rows import dict_row
+
+from db import conninfo
+from generate_claims import CLAIM_PREFIX, COLUMNS, Generator
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench-results")
+
+SAMPLE_CLAIMS = """
+    SELECT claim_number, patient_id, patient_first_name, patient_last_name, service_date,
+           provider_name, submitted_amount, diagnosis_description
+    FROM tanzania_claims
+    WHERE claim_number LIKE %(prefix)s
+    ORDER BY random()
+    LIMIT %(limit)s
+"""
+
+TABLE_ROWS = "SELECT reltuples::bigint FROM pg_class WHERE oid = 'tanzania_claims'::regclass"
+
+STATUSES = ["Pending", "Approved", "Rejected"]
+SUMMARY_GROUPINGS = ["status", "region,scheme", "month", "provider_type,service_type"]
+MATCH_BATCH = 20
+BULK_BATCH = 50
+INGEST_BATCH = 100
+REVIEWER = "bench_tools"
+
+
+def _misspell(word: str, i: int) -> str:
+    # Swap two neighbouring letters, like an OCR or typing slip
+    if len(word) < 4:
+        return word
+    k = 1 + i % (len(word) - 2)
+    return word[:k] + word[k + 1] + word[k] + word[k + 2:]
+
+
+def _search_query(claim: dict, i: int) -> str:
+    kind = i % 3
+    if kind == 0:
+        return f"{claim['patient_first_name']} {_misspell(claim['patient_last_name'] or '', i)}"
+    if kind == 1:
+        return " ".join((claim["provider_name"] or "").split()[:2])
+    return claim["diagnosis_description"] or "malaria"
+
+
+def _extracted(claim: dict, reference: str) -> dict:
+    return {
+        "reference": reference,
+        "patient_id": claim["patient_id"],
+        "patient_name": f"{claim['patient_first_name']} {claim['patient_last_name']}",
+        "service_date": claim["service_date"].isoformat(),
+        "provider_name": claim["provider_name"],
+        "submitted_amount": float(claim["submitted_amount"]) if claim["submitted_amount"] is not None else None,
+    }
+
+
+def _ingest_batches(count: int) -> list:
+    # Numbered far past any generated claims; dry runs never write them anyway
+    rows = Generator(seed=0, as_of=date.today(), patients=10000).rows(900000001, count * INGEST_BATCH)
+    records = [
+        {name: value.isoformat() if isinstance(value, date) else value for name, value in zip(COLUMNS, row)}
+        for row in rows
+    ]
+    return [records[k:k + INGEST_BATCH] for k in range(0, len(records), INGEST_BATCH)]
+
+
+def tool_calls(claims: list, writable: list) -> dict:
+    """Arguments of the i-th call, per tool."""
+    def claim(i):
+        return claims[i % len(claims)]
+
+    def writable_claim(i):
+        return writable[i % len(writable)]["claim_number"]
+
+    ingest_batches = _ingest_batches(10)
+    calls = {
+        "list_recent_claims": lambda i: {"limit": 20},
+        "list_old_pending_claims": lambda i: {"limit": 50, "days_old": 30},
+        "list_claims_by_status": lambda i: {"status": STATUSES[i % len(STATUSES)], "limit": 50},
+        "get_claim_by_number": lambda i: {"claim_number": claim(i)["claim_number"]},
+        "get_claim_by_patient_id": lambda i: {"patient_id": claim(i)["patient_id"]},
+        "check_claim_status": lambda i: {"claim_number": claim(i)["claim_number"]},
+        "summarize_claims": lambda i: {"group_by": SUMMARY_GROUPINGS[i % len(SUMMARY_GROUPINGS)]},
+        "search_claims": lambda i: {"query": _search_query(claim(i), i)},
+        "match_extracted_claims": lambda i: {
+            "records": [_extracted(claim(i * MATCH_BATCH + k), f"bench-{i}-{k}") for k in range(MATCH_BATCH)],
+        },
+        "find_duplicate_claims": lambda i: {"limit": 50},
+        "ingest_claims": lambda i: {"records": ingest_batches[i % len(ingest_batches)], "dry_run": True},
+    }
+    if writable:
+        calls.update({
+            "approve_claim": lambda i: {"claim_number": writable_claim(i), "reviewed_by": REVIEWER},
+            "reject_claim": lambda i: {"claim_number": writable_claim(i), "reviewed_by": REVIEWER},
+            "bulk_update_claim_status": lambda i: {
+                "items": [
+                    {"claim_number": writable_claim(i * BULK_BATCH + k), "decision": "approve" if k % 4 else "reject"}
+                    for k in range(BULK_BATCH)
+                ],
+                "reviewed_by": REVIEWER,
+            },
+        })
+    return calls
+
+
+async def sample_claims(limit: int, read_only: bool):
+    async with await psycopg.AsyncConnection.connect(conninfo) as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(SAMPLE_CLAIMS, {"prefix": "%", "limit": limit})
+            claims = await cur.fetchall()
+            writable = []
+            if not read_only:
+                await cur.execute(SAMPLE_CLAIMS, {"prefix": CLAIM_PREFIX + "%", "limit": limit})
+                writable = await cur.fetchall()
+            await cur.execute(TABLE_ROWS)
+            table_rows = (await cur.fetchone())["reltuples"]
+    return claims, writable, table_rows
+
+
+def _percentile(latencies: list, q: float) -> float:
+    # Nearest rank on sorted latencies
+    return latencies[max(math.ceil(q * len(latencies)) - 1, 0)]
+
+
+def _failed(result) -> bool:
+    if result.isError:
+        return True
+    text = result.content[0].text if result.content else ""
+    return text.lstrip("{ \n").startswith('"error"')
+
+
+async def run_level(sessions: list, tool: str, arguments, concurrency: int, duration: float, warmup: float) -> dict:
+    latencies = []
+    errors = 0
+    failures = 0
+    first_error = None
+
+    async def worker(client, offset, deadline, record):
+        nonlocal errors, failures, first_error
+        i = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                result = await client.call_tool_mcp(tool, arguments(i))
+                failed = _failed(result)
+                if failed and first_error is None:
+                    first_error = result.content[0].text[:500] if result.content else "isError"
+            except Exception as e:
+                failed = True
+                if record:
+                    failures += 1
+                first_error = first_error or repr(e)[:500]
+            elapsed = time.perf_counter() - started
+            i += concurrency
+            if record:
+                latencies.append(elapsed)
+                errors += failed
+
+    for record, seconds in ((False, warmup), (True, duration)):
+        deadline = time.perf_counter() + seconds
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(sessions[k], k, deadline, record) for k in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        "tool": tool,
+        "concurrency": concurrency,
+        "calls": len(latencies),
+        "errors": errors,
+        "transport_failures": failures,
+        "calls_per_second": round(len(latencies) / wall, 1),
+    }
+    if latencies:
+        result.update({
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2),
+        })
+    if first_error:
+        result["first_error"] = first_error
+    return result
+
+
+async def run(args) -> dict:
+    claims, writable, table_rows = await sample_claims(args.keys, args.read_only)
+    if not claims:
+        raise SystemExit("tanzania_claims is empty, load it with generate_claims.py")
+    calls = tool_calls(claims, writable)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    started_at = datetime.now(timezone.utc)
+
+    async with AsyncExitStack() as stack:
+        sessions = [await stack.enter_async_context(Client(args.url)) for _ in range(max(levels))]
+        served = {tool.name for tool in await sessions[0].list_tools()}
+        selected = args.tools.split(",") if args.tools else sorted(served & set(calls))
+        unknown = [tool for tool in selected if tool not in calls or tool not in served]
+        if unknown:
+            raise SystemExit(f"cannot benchmark {', '.join(unknown)}")
+        results = []
+        for tool in selected:
+            for level in levels:
+                result = await run_level(sessions, tool, calls[tool], level, args.duration, args.warmup)
+                print(json.dumps(result))
+                results.append(result)
+
+    return {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "url": args.url,
+        "commit": subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None,
+        "table_rows": table_rows,
+        "sampled_claims": len(claims),
+        "writable_claims": len(writable),
+        "concurrency": levels,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        # Tools the server has that this run did not call, e.g. ones added since this script
+        "not_benchmarked": sorted(served - set(selected)),
+        "results": results,
+    }
+
+
+def compare(before_path: str, after_path: str) -> list:
+    """p95 and throughput of each tool and concurrency level in two result files."""
+    with open(before_path, "rb") as f:
+        before = {(r["tool"], r["concurrency"]): r for r in orjson.loads(f.read())["results"]}
+    with open(after_path, "rb") as f:
+        after = orjson.loads(f.read())["results"]
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old and new is not None else None
+
+    rows = []
+    for result in after:
+        old = before.get((result["tool"], result["concurrency"]))
+        if old is None:
+            continue
+        rows.append({
+            "tool": result["tool"],
+            "concurrency": result["concurrency"],
+            "p95_ms": [old.get("p95_ms"), result.get("p95_ms")],
+            "p95_change": change(old.get("p95_ms"), result.get("p95_ms")),
+            "calls_per_second": [old["calls_per_second"], result["calls_per_second"]],
+            "throughput_change": change(old["calls_per_second"], result["calls_per_second"]),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("MCP_URL", "http://localhost:7711/mcp"))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated levels; one MCP session per worker")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per tool and level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each measurement")
+    parser.add_argument("--tools", default="", help="comma-separated tools (default: every tool the server has)")
+    parser.add_argument("--keys", type=int, default=1000, help="claims sampled for lookups and writes")
+    parser.add_argument("--read-only", action="store_true", help="skip the tools that change claims")
+    parser.add_argument("--output", help="results file (default: bench-results/tools-<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        return
+
+    report = asyncio.run(run(args))
+    output = args.output or os.path.join(RESULTS_DIR, f"tools-{time.strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
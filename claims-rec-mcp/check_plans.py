@@ -0,0 +1,217 @@
+"""Plan-regression check for every tool statement.
+
+Runs EXPLAIN (ANALYZE, BUFFERS) for each statement in queries.py on the current
+database and fails (exit status 1) when a plan contains a sequential scan of a
+large table or a Sort that the statement is not expected to need (or one over
+more rows than expected). Writes, including the ingest upsert and the staging
+rows it reads, run inside a transaction that is rolled back. Below --min-claims
+claims the planner rightly prefers sequential scans, so the check refuses to
+run; use --populate on a test database so it sees a realistically sized table:
+
+    TEST_DB_HOST=localhost TEST_DB_PORT=1339 python check_plans.py --populate 3000000
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import sys
+
+import psycopg
+
+import queries
+from bench_queries import SAMPLE_KEYS, SEARCH_QUERIES, SUMMARY_FILTERS, populate, search_params
+from db import conninfo
+from ingest import load_columns
+
+SORT_NODES = {"Sort", "Incremental Sort"}
+
+# Sorts a statement legitimately needs, with why and the most rows it may sort
+# in this check (None: bounded by nothing an index could provide). They order a
+# statement's own input, an aggregated result or a capped candidate set, never
+# table rows it could have read in index order; a sort of more rows than the
+# bound means the plan started sorting something else.
+ALLOWED_SORTS = {
+    # A summary reads one grouping set of the rollup, bounded by the distinct values of its dimensions
+    "summarize_claims_by_region_scheme": ("orders rollup rows or the aggregated groups", 100000),
+    "summarize_claims_by_month": ("orders rollup rows or the aggregated groups", 100000),
+    "bulk_update_claim_status": ("locks the 100 input claims in claim_id order and returns input order", 100),
+    "match_candidates": ("returns the 100 input claims' candidates in input order", 10000),
+    "scan_duplicates": ("orders one 1000-claim batch's candidate pairs", 100000),
+    # The score is computed per call from the caller's thresholds, so no index can order it
+    "find_duplicate_claims": ("ranks stored pairs by computed score", None),
+    "search_claims_name": ("ranks at most 3 x 1000 candidates by computed score", 3000),
+    "search_claims_provider": ("ranks at most 3 x 1000 candidates by computed score", 3000),
+    "search_claims_text": ("ranks at most 3 x 1000 candidates by computed score", 3000),
+    "search_claims_filtered": ("ranks at most 3 x 1000 candidates by computed score", 3000),
+    # The staging table has no index; its size is the size of the load
+    "ingest_upsert": ("keeps the last staged row per claim_number", None),
+}
+
+# Small bookkeeping tables that are always read in full, by any statement
+SMALL_TABLES = {"claim_duplicate_scan", "schema_migrations"}
+
+# Tables a statement is expected to read in full, and why
+ALLOWED_SEQ_SCANS = {
+    "find_duplicate_claims": {"claim_duplicates": "every stored pair is scored against the caller's thresholds"},
+    "ingest_upsert": {"claims_staging": "every staged row is loaded"},
+}
+
+# Staged rows for the ingest upsert: sampled claims, half of them under new
+# claim numbers, so both its update and its insert path run
+STAGE_INGEST_SAMPLE = """
+    INSERT INTO claims_staging ({columns}, ingest_line)
+    SELECT {values}, row_number() OVER ()
+    FROM (SELECT * FROM tanzania_claims TABLESAMPLE SYSTEM (1) LIMIT 1000) c
+"""
+
+
+def ingest_upsert(columns: dict) -> tuple:
+    """The ingest upsert for a file carrying every input column, with its staging setup."""
+    names = list(columns)
+    create_staging, _, upsert = queries.ingest_statements(names, {name: columns[name].default for name in names})
+    values = ", ".join(
+        "CASE WHEN mod(c.claim_id, 2) = 0 THEN c.claim_number ELSE 'PLAN-' || c.claim_id END"
+        if name == "claim_number" else f"c.{name}" for name in names
+    )
+    stage = STAGE_INGEST_SAMPLE.format(columns=", ".join(names), values=values)
+    return ("ingest_upsert", upsert, None, create_staging, stage)
+
+
+def statements(keys, ingest_columns):
+    claim_number, patient_id = keys[0]
+    after = {"after_received_date": datetime.date.today() - datetime.timedelta(days=365), "after_claim_id": 0}
+    page = {"limit": 51}
+    detail = {"claim_number": claim_number}
+    update = {"claim_number": claim_number, "reviewed_by": "", "notes": "", "expected_status": "Pending"}
+    return [
+        ("list_recent_claims", queries.LIST_RECENT_CLAIMS, page),
+        ("list_recent_claims_page", queries.LIST_RECENT_CLAIMS_PAGE, dict(page, **after)),
+        ("list_old_pending_claims", queries.LIST_OLD_PENDING_CLAIMS, dict(page, days_old=30)),
+        ("list_old_pending_claims_page", queries.LIST_OLD_PENDING_CLAIMS_PAGE, dict(page, days_old=30, **after)),
+        ("list_claims_by_status", queries.LIST_CLAIMS_BY_STATUS, dict(page, status="Approved")),
+        ("list_claims_by_status_page", queries.LIST_CLAIMS_BY_STATUS_PAGE, dict(page, status="Approved", **after)),
+        ("list_claims_by_status_older_than", queries.LIST_CLAIMS_BY_STATUS_OLDER_THAN,
+         dict(page, status="Rejected", days_old=90)),
+        ("list_claims_by_status_older_than_page", queries.LIST_CLAIMS_BY_STATUS_OLDER_THAN_PAGE,
+         dict(page, status="Rejected", days_old=90, **after)),
+        ("get_claim_by_number", queries.GET_CLAIM_BY_NUMBER, detail),
+        ("get_claim_by_patient_id", queries.GET_CLAIMS_BY_PATIENT_ID, {"patient_id": patient_id}),
+        ("check_claim_status", queries.CHECK_CLAIM_STATUS, detail),
+        ("approve_claim", queries.APPROVE_CLAIM, update),
+        ("reject_claim", queries.REJECT_CLAIM, update),
+        ("bulk_update_claim_status", queries.BULK_UPDATE_CLAIM_STATUS, {
+            "claim_numbers": [key[0] for key in keys[:100]],
+            "decisions": ["Approved"] * len(keys[:100]),
+            "reviewers": [""] * len(keys[:100]),
+            "notes": [""] * len(keys[:100]),
+            "expected_statuses": ["Pending"] * len(keys[:100]),
+        }),
+        ("summarize_claims_by_region_scheme", queries.summarize_claims_statement(("region", "scheme"), SUMMARY_FILTERS),
+         dict(SUMMARY_FILTERS, claim_status="Pending")),
+        ("summarize_claims_by_month", queries.summarize_claims_statement(("month",), SUMMARY_FILTERS), SUMMARY_FILTERS),
+        ("match_candidates", queries.MATCH_CANDIDATES, {
+            "claim_numbers": [key[0] for key in keys[:100]],
+            "patient_ids": [key[1] for key in keys[:100]],
+            "dobs": [None] * len(keys[:100]),
+            "service_dates": [None] * len(keys[:100]),
+            "days": 3,
+        }),
+        # No settle delay: right after --populate every claim would still be settling, and the
+        # planner would see an empty batch instead of a full one
+        ("scan_duplicates", queries.SCAN_DUPLICATES, {"window": 7, "settle": 0, "batch_size": 1000}),
+        ("find_duplicate_claims", queries.FIND_DUPLICATE_CLAIMS, {
+            "min_score": 0.7, "window": 3, "amount_tolerance": 0.05,
+            "require_same_procedure": False, "patient_id": None, "limit": 50,
+        }),
+        *[(f"search_claims_{kind}", queries.SEARCH_CLAIMS, search_params(query))
+          for kind, query in zip(("name", "provider", "text"), SEARCH_QUERIES)],
+        ("search_claims_filtered", queries.SEARCH_CLAIMS, dict(
+            search_params(SEARCH_QUERIES[2]), status="Pending", region="Mwanza",
+            service_date_from=datetime.date.today() - datetime.timedelta(days=90),
+        )),
+        ("duplicate_scan_status", queries.DUPLICATE_SCAN_STATUS, None),
+        ingest_upsert(ingest_columns),
+    ]
+
+
+def sorted_rows(node: dict) -> float:
+    """Rows fed into a sort node across all its loops."""
+    child = (node.get("Plans") or [node])[0]
+    return child.get("Actual Rows", 0) * child.get("Actual Loops", 1)
+
+
+def violations(name: str, node: dict, found: list, row_threshold: int):
+    node_type = node["Node Type"]
+    relation = node.get("Relation Name")
+    if node_type == "Seq Scan" and relation not in SMALL_TABLES | ALLOWED_SEQ_SCANS.get(name, {}).keys():
+        # The planner may seq-scan a table that is genuinely tiny; only flag real ones
+        if node.get("Plan Rows", 0) >= row_threshold or node.get("Actual Rows", 0) >= row_threshold \
+                or relation == "tanzania_claims":
+            found.append(f"Seq Scan on {relation}")
+    if node_type in SORT_NODES:
+        allowed = ALLOWED_SORTS.get(name)
+        rows = sorted_rows(node)
+        if allowed is None or (allowed[1] is not None and rows > allowed[1]):
+            found.append(f"{node_type} of {rows:.0f} rows on {', '.join(node.get('Sort Key', []))}")
+    for child in node.get("Plans", []):
+        violations(name, child, found, row_threshold)
+    return found
+
+
+async def explain(conn, name: str, sql: str, params: dict, row_threshold: int, setup=()) -> dict:
+    async with conn.transaction(force_rollback=True):
+        for statement in setup:
+            await conn.execute(statement)
+        cur = await conn.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+        plan = (await cur.fetchone())[0][0]
+    root = plan["Plan"]
+    found = violations(name, root, [], row_threshold)
+    return {
+        "statement": name,
+        "ok": not found,
+        "violations": found,
+        "execution_ms": round(plan["Execution Time"], 3),
+        "shared_hit_blocks": root.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": root.get("Shared Read Blocks", 0),
+    }
+
+
+async def run(args):
+    async with await psycopg.AsyncConnection.connect(conninfo) as conn:
+        if args.populate:
+            await populate(conn, args.populate)
+        keys = await (await conn.execute(SAMPLE_KEYS)).fetchall()
+        ingest_columns = await load_columns(conn)
+        await conn.commit()
+        if not keys:
+            raise SystemExit("tanzania_claims is empty, use --populate")
+        claims = (await (await conn.execute("SELECT count(*) FROM tanzania_claims")).fetchone())[0]
+        await conn.commit()
+        if claims < args.min_claims:
+            raise SystemExit(
+                f"tanzania_claims has {claims} rows; plans are not representative below {args.min_claims}, use --populate"
+            )
+        return [
+            await explain(conn, name, sql, params, args.row_threshold, setup)
+            for name, sql, params, *setup in statements(keys, ingest_columns)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--populate", type=int, default=0, help="insert this many synthetic rows first")
+    parser.add_argument("--min-claims", type=int, default=300000,
+                        help="refuse to check plans on a tanzania_claims smaller than this")
+    parser.add_argument("--row-threshold", type=int, default=1000,
+                        help="sequential scans of fewer rows than this are not flagged (except on tanzania_claims)")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    failed = [result["statement"] for result in results if not result["ok"]]
+    if failed:
+        print(f"plan regressions in: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
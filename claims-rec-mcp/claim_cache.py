@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, defaultdict
+
+import psycopg
+
+cache_enabled = os.getenv("CLAIM_CACHE_ENABLED", "true").lower() == "true"
+cache_ttl = float(os.getenv("CLAIM_CACHE_TTL", "300"))
+cache_max_bytes = int(os.getenv("CLAIM_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+NOTIFY_CHANNEL = "tanzania_claims_changed"
+
+# Tools whose responses depend only on one claim_number / patient_id
+CLAIM_KEYED_TOOLS = ("get_claim_by_number", "check_claim_status")
+PATIENT_KEYED_TOOLS = ("get_claim_by_patient_id",)
+
+
+# Result handed to the waiters of a load whose leading call was cancelled
+_ABANDONED = object()
+
+
+class _Flight:
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+        self.stale = False
+
+
+class ClaimCache:
+    """Read-through cache of tool responses keyed by (tool, claim_number or patient_id, ...).
+
+    Anything after the first two key elements (e.g. the sections requested)
+    distinguishes variants of one response; invalidation drops every variant.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    dropped once the cached responses and their keys exceed `max_bytes` (UTF-8). Concurrent misses for
+    the same key share one load. Invalidation comes from the
+    tanzania_claims_changed NOTIFY channel; while the listener is not
+    connected the cache is bypassed, since changes could be missed.
+    """
+
+    def __init__(self, ttl: float = cache_ttl, max_bytes: int = cache_max_bytes, enabled: bool = cache_enabled):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.bytes = 0
+        self.listening = False
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "bypassed": 0, "invalidations": 0, "evictions": 0}
+        self._entries = OrderedDict()
+        self._variants = defaultdict(set)
+        self._flights = {}
+        self._listener = None
+
+    async def get_or_load(self, key: tuple, load, cacheable=lambda value: True):
+        if not (self.enabled and self.listening):
+            self.counters["bypassed"] += 1
+            return await load()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at, _ = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return value
+            self._drop(key)
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.counters["coalesced"] += 1
+            value = await asyncio.shield(flight.future)
+            if value is _ABANDONED:
+                # The leading call was cancelled; this one is not, so it loads again
+                return await self.get_or_load(key, load, cacheable)
+            return value
+
+        self.counters["misses"] += 1
+        flight = self._flights[key] = _Flight()
+        try:
+            value = await load()
+        except asyncio.CancelledError:
+            # Only the leader was cancelled: its waiters retry instead of sharing the cancellation
+            flight.future.set_result(_ABANDONED)
+            raise
+        except BaseException as e:
+            flight.future.set_exception(e)
+            flight.future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._flights[key]
+        flight.future.set_result(value)
+        if not flight.stale and cacheable(value):
+            self._store(key, value)
+        return value
+
+    def _store(self, key: tuple, value: str):
+        # UTF-8 size of the response and its key, so max_bytes bounds bytes rather than characters
+        size = len(value.encode()) + sum(len(str(part).encode()) for part in key)
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl, size)
+        self._variants[key[:2]].add(key)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.counters["evictions"] += 1
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+            variants = self._variants[key[:2]]
+            variants.discard(key)
+            if not variants:
+                del self._variants[key[:2]]
+
+    def invalidate(self, claim_numbers=(), patient_ids=()):
+        identities = {(tool, claim_number) for claim_number in claim_numbers if claim_number for tool in CLAIM_KEYED_TOOLS}
+        identities |= {(tool, patient_id) for patient_id in patient_ids if patient_id for tool in PATIENT_KEYED_TOOLS}
+        for identity in identities:
+            for key in list(self._variants.get(identity, ())):
+                self._drop(key)
+                self.counters["invalidations"] += 1
+        # A load already in flight may have read the old row; don't let it populate the cache
+        for key, flight in self._flights.items():
+            if key[:2] in identities:
+                flight.stale = True
+
+    def clear(self):
+        self._entries.clear()
+        self._variants.clear()
+        self.bytes = 0
+        for flight in self._flights.values():
+            flight.stale = True
+
+    def _handle_notify(self, payload: str):
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            self.clear()
+            return
+        # Truncates, and statements touching too many claims to list, drop everything
+        if change.get("truncate") or change.get("flush"):
+            self.clear()
+            return
+        # One payload per statement lists every claim and patient it touched;
+        # the single-claim fields are what the per-row trigger of 03 sends
+        self.invalidate(
+            claim_numbers=(change.get("claim_numbers") or []) + [change.get("claim_number"), change.get("old_claim_number")],
+            patient_ids=(change.get("patient_ids") or []) + [change.get("patient_id"), change.get("old_patient_id")],
+        )
+
+    async def _listen(self, conninfo: str):
+        backoff = 1.0
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    # Anything cached before LISTEN took effect may have missed a change
+                    self.clear()
+                    self.listening = True
+                    backoff = 1.0
+                    async for notify in conn.notifies():
+                        self._handle_notify(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            finally:
+                self.listening = False
+                self.clear()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def start(self, conninfo: str):
+        if self.enabled and self._listener is None:
+            self._listener = asyncio.create_task(self._listen(conninfo), name="claim-cache-listener")
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"] + self.counters["coalesced"]
+        return dict(
+            self.counters,
+            enabled=self.enabled,
+            listening=self.listening,
+            entries=len(self._entries),
+            bytes=self.bytes,
+            max_bytes=self.max_bytes,
+            hit_ratio=round((self.counters["hits"] + self.counters["coalesced"]) / lookups, 4) if lookups else None,
+        )
+
+
+claim_cache = ClaimCache()
@@ -1,5 +1,10 @@
-import psycopg
+from psycopg_pool import AsyncConnectionPool
+import asyncio
+import itertools
 import os
+import time
+
+import metrics
 
 db_name = os.getenv("TEST_DB", "test_db")
 db_user = os.getenv("TEST_DB_USER", "test")
@@ -7,18 +12,117 @@ db_password = os.getenv("TEST_DB_PASSWORD", "pass")
 db_host = os.getenv("TEST_DB_HOST", "test-db")
 db_port = os.getenv("TEST_DB_PORT", "5432")
 
-conn = psycopg.connect(f"dbname={db_name} user={db_user} password={db_password} host={db_host} port={db_port}")
-cur = conn.cursor()
+pool_min_size = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+stream_threshold = int(os.getenv("DB_STREAM_THRESHOLD", "200"))
+stream_batch_size = int(os.getenv("DB_STREAM_BATCH_SIZE", "500"))
+
+conninfo = f"dbname={db_name} user={db_user} password={db_password} host={db_host} port={db_port}"
+
+# Each call checks out its own connection and cursor; the pool validates connections
+# on checkout and keeps reconnecting in the background if the database goes away.
+# Async pools must be opened inside a running event loop, so opening is deferred.
+pool = AsyncConnectionPool(
+    conninfo,
+    min_size=pool_min_size,
+    max_size=pool_max_size,
+    timeout=pool_timeout,
+    check=AsyncConnectionPool.check_connection,
+    name="claims-rec-mcp",
+    open=False,
+)
+_open_lock = asyncio.Lock()
+_opened = False
+_cursor_ids = itertools.count()
+
+async def open_pool():
+    global _opened
+    if _opened:
+        return
+    async with _open_lock:
+        if not _opened:
+            await pool.open()
+            _opened = True
+
+# Statements are prepared server-side on first use (prepare=True) and cached per
+# connection by psycopg, so repeat calls skip parsing and planning. Pass a
+# row_factory (see mapping.py) to get response dicts instead of tuples.
+
+async def execute(query: str, params=None, prepare: bool = True, row_factory=None, fetch: bool = True, commit: bool = False):
+    """Run one statement on a pooled connection and record it in the query metrics.
+
+    Returns the rows when fetch is set, otherwise the rowcount. With commit the
+    statement's transaction is committed; otherwise it is rolled back, so a
+    read never leaves anything behind. Either way a failed statement is rolled
+    back and never leaves the connection in an aborted transaction.
+    """
+    started = time.perf_counter()
+    await open_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor(row_factory=row_factory) as cur:
+            await cur.execute(query, params, prepare=prepare)
+            result = await cur.fetchall() if fetch else cur.rowcount
+        if not commit:
+            await conn.rollback()
+    metrics.record_query(query, params, time.perf_counter() - started, len(result) if fetch else max(result, 0))
+    return result
+
+async def execute_query(query: str, params=None, prepare: bool = True, row_factory=None):
+    return await execute(query, params, prepare=prepare, row_factory=row_factory)
+
+async def execute_update(query: str, params=None, prepare: bool = True):
+    return await execute(query, params, prepare=prepare, fetch=False, commit=True)
+
+async def execute_returning(query: str, params=None, prepare: bool = True, row_factory=None):
+    """Run a write with a RETURNING clause and return its rows, committed in one transaction."""
+    return await execute(query, params, prepare=prepare, row_factory=row_factory, commit=True)
+
+async def stream_query(query: str, params=None, batch_size: int = stream_batch_size, row_factory=None):
+    """Yield rows from a server-side (named) cursor, fetching batch_size rows per round trip."""
+    # Only time spent inside the cursor counts as database time, not the consumer's work between rows
+    started = time.perf_counter()
+    db_seconds = 0.0
+    count = 0
+    try:
+        await open_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor(name=f"stream_{next(_cursor_ids)}", row_factory=row_factory) as cur:
+                cur.itersize = batch_size
+                await cur.execute(query, params)
+                rows = cur.__aiter__()
+                db_seconds = time.perf_counter() - started
+                while True:
+                    fetch_started = time.perf_counter()
+                    try:
+                        row = await rows.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        db_seconds += time.perf_counter() - fetch_started
+                    count += 1
+                    yield row
+    finally:
+        metrics.record_query(query, params, db_seconds, count)
+
+async def iter_rows(query: str, params=None, expected_rows: int = 0, row_factory=None):
+    """Yield query rows, streaming through a server-side cursor when many rows are expected.
 
-def execute_query(query: str):
-    cur.execute(query)
-    return cur.fetchall()
+    Small pages are cheaper as one prepared round trip; large ones are read in
+    fixed-size batches so memory does not grow with the result.
+    """
+    if expected_rows > stream_threshold:
+        async for row in stream_query(query, params, row_factory=row_factory):
+            yield row
+    else:
+        for row in await execute_query(query, params, row_factory=row_factory):
+            yield row
 
-def execute_update(query: str):
-    cur.execute(query)
-    conn.commit()
-    return cur.rowcount
+def pool_stats():
+    return pool.get_stats()
 
-def close_connection():
-    cur.close()
-    conn.close()
\ No newline at end of file
+async def close_connection():
+    global _opened
+    if _opened:
+        await pool.close()
+        _opened = False
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+
+import queries
+from db import execute_query, execute_returning
+
+# Incremental duplicate detection. Each scan step checks the next batch of claims
+# whose updated_at has advanced past the stored watermark, so after the first full
+# pass a run only re-examines claims that changed. A run stops after
+# scan_budget_seconds; the rest is picked up by the next run. Runs happen in a
+# background task every scan_interval_seconds, so find_duplicate_claims only reads
+# claim_duplicates and reports how far the watermark is behind.
+
+scan_window_days = int(os.getenv("DUPLICATE_WINDOW_DAYS", "7"))
+scan_batch_size = int(os.getenv("DUPLICATE_SCAN_BATCH", "5000"))
+scan_settle_seconds = int(os.getenv("DUPLICATE_SCAN_SETTLE_SECONDS", "60"))
+scan_budget_seconds = float(os.getenv("DUPLICATE_SCAN_BUDGET_SECONDS", "10"))
+scan_interval_seconds = float(os.getenv("DUPLICATE_SCAN_INTERVAL_SECONDS", "60"))
+
+
+async def scan_duplicates(budget_seconds: float = scan_budget_seconds) -> dict:
+    """Advance the duplicate scan for at most budget_seconds."""
+    started = time.perf_counter()
+    checked = upserted = removed = 0
+    watermark = None
+    complete = False
+    while time.perf_counter() - started < budget_seconds:
+        acquired, batch, pairs, dropped, advanced_to = (await execute_returning(queries.SCAN_DUPLICATES, {
+            "window": scan_window_days,
+            "settle": scan_settle_seconds,
+            "batch_size": scan_batch_size,
+        }))[0]
+        if not acquired:
+            # Another call is scanning; report what is stored so far
+            break
+        checked += batch
+        upserted += pairs
+        removed += dropped
+        watermark = advanced_to or watermark
+        if batch < scan_batch_size:
+            complete = True
+            break
+    return {
+        "claims_checked": checked,
+        "pairs_found": upserted,
+        "pairs_removed": removed,
+        "scan_complete": complete,
+        "watermark": str(watermark) if watermark else None,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def scan_status() -> dict:
+    """Where the stored watermark is, and how long the oldest unscanned claim has waited."""
+    last_updated_at, last_run_at, oldest_pending, lag_seconds = (await execute_query(queries.DUPLICATE_SCAN_STATUS))[0]
+    return {
+        "watermark": str(last_updated_at) if last_updated_at else None,
+        "last_run_at": str(last_run_at) if last_run_at else None,
+        "up_to_date": oldest_pending is None,
+        "oldest_pending": str(oldest_pending) if oldest_pending else None,
+        "lag_seconds": round(float(lag_seconds), 3) if lag_seconds is not None else 0.0,
+    }
+
+
+class DuplicateScanner:
+    """Background task advancing the duplicate scan off the request path."""
+
+    def __init__(self, interval_seconds: float = scan_interval_seconds):
+        self.interval_seconds = interval_seconds
+        self.enabled = interval_seconds > 0
+        self.last_scan = None
+        self.last_error = None
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                self.last_scan = await scan_duplicates()
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_scan = None
+                self.last_error = str(e)
+            # A run cut short by the budget carries straight on with the next one
+            if self.last_scan and self.last_scan["claims_checked"] and not self.last_scan["scan_complete"]:
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="duplicate-scanner")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+duplicate_scanner = DuplicateScanner()
@@ -0,0 +1,540 @@
+"""Deterministic synthetic tanzania_claims at production scale.
+
+Claims follow the shape of real ones: regions weighted by population, patients
+with several claims each under one insurance scheme, providers mostly in the
+patient's region and hospitals busier than dispensaries, service volume growing
+towards the present and falling off at weekends, amounts log-normal per service
+type, and statuses that depend on how long ago a claim was received (last
+week's claims are mostly still Pending). A few claims are resubmissions of the
+one before, for find_duplicate_claims.
+
+Every value is checked against the table's CHECK domains and column types
+before anything is written. The same --seed, --as-of and --patients always
+produce the same rows, whatever --commit-every is; rows stream into
+tanzania_claims through COPY:
+
+    TEST_DB_HOST=localhost TEST_DB_PORT=1339 python generate_claims.py --rows 3000000 --seed 7
+
+Claim numbers are SYN-<year>-<n>, patient ids SPAT-<n>; --replace deletes the
+synthetic claims of an earlier run first. --csv writes the rows to a file
+instead, in the format ingest.py reads.
+"""
+import argparse
+import asyncio
+import bisect
+import csv
+import functools
+import itertools
+import json
+import math
+import operator
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import psycopg
+
+from db import conninfo
+from ingest import load_columns
+
+CLAIM_PREFIX = "SYN-"
+PATIENT_PREFIX = "SPAT-"
+# Rows per independently seeded block; a run can start at any row without generating the ones before its block
+BLOCK_ROWS = 10000
+DUPLICATE_RATE = 0.004
+
+# Approximate share of the population
+REGIONS = {
+    "Dar es Salaam": 18, "Mwanza": 9, "Arusha": 6, "Dodoma": 6, "Mbeya": 6, "Morogoro": 6, "Pwani": 4,
+    "Tanga": 6, "Kilimanjaro": 5, "Manyara": 4, "Singida": 4, "Ruvuma": 4, "Rukwa": 3, "Shinyanga": 5,
+    "Tabora": 6, "Zanzibar North": 2, "Zanzibar Central": 3, "Zanzibar South": 2, "Other": 1,
+}
+ZANZIBAR = {"Zanzibar North", "Zanzibar Central", "Zanzibar South"}
+
+DISTRICTS = {
+    "Dar es Salaam": ["Ilala", "Kinondoni", "Temeke", "Ubungo", "Kigamboni"],
+    "Mwanza": ["Nyamagana", "Ilemela", "Sengerema", "Magu"],
+    "Arusha": ["Arusha City", "Meru", "Karatu", "Monduli"],
+    "Dodoma": ["Dodoma City", "Kondoa", "Mpwapwa", "Chamwino"],
+    "Mbeya": ["Mbeya City", "Rungwe", "Kyela", "Chunya"],
+    "Morogoro": ["Morogoro Municipal", "Kilosa", "Kilombero", "Mvomero"],
+    "Pwani": ["Kibaha", "Bagamoyo", "Rufiji", "Mkuranga"],
+    "Tanga": ["Tanga City", "Muheza", "Korogwe", "Lushoto"],
+    "Kilimanjaro": ["Moshi", "Hai", "Rombo", "Same"],
+    "Manyara": ["Babati", "Mbulu", "Simanjiro", "Hanang"],
+    "Singida": ["Singida Municipal", "Manyoni", "Iramba"],
+    "Ruvuma": ["Songea", "Mbinga", "Tunduru"],
+    "Rukwa": ["Sumbawanga", "Nkasi", "Kalambo"],
+    "Shinyanga": ["Shinyanga Municipal", "Kahama", "Kishapu"],
+    "Tabora": ["Tabora Municipal", "Nzega", "Urambo", "Igunga"],
+    "Zanzibar North": ["Wete", "Chake Chake", "Micheweni"],
+    "Zanzibar Central": ["Stone Town", "Zanzibar City", "Unguja Ukuu"],
+    "Zanzibar South": ["Kisiju", "Jumbi", "Makunduchi"],
+    "Other": ["Other"],
+}
+
+MALE_NAMES = [
+    "Ahmed", "Juma", "Hassan", "Mohamed", "Ali", "Rashid", "Khalid", "Said", "Omar", "Salim", "Baraka",
+    "Emmanuel", "Joseph", "John", "Daudi", "Elia", "Godfrey", "Hamisi", "Issa", "Joshua", "Kassim",
+    "Mussa", "Nassor", "Peter", "Richard", "Shabani", "Yusuf", "Abdallah", "Athumani", "Frank",
+]
+FEMALE_NAMES = [
+    "Fatuma", "Amina", "Zainab", "Mariam", "Salma", "Zahra", "Laila", "Farida", "Asha", "Neema",
+    "Rehema", "Grace", "Upendo", "Esther", "Halima", "Mwanaidi", "Subira", "Tatu", "Witness", "Joyce",
+    "Agnes", "Anna", "Elizabeth", "Happiness", "Janeth", "Mwajuma", "Rose", "Saida", "Zuhura", "Pendo",
+]
+LAST_NAMES = [
+    "Salim", "Hassan", "Khamis", "Ali", "Mohammed", "Rashid", "Omar", "Abdullah", "Ibrahim", "Seif",
+    "Ahmed", "Sultan", "Nasser", "Mbarouk", "Mwinyi", "Juma", "Mollel", "Massawe", "Kimaro", "Mushi",
+    "Mrema", "Swai", "Lyimo", "Shirima", "Mwakyusa", "Mwakalinga", "Mbwambo", "Kileo", "Nyerere",
+    "Magufuli", "Kikwete", "Mkapa", "Lema", "Laizer", "Mapunda", "Ngowi", "Temba", "Urio", "Kweka", "Makame",
+]
+
+# Scheme: (share of patients, companies, has group numbers)
+SCHEMES = {
+    "National Health Insurance Fund (NHIF)": (35, ["NHIF Tanzania"], True),
+    "Community Health Fund (CHF)": (22, ["iCHF Tanzania"], False),
+    "Self-Pay": (14, [None], False),
+    "Private Insurance": (8, ["Jubilee Insurance", "AAR Insurance", "Strategis Insurance", "Assemble Insurance"], True),
+    "Government Employee": (8, ["Government Scheme"], True),
+    "National Social Security Fund (NSSF)": (6, ["NSSF Tanzania"], True),
+    "Employer Scheme": (6, ["Government Employees Fund", "Employer Health Plan"], True),
+    "Other": (1, ["Other"], False),
+}
+
+# Provider type: (share of providers, relative claims per provider, name suffix)
+PROVIDER_TYPES = {
+    "Dispensary": (34, 1, "Dispensary"),
+    "Health Center": (24, 3, "Health Center"),
+    "Private Clinic": (16, 2, "Private Clinic"),
+    "District Hospital": (9, 6, "District Hospital"),
+    "Private Hospital": (6, 4, "Private Hospital"),
+    "Mission Hospital": (5, 4, "Mission Hospital"),
+    "Regional Hospital": (3, 10, "Regional Referral Hospital"),
+    "Referral Hospital": (1, 20, "Referral Hospital"),
+    "Other": (2, 1, "Health Services"),
+}
+ZANZIBAR_FACILITY_SHARE = 0.3
+PROVIDERS_PER_REGION_WEIGHT = 30
+
+# Service: (share of claims, claim types with weights, median amount in TZS, amount spread, procedure, diagnoses)
+# Diagnoses are (ICD-10 code, description, weight)
+MALARIA = ("B54", "Malaria", 30)
+SERVICES = {
+    "Outpatient Consultation": (34, {"Outpatient": 1}, 30000, 0.5, ("99213", "Outpatient visit, established patient"), [
+        MALARIA, ("J06.9", "Upper respiratory tract infection", 20), ("A01.0", "Typhoid fever", 8),
+        ("I10", "Essential hypertension", 10), ("E11.9", "Type 2 diabetes mellitus", 6),
+        ("K29.7", "Gastritis", 8), ("N39.0", "Urinary tract infection", 8), ("A09", "Diarrhoea and gastroenteritis", 10),
+    ]),
+    "Laboratory Test": (14, {"Outpatient": 1}, 15000, 0.6, ("87207", "Blood smear for parasites"), [
+        MALARIA, ("A01.0", "Typhoid fever", 10), ("N39.0", "Urinary tract infection", 10),
+        ("D64.9", "Anaemia", 8), ("B20", "HIV disease", 6),
+    ]),
+    "Pharmacy": (14, {"Prescription": 1}, 20000, 0.7, ("99070", "Medicines dispensed"), [
+        ("I10", "Essential hypertension", 20), ("E11.9", "Type 2 diabetes mellitus", 12), ("B20", "HIV disease", 10),
+        ("A15.0", "Pulmonary tuberculosis", 4), ("J45.9", "Asthma", 6), MALARIA,
+    ]),
+    "Inpatient Admission": (7, {"Inpatient": 1}, 350000, 0.7, ("99223", "Initial hospital care"), [
+        ("B50.9", "Severe falciparum malaria", 25), ("J18.9", "Pneumonia", 20), ("A01.0", "Typhoid fever", 8),
+        ("D64.9", "Anaemia", 8), ("I50.9", "Heart failure", 5), ("E11.9", "Type 2 diabetes mellitus", 4),
+    ]),
+    "Maternal Health": (8, {"Outpatient": 6, "Inpatient": 4}, 60000, 0.9, ("59400", "Routine obstetric care"), [
+        ("Z34.9", "Antenatal care", 50), ("O80", "Normal delivery", 30), ("O82", "Caesarean delivery", 8),
+        ("O13", "Gestational hypertension", 4),
+    ]),
+    "Child Health": (6, {"Outpatient": 1}, 25000, 0.5, ("99382", "Child health visit"), [
+        MALARIA, ("J18.9", "Pneumonia", 15), ("A09", "Diarrhoea and gastroenteritis", 20),
+        ("E46", "Malnutrition", 6), ("Z23", "Immunization", 15),
+    ]),
+    "Emergency Care": (5, {"Emergency": 1}, 150000, 0.8, ("99283", "Emergency department visit"), [
+        ("T14.9", "Injury, unspecified", 30), ("S52.5", "Fracture of lower end of radius", 10),
+        ("V89.2", "Road traffic accident", 20), ("T30.0", "Burns", 6), ("T63.0", "Snake bite", 4),
+        ("B50.9", "Severe falciparum malaria", 10),
+    ]),
+    "Radiology": (3, {"Outpatient": 1}, 60000, 0.6, ("71045", "Chest X-ray"), [
+        ("J18.9", "Pneumonia", 30), ("S52.5", "Fracture of lower end of radius", 20),
+        ("A15.0", "Pulmonary tuberculosis", 10),
+    ]),
+    "Preventive Care": (3, {"Outpatient": 1}, 10000, 0.4, ("99401", "Preventive counselling"), [
+        ("Z23", "Immunization", 40), ("Z13.9", "Screening examination", 30), ("Z30.0", "Family planning", 20),
+    ]),
+    "Surgery": (2, {"Inpatient": 1}, 1500000, 0.6, ("44950", "Surgical procedure"), [
+        ("K35.8", "Acute appendicitis", 20), ("K40.9", "Inguinal hernia", 25), ("O82", "Caesarean delivery", 20),
+        ("N40", "Benign prostatic hyperplasia", 8),
+    ]),
+    "Dental": (2, {"Dental": 1}, 40000, 0.6, ("D0150", "Dental examination"), [
+        ("K02.9", "Dental caries", 60), ("K05.1", "Gingivitis", 20),
+    ]),
+    "Mental Health": (1, {"Outpatient": 1}, 50000, 0.5, ("90834", "Psychotherapy session"), [
+        ("F32.9", "Depressive episode", 40), ("F20.9", "Schizophrenia", 15), ("G40.9", "Epilepsy", 20),
+    ]),
+    "Traditional Medicine": (0.5, {"Traditional Medicine": 1}, 15000, 0.5, ("TM01", "Traditional medicine consultation"), [
+        ("R52", "Pain, unspecified", 50),
+    ]),
+    "Other": (0.5, {"Other": 1}, 25000, 0.8, ("99499", "Other service"), [
+        ("R69", "Illness, unspecified", 50),
+    ]),
+}
+CHILD_SERVICES = {"Child Health"}
+MATERNAL_SERVICES = {"Maternal Health"}
+INPATIENT_TYPES = {"Inpatient"}
+
+OUTCOMES = {
+    "Improved": 50, "Cured": 35, "No Change": 5, "Referred": 5, "Deteriorated": 2,
+    "Left Against Advice": 1, "Died": 0.5, "Other": 1.5,
+}
+REVIEWERS = ["Dr. Mwinyi", "Dr. Massawe", "Dr. Salim", "Dr. Kimaro", "Dr. Hassan", "Dr. Lyimo", "Claims Officer"]
+REJECTION_NOTES = [
+    "Service not covered by scheme", "Missing supporting documents", "Duplicate submission",
+    "Authorization not obtained", "Amount exceeds tariff", "Member not active on service date",
+]
+
+COLUMNS = [
+    "claim_number", "patient_id", "patient_first_name", "patient_last_name", "patient_dob", "patient_gender",
+    "patient_region", "patient_district", "patient_ward", "insurance_policy_number", "insurance_scheme",
+    "insurance_company", "insurance_group_number", "insurance_card_number", "provider_national_id",
+    "provider_npi", "provider_name", "provider_type", "provider_region", "provider_district", "provider_ward",
+    "provider_tin", "service_date", "service_type", "service_description", "diagnosis_code",
+    "diagnosis_description", "procedure_code", "procedure_description", "submitted_amount", "allowed_amount",
+    "paid_amount", "patient_responsibility", "claim_status", "received_date", "processed_date", "payment_date",
+    "referral_from", "referral_reason", "treatment_outcome", "discharge_date", "length_of_stay",
+    "malaria_test_done", "hiv_status_known", "tb_screening_done", "maternal_health", "child_under_5",
+    "emergency_case", "claim_type", "authorization_number", "notes", "reviewed_by", "reviewed_date",
+]
+
+_row_values = operator.itemgetter(*COLUMNS)
+
+COPY_CLAIMS = f"COPY tanzania_claims ({', '.join(COLUMNS)}) FROM STDIN"
+DELETE_SYNTHETIC = "DELETE FROM tanzania_claims WHERE claim_number LIKE %(prefix)s"
+
+# Vocabularies that must stay inside the table's CHECK domains
+DOMAINS = {
+    "patient_gender": {"M", "F"},
+    "patient_region": set(REGIONS),
+    "provider_region": set(REGIONS),
+    "insurance_scheme": set(SCHEMES),
+    "provider_type": set(PROVIDER_TYPES) | {"Zanzibar Health Facility"},
+    "service_type": set(SERVICES),
+    "claim_type": {claim_type for service in SERVICES.values() for claim_type in service[1]},
+    "claim_status": {"Approved", "Rejected", "Pending"},
+    "treatment_outcome": set(OUTCOMES),
+}
+
+
+def _cumulative(weights) -> list:
+    return list(itertools.accumulate(weights))
+
+
+def _pick(items: list, cumulative: list, value: float):
+    """The item a uniform value in [0, 1) falls on, by weight."""
+    return items[bisect.bisect_right(cumulative, value * cumulative[-1])]
+
+
+def _mix(value: int) -> int:
+    # splitmix64: a cheap, well-spread 64-bit hash, so patients need no stored state
+    value = (value + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return value ^ (value >> 31)
+
+
+def _unit(value: int) -> float:
+    return (value >> 11) / 9007199254740992
+
+
+class Generator:
+    """Claims for one seed; row n is the same whatever rows are generated around it."""
+
+    def __init__(self, seed: int, as_of: date, patients: int, years: int = 3):
+        self.seed = seed
+        self.as_of = as_of
+        self.patients = patients
+        self.span_days = years * 365
+        self.regions = list(REGIONS)
+        self.region_weights = _cumulative(REGIONS.values())
+        self.schemes = list(SCHEMES)
+        self.scheme_weights = _cumulative(weight for weight, _, _ in SCHEMES.values())
+        self.outcomes = list(OUTCOMES)
+        self.outcome_weights = _cumulative(OUTCOMES.values())
+        self.services = {}
+        for group in ("child", "maternal", "other"):
+            names = [name for name in SERVICES if _service_allowed(name, group)]
+            self.services[group] = (names, _cumulative(SERVICES[name][0] for name in names))
+        self.claim_types = {
+            name: (list(service[1]), _cumulative(service[1].values())) for name, service in SERVICES.items()
+        }
+        self.diagnoses = {
+            name: (service[5], _cumulative(weight for _, _, weight in service[5])) for name, service in SERVICES.items()
+        }
+        self.providers = self._providers()
+        # Claims concentrate on a minority of patients, so most lookups are repeats
+        self.patient = functools.lru_cache(maxsize=1 << 16)(self._patient)
+
+    def _providers(self) -> dict:
+        rng = random.Random(f"{self.seed}:providers")
+        types = list(PROVIDER_TYPES)
+        type_weights = _cumulative(share for share, _, _ in PROVIDER_TYPES.values())
+        providers = {}
+        number = 0
+        for region, weight in REGIONS.items():
+            listed = []
+            for _ in range(weight * PROVIDERS_PER_REGION_WEIGHT):
+                number += 1
+                provider_type = _pick(types, type_weights, rng.random())
+                volume, suffix = PROVIDER_TYPES[provider_type][1:]
+                if region in ZANZIBAR and rng.random() < ZANZIBAR_FACILITY_SHARE:
+                    provider_type, volume, suffix = "Zanzibar Health Facility", 3, "Health Facility"
+                district = rng.choice(DISTRICTS[region])
+                place = district if region != "Other" else rng.choice(LAST_NAMES)
+                listed.append((volume, {
+                    "provider_national_id": f"SPID-{number:05d}",
+                    "provider_npi": f"SNPI-{number:05d}",
+                    "provider_name": f"{place} {suffix} {number}",
+                    "provider_type": provider_type,
+                    "provider_region": region,
+                    "provider_district": district,
+                    "provider_ward": f"{district} Ward {rng.randint(1, 12)}",
+                    "provider_tin": f"TIN-{number:09d}",
+                }))
+            providers[region] = ([provider for _, provider in listed], _cumulative(volume for volume, _ in listed))
+        return providers
+
+    def _patient(self, number: int) -> dict:
+        """Attributes of patient `number`, derived from a hash of it rather than stored."""
+        h1 = _mix(self.seed * 1000003 + number)
+        h2 = _mix(h1)
+        gender = "F" if h1 & 1 else "M"
+        first_names = FEMALE_NAMES if gender == "F" else MALE_NAMES
+        # Claimants skew young: median age about 25
+        age_days = int(80 * 365 * _unit(h2) ** 1.6)
+        region = _pick(self.regions, self.region_weights, _unit(h1))
+        district = DISTRICTS[region][(h2 >> 8) % len(DISTRICTS[region])]
+        scheme = _pick(self.schemes, self.scheme_weights, _unit(_mix(h2)))
+        companies, grouped = SCHEMES[scheme][1:]
+        insured = scheme != "Self-Pay"
+        return {
+            "patient_id": f"{PATIENT_PREFIX}{number:08d}",
+            "patient_first_name": first_names[(h1 >> 8) % len(first_names)],
+            "patient_last_name": LAST_NAMES[(h1 >> 20) % len(LAST_NAMES)],
+            "patient_dob": self.as_of - timedelta(days=age_days),
+            "patient_gender": gender,
+            "patient_region": region,
+            "patient_district": district,
+            "patient_ward": f"{district} Ward {1 + (h2 >> 16) % 12}",
+            "insurance_policy_number": f"POL-{number:08d}" if insured else None,
+            "insurance_scheme": scheme,
+            "insurance_company": companies[(h2 >> 24) % len(companies)],
+            "insurance_group_number": f"GRP-{(h2 >> 32) % 5000:05d}" if grouped else None,
+            "insurance_card_number": f"CARD-{number:08d}" if insured else None,
+        }
+
+    def _service_date(self, rng, dob: date) -> date:
+        # Volume grows linearly towards as_of; most weekend visits move to Friday or Monday
+        days_ago = int(self.span_days * (1 - math.sqrt(rng.random())))
+        service_date = self.as_of - timedelta(days=days_ago)
+        weekday = service_date.weekday()
+        if weekday >= 5 and rng.random() < 0.6:
+            service_date += timedelta(days=-1 if weekday == 5 else 1)
+            service_date = min(service_date, self.as_of)
+        return max(service_date, dob)
+
+    def _decide(self, rng, row: dict, duplicate: bool):
+        received = row["received_date"]
+        waiting = (self.as_of - received).days
+        pending_share = 0.85 if waiting < 7 else 0.5 if waiting < 30 else 0.15 if waiting < 90 else 0.02
+        submitted = row["submitted_amount"]
+        if rng.random() < pending_share:
+            row.update(claim_status="Pending", allowed_amount=None, paid_amount=None, patient_responsibility=None,
+                       processed_date=None, payment_date=None, reviewed_by=None, reviewed_date=None, notes=None)
+            return
+        processed = received + timedelta(days=min(int(rng.expovariate(1 / 10)), waiting))
+        rejected_share = 0.2 if row["provider_type"] in ("Private Clinic", "Private Hospital") else 0.08
+        row.update(processed_date=processed, reviewed_by=rng.choice(REVIEWERS), reviewed_date=processed)
+        if duplicate or rng.random() < rejected_share:
+            row.update(
+                claim_status="Rejected", allowed_amount=0, paid_amount=0, patient_responsibility=submitted,
+                payment_date=None, notes="Duplicate submission" if duplicate else rng.choice(REJECTION_NOTES),
+            )
+            return
+        allowed = round(submitted * rng.uniform(0.75, 1.0), -2)
+        payment = processed + timedelta(days=rng.randint(3, 30))
+        paid = payment <= self.as_of
+        row.update(
+            claim_status="Approved", allowed_amount=allowed, paid_amount=allowed if paid else None,
+            patient_responsibility=submitted - allowed, payment_date=payment if paid else None, notes=None,
+        )
+
+    def _claim(self, rng, number: int, patient: dict) -> dict:
+        service_date = self._service_date(rng, patient["patient_dob"])
+        age = (service_date - patient["patient_dob"]).days / 365.25
+        group = "child" if age < 5 else "maternal" if patient["patient_gender"] == "F" and 15 <= age < 50 else "other"
+        service_type = _pick(*self.services[group], rng.random())
+        _, _, median, spread, procedure, _ = SERVICES[service_type]
+        claim_type = _pick(*self.claim_types[service_type], rng.random())
+        code, diagnosis, _ = _pick(*self.diagnoses[service_type], rng.random())
+
+        region = patient["patient_region"] if rng.random() < 0.85 else _pick(self.regions, self.region_weights, rng.random())
+        provider = _pick(*self.providers[region], rng.random())
+
+        row = dict(patient)
+        row.update(provider)
+        inpatient = claim_type in INPATIENT_TYPES
+        stay = min(1 + int(rng.expovariate(1 / 3)), 60) if inpatient else None
+        referred = provider["provider_type"] in ("Regional Hospital", "Referral Hospital") and rng.random() < 0.4
+        referrer = _pick(*self.providers[region], rng.random()) if referred else None
+        row.update({
+            "claim_number": f"{CLAIM_PREFIX}{service_date.year}-{number:09d}",
+            "service_date": service_date,
+            "service_type": service_type,
+            "service_description": f"{service_type}: {diagnosis}",
+            "diagnosis_code": code,
+            "diagnosis_description": diagnosis,
+            "procedure_code": procedure[0],
+            "procedure_description": procedure[1],
+            "submitted_amount": max(round(median * rng.lognormvariate(0, spread), -2), 1000),
+            "received_date": min(service_date + timedelta(days=min(int(rng.expovariate(1 / 6)), 90)), self.as_of),
+            "referral_from": referrer["provider_name"] if referrer else None,
+            "referral_reason": "Specialist care" if referrer else None,
+            "treatment_outcome": _pick(self.outcomes, self.outcome_weights, rng.random()) if rng.random() < 0.7 else None,
+            "discharge_date": service_date + timedelta(days=stay) if inpatient else None,
+            "length_of_stay": stay,
+            "malaria_test_done": code in ("B54", "B50.9") or rng.random() < 0.25,
+            "hiv_status_known": code == "B20" or rng.random() < 0.6,
+            "tb_screening_done": code == "A15.0" or rng.random() < 0.15,
+            "maternal_health": service_type in MATERNAL_SERVICES,
+            "child_under_5": age < 5,
+            "emergency_case": claim_type == "Emergency",
+            "claim_type": claim_type,
+            "authorization_number": f"AUTH-{number:09d}" if inpatient or service_type == "Surgery" else None,
+        })
+        return row
+
+    def _resubmission(self, rng, number: int, previous: dict) -> dict:
+        row = dict(previous)
+        service_date = min(previous["service_date"] + timedelta(days=rng.randint(0, 1)), self.as_of)
+        row.update({
+            "claim_number": f"{CLAIM_PREFIX}{service_date.year}-{number:09d}",
+            "service_date": service_date,
+            "received_date": min(previous["received_date"] + timedelta(days=rng.randint(1, 20)), self.as_of),
+            "authorization_number": f"AUTH-{number:09d}" if previous["authorization_number"] else None,
+        })
+        return row
+
+    def rows(self, start: int, count: int):
+        """Yield rows start .. start + count - 1 (numbered from 1) as tuples in COLUMNS order."""
+        stop = start + count
+        block = (start - 1) // BLOCK_ROWS
+        while True:
+            first = block * BLOCK_ROWS + 1
+            if first >= stop:
+                return
+            rng = random.Random(f"{self.seed}:{block}")
+            previous = None
+            for number in range(first, min(first + BLOCK_ROWS, stop)):
+                duplicate = previous is not None and rng.random() < DUPLICATE_RATE
+                if duplicate:
+                    row = self._resubmission(rng, number, previous)
+                else:
+                    # Some patients claim far more often than others
+                    row = self._claim(rng, number, self.patient(int(self.patients * rng.random() ** 1.5)))
+                self._decide(rng, row, duplicate)
+                previous = row
+                if number >= start:
+                    yield _row_values(row)
+            block += 1
+
+
+def _service_allowed(service_type: str, group: str) -> bool:
+    if service_type in CHILD_SERVICES:
+        return group == "child"
+    if service_type in MATERNAL_SERVICES:
+        return group == "maternal"
+    return True
+
+
+def check_schema(columns: dict, sample) -> list:
+    """Problems with generated values against the table: domains not allowed, or sample rows it would reject."""
+    problems = []
+    for name, values in DOMAINS.items():
+        domain = columns[name].domain
+        if domain is not None and not values <= domain:
+            problems.append(f"{name}: {sorted(values - domain)} not allowed")
+    for row in sample:
+        for name, value in zip(COLUMNS, row):
+            try:
+                columns[name].convert(value)
+            except ValueError as e:
+                problems.append(f"{row[0]} {name}: {e}")
+    return problems
+
+
+def write_csv(generator: Generator, path: str, start: int, rows: int):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(generator.rows(start, rows))
+
+
+async def load(generator: Generator, start: int, rows: int, commit_every: int, replace: bool) -> dict:
+    async with await psycopg.AsyncConnection.connect(conninfo) as conn:
+        problems = check_schema(await load_columns(conn), generator.rows(start, min(rows, 1000)))
+        if problems:
+            raise SystemExit("generated claims do not fit tanzania_claims:\n  " + "\n  ".join(problems[:20]))
+        await conn.commit()
+        if replace:
+            await conn.execute(DELETE_SYNTHETIC, {"prefix": CLAIM_PREFIX + "%"})
+            await conn.commit()
+
+        started = time.perf_counter()
+        loaded = 0
+        generated = generator.rows(start, rows)
+        async with conn.cursor() as cur:
+            while loaded < rows:
+                batch = min(commit_every, rows - loaded)
+                async with cur.copy(COPY_CLAIMS) as copy:
+                    for row in itertools.islice(generated, batch):
+                        await copy.write_row(row)
+                await conn.commit()
+                loaded += batch
+                elapsed = time.perf_counter() - started
+                print(f"{loaded}/{rows} rows, {loaded / elapsed:.0f} rows/s", file=sys.stderr)
+            copied = time.perf_counter()
+            await cur.execute("ANALYZE tanzania_claims")
+            await conn.commit()
+        finished = time.perf_counter()
+    return {
+        "rows": loaded,
+        "copy_seconds": round(copied - started, 1),
+        "analyze_seconds": round(finished - copied, 1),
+        "rows_per_second": round(loaded / (copied - started), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--as-of", type=date.fromisoformat, default=date.today(),
+                        help="the generated 'today', YYYY-MM-DD; pin it to reproduce a run exactly (default: today)")
+    parser.add_argument("--patients", type=int, default=250000, help="distinct patients the claims belong to")
+    parser.add_argument("--years", type=int, default=3, help="span of service dates before --as-of")
+    parser.add_argument("--start", type=int, default=1, help="number of the first claim, to append to an earlier run")
+    parser.add_argument("--commit-every", type=int, default=100000, help="rows per COPY transaction")
+    parser.add_argument("--replace", action="store_true", help="delete earlier synthetic claims first")
+    parser.add_argument("--csv", help="write the rows to this CSV file instead of the database")
+    args = parser.parse_args()
+
+    generator = Generator(args.seed, args.as_of, args.patients, args.years)
+    report = {"seed": args.seed, "as_of": args.as_of.isoformat(), "patients": args.patients, "start": args.start}
+    if args.csv:
+        started = time.perf_counter()
+        write_csv(generator, args.csv, args.start, args.rows)
+        report.update(rows=args.rows, csv=args.csv, seconds=round(time.perf_counter() - started, 1))
+    else:
+        report.update(asyncio.run(load(generator, args.start, args.rows, args.commit_every, args.replace)))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Bulk-load claims from CSV or JSONL into tanzania_claims.
+
+Records are validated against the table's own column types and CHECK domains
+before they reach the database, so a bad row is written to a rejection file
+instead of aborting the load. Valid rows stream through COPY into a temporary
+staging table and are then upserted on claim_number in one statement. Memory
+stays flat regardless of file size:
+
+    TEST_DB_HOST=localhost TEST_DB_PORT=1339 python ingest.py submissions/2024-05.csv
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import re
+import time
+import uuid
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+import metrics
+import queries
+from db import open_pool, pool
+
+ingest_dir = os.path.abspath(os.getenv("INGEST_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest")))
+rejects_dir = os.path.abspath(os.getenv("INGEST_REJECTS_DIR", os.path.join(ingest_dir, "rejects")))
+
+# Maintained by the database, never taken from input
+SERVER_COLUMNS = {"claim_id", "created_at", "updated_at"}
+
+# pg_get_constraintdef renders `x IN ('a', 'b')` as
+# ((x)::text = ANY ((ARRAY['a'::character varying, 'b'::character varying])::text[]))
+_DOMAIN_COLUMN = re.compile(r"^CHECK \(\(\(?(\w+)\)?(?:::\w+(?: \w+)*)? = ANY")
+_DOMAIN_VALUE = re.compile(r"'((?:[^']|'')*)'")
+
+_TRUE = {"true", "t", "yes", "y", "1"}
+_FALSE = {"false", "f", "no", "n", "0"}
+
+
+class IngestError(ValueError):
+    pass
+
+
+class Column:
+    """Validation and conversion for one tanzania_claims column."""
+
+    def __init__(self, name, data_type, max_length, precision, scale, required, default):
+        self.name = name
+        self.data_type = data_type
+        self.max_length = max_length
+        self.integer_digits = precision - scale if precision and scale is not None else None
+        self.required = required
+        self.default = default
+        self.domain = None
+
+    def convert(self, value):
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            if self.required:
+                raise ValueError("is required")
+            return None
+        if self.domain is not None and value not in self.domain:
+            raise ValueError(f"{value!r} is not one of the allowed values")
+        if self.data_type in ("character varying", "text", "character"):
+            value = str(value)
+            if self.max_length and len(value) > self.max_length:
+                raise ValueError(f"is longer than {self.max_length} characters")
+            return value
+        if self.data_type == "date":
+            try:
+                return value if isinstance(value, date) else date.fromisoformat(str(value))
+            except ValueError:
+                raise ValueError(f"{value!r} is not a YYYY-MM-DD date")
+        if self.data_type == "integer":
+            if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+                raise ValueError(f"{value!r} is not a whole number")
+            try:
+                return int(value)
+            except ValueError:
+                raise ValueError(f"{value!r} is not a whole number")
+        if self.data_type == "numeric":
+            try:
+                number = Decimal(str(value))
+            except InvalidOperation:
+                raise ValueError(f"{value!r} is not a number")
+            if not number.is_finite() or (self.integer_digits is not None and abs(number) >= 10 ** self.integer_digits):
+                raise ValueError(f"{value!r} is out of range")
+            return number
+        if self.data_type == "boolean":
+            if isinstance(value, bool):
+                return value
+            text = str(value).lower()
+            if text in _TRUE:
+                return True
+            if text in _FALSE:
+                return False
+            raise ValueError(f"{value!r} is not true or false")
+        return value
+
+
+async def load_columns(conn) -> dict:
+    """Columns accepted from input, with the CHECK domains read from the table itself."""
+    columns = {}
+    for row in await (await conn.execute(queries.INGEST_TABLE_COLUMNS)).fetchall():
+        if row[0] not in SERVER_COLUMNS:
+            columns[row[0]] = Column(*row)
+    for (definition,) in await (await conn.execute(queries.INGEST_CHECK_CONSTRAINTS)).fetchall():
+        match = _DOMAIN_COLUMN.match(definition)
+        if match and match.group(1) in columns:
+            columns[match.group(1)].domain = {value.replace("''", "'") for value in _DOMAIN_VALUE.findall(definition)}
+    return columns
+
+
+def read_records(path: str, file_format: str = ""):
+    """Yield (line number, record dict) from a CSV or JSONL file, one at a time."""
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            # line 1 is the header
+            for line, record in enumerate(csv.DictReader(f), start=2):
+                yield line, record
+        else:
+            for line, text in enumerate(f, start=1):
+                if text.strip():
+                    try:
+                        yield line, json.loads(text)
+                    except ValueError as e:
+                        yield line, e
+
+
+def resolve_path(path: str) -> str:
+    """A file under INGEST_DIR; anything outside it, including through a symlink, is refused."""
+    root = os.path.realpath(ingest_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([resolved, root]) != root:
+        raise IngestError(f"{path} is outside the ingest directory")
+    if not os.path.isfile(resolved):
+        raise IngestError(f"{path} does not exist in the ingest directory")
+    return resolved
+
+
+def _validate(columns: dict, names: list, record):
+    """The converted row for COPY, or the list of problems with the record."""
+    if not isinstance(record, dict):
+        return None, [f"unreadable record: {record}"]
+    row, errors = [], []
+    for name in names:
+        try:
+            row.append(columns[name].convert(record.get(name)))
+        except ValueError as e:
+            errors.append(f"{name} {e}")
+    return row, errors
+
+
+async def ingest(records, source: str = "records", dry_run: bool = False) -> dict:
+    """Validate, COPY and upsert (line, record) pairs; returns counts, rates and the rejection file."""
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        raise IngestError("input contains no records")
+    if not isinstance(first[1], dict):
+        raise IngestError(f"the first record could not be read: {first[1]}")
+    await open_pool()
+    started = time.perf_counter()
+    # Unique per call: inline ingests all share the source name "records"
+    rejects_path = os.path.join(
+        rejects_dir, f"{os.path.basename(source)}.{time.strftime('%Y%m%dT%H%M%S')}.{uuid.uuid4().hex[:8]}.rejects.jsonl"
+    )
+    rejects = None
+    received = rejected = inserted = updated = 0
+
+    async with pool.connection() as conn:
+        columns = await load_columns(conn)
+        # The first record fixes the loaded columns; columns it lacks keep their table defaults
+        names = [name for name in first[1] if name in columns]
+        ignored = [name for name in first[1] if name not in columns]
+        missing = [name for name, column in columns.items() if column.required and name not in names]
+        if missing:
+            raise IngestError(f"input has no {', '.join(missing)} column")
+
+        create_staging, copy_staging, upsert = queries.ingest_statements(names, {name: columns[name].default for name in names})
+        await conn.execute(create_staging)
+        async with conn.cursor() as cur:
+            try:
+                async with cur.copy(copy_staging) as copy:
+                    for line, record in itertools.chain([first], records):
+                        received += 1
+                        row, errors = _validate(columns, names, record)
+                        if errors:
+                            rejected += 1
+                            if rejects is None:
+                                # Opened on the first reject, so clean loads leave no file behind
+                                os.makedirs(rejects_dir, exist_ok=True)
+                                rejects = open(rejects_path, "w", encoding="utf-8")
+                            rejects.write(json.dumps({
+                                "line": line,
+                                "claim_number": record.get("claim_number") if isinstance(record, dict) else None,
+                                "errors": errors,
+                                "record": record if isinstance(record, dict) else None,
+                            }, default=str) + "\n")
+                            continue
+                        row.append(line)
+                        await copy.write_row(row)
+            except BaseException:
+                if rejects is not None:
+                    rejects.close()
+                    os.remove(rejects_path)
+                raise
+            if rejects is not None:
+                rejects.close()
+            copied = time.perf_counter()
+
+            if dry_run:
+                await conn.rollback()
+            else:
+                await cur.execute(upsert)
+                inserted, updated = await cur.fetchone()
+        finished = time.perf_counter()
+    if not dry_run:
+        metrics.record_query(upsert, None, finished - copied, inserted + updated)
+
+    valid = received - rejected
+    return {
+        "source": source,
+        "dry_run": dry_run,
+        "received": received,
+        "valid": valid,
+        "rejected": rejected,
+        "inserted": inserted,
+        "updated": updated,
+        # later rows win over earlier ones with the same claim_number
+        "superseded_in_input": 0 if dry_run else valid - inserted - updated,
+        "ignored_columns": ignored,
+        "rejects_file": rejects_path if rejected else None,
+        "validate_copy_seconds": round(copied - started, 3),
+        "upsert_seconds": round(finished - copied, 3),
+        "rows_per_second": round(received / (finished - started), 1),
+    }
+
+
+async def ingest_file(path: str, file_format: str = "", dry_run: bool = False) -> dict:
+    return await ingest(read_records(path, file_format), source=path, dry_run=dry_run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="", help="default: from the file extension")
+    parser.add_argument("--dry-run", action="store_true", help="validate and stage, but do not write claims")
+    args = parser.parse_args()
+
+    async def run():
+        from db import close_connection
+        try:
+            return await ingest_file(args.path, args.format, args.dry_run)
+        finally:
+            await close_connection()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Concurrent tool-call load test against the claims database.
+
+Calls the MCP tool functions directly as concurrent asyncio tasks (no HTTP) and
+reports throughput and latency at each concurrency level. Run it on two checkouts
+to compare before/after a change to db.py:
+
+    TEST_DB_HOST=localhost TEST_DB_PORT=1339 python loadtest.py --concurrency 1,4,16 --duration 10
+
+--scenario approvals toggles a few hot claims between Approved and Rejected
+with expected_status set, to measure approvals/sec under row contention. It
+modifies those claims, so only run it against a test database.
+
+--cache starts the claim cache listener first, so repeated lookups are served
+from the cache as they are by the running server, and adds its stats per level.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import server
+from claim_cache import claim_cache
+from db import close_connection, conninfo
+
+READ_CALLS = [
+    ("list_recent_claims", {"limit": 5}),
+    ("list_claims_by_status", {"status": "Pending", "limit": 10}),
+    ("get_claim_by_number", {"claim_number": "ZNB-2024-001"}),
+    ("get_claim_by_patient_id", {"patient_id": "PAT-001"}),
+    ("check_claim_status", {"claim_number": "ZNB-2024-002"}),
+]
+
+
+def approval_calls(hot_claims: list) -> list:
+    calls = []
+    for claim_number in hot_claims:
+        calls.append(("approve_claim", {"claim_number": claim_number, "reviewed_by": "loadtest", "expected_status": "Rejected"}))
+        calls.append(("reject_claim", {"claim_number": claim_number, "reviewed_by": "loadtest", "expected_status": "Approved"}))
+    return calls
+
+
+def _callable(name):
+    tool = getattr(server, name)
+    return getattr(tool, "fn", tool)
+
+
+async def run_level(calls: list, concurrency: int, duration: float) -> dict:
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = 0
+    unsuccessful = 0
+
+    async def worker(offset):
+        nonlocal errors, unsuccessful
+        i = offset
+        while time.perf_counter() < deadline:
+            name, kwargs = calls[i % len(calls)]
+            i += 1
+            started = time.perf_counter()
+            response = json.loads(await _callable(name)(**kwargs))
+            latencies.append(time.perf_counter() - started)
+            if "error" in response:
+                errors += 1
+            elif response.get("success") is False:
+                unsuccessful += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        "concurrency": concurrency,
+        "calls": len(latencies),
+        "errors": errors,
+        "unsuccessful": unsuccessful,
+        "calls_per_second": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else None,
+    }
+    if claim_cache.listening:
+        result["cache"] = claim_cache.stats()
+    return result
+
+
+async def run(calls: list, levels: list, duration: float, cache: bool) -> list:
+    try:
+        if cache:
+            claim_cache.start(conninfo)
+            while not claim_cache.listening:
+                await asyncio.sleep(0.05)
+        return [await run_level(calls, level, duration) for level in levels]
+    finally:
+        await claim_cache.stop()
+        await close_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--scenario", choices=["reads", "approvals"], default="reads")
+    parser.add_argument("--hot-claims", default="ZNB-2024-001,ZNB-2024-003",
+                        help="claims contended for in the approvals scenario")
+    parser.add_argument("--cache", action="store_true", help="serve lookups through the claim cache")
+    args = parser.parse_args()
+
+    calls = READ_CALLS if args.scenario == "reads" else approval_calls(args.hot_claims.split(","))
+    levels = [int(level) for level in args.concurrency.split(",")]
+    print(json.dumps(asyncio.run(run(calls, levels, args.duration, args.cache)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
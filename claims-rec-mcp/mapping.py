@@ -0,0 +1,289 @@
+import os
+
+import orjson
+
+# Tool responses are declared once as a nested dict of Fields. A Projection is a
+# psycopg row factory: for each result shape it compiles the declaration into a
+# single function that unpacks the row tuple and builds the nested dict, so no
+# per-row lookups or per-field calls remain on the hot path.
+
+pretty_json = os.getenv("MCP_JSON_PRETTY", "false").lower() == "true"
+_json_options = orjson.OPT_INDENT_2 if pretty_json else 0
+
+
+def dumps(obj) -> str:
+    """Serialize a tool response; compact unless MCP_JSON_PRETTY=true."""
+    return orjson.dumps(obj, option=_json_options).decode()
+
+
+class Field:
+    """One response value. `expression` is Python source with {0}, {1}... standing for `columns`."""
+
+    def __init__(self, expression: str, *columns: str):
+        self.expression = expression
+        self.columns = columns
+
+
+def column(name: str) -> Field:
+    return Field("{0}", name)
+
+
+def date(name: str) -> Field:
+    return Field("(str({0}) if {0} else None)", name)
+
+
+def amount(name: str) -> Field:
+    return Field("(float({0}) if {0} else 0)", name)
+
+
+def full_name(first: str, last: str) -> Field:
+    return Field('"%s %s" % ({0}, {1})', first, last)
+
+
+class Projection:
+    def __init__(self, name: str, shape: dict):
+        self.name = name
+        self.shape = shape
+        self.columns = self._columns(shape)
+        self._compiled = {}
+        self._subsets = {}
+
+    @property
+    def sections(self) -> list:
+        """Top-level keys holding nested objects; plain top-level fields are always included."""
+        return [key for key, spec in self.shape.items() if isinstance(spec, dict)]
+
+    def only(self, sections) -> "Projection":
+        """The projection restricted to `sections` (in declaration order), reused across calls."""
+        wanted = frozenset(sections)
+        unknown = wanted - set(self.sections)
+        if unknown:
+            raise ValueError(f"Unknown sections {', '.join(sorted(unknown))}; use {', '.join(self.sections)}")
+        subset = self._subsets.get(wanted)
+        if subset is None:
+            shape = {key: spec for key, spec in self.shape.items() if not isinstance(spec, dict) or key in wanted}
+            names = [key for key in self.sections if key in wanted]
+            subset = self._subsets[wanted] = Projection(f"{self.name}[{','.join(names)}]", shape)
+        return subset
+
+    @staticmethod
+    def _columns(shape: dict) -> list:
+        """Every column a shape reads, in declaration order."""
+        seen = {}
+
+        def walk(shape):
+            for spec in shape.values():
+                if isinstance(spec, dict):
+                    walk(spec)
+                else:
+                    seen.update(dict.fromkeys(spec.columns))
+
+        walk(shape)
+        return list(seen)
+
+    def compile(self, names: tuple):
+        """Build the row -> dict function for a result with these column names."""
+        index = {name: i for i, name in enumerate(names)}
+
+        def render(shape):
+            items = []
+            for key, spec in shape.items():
+                if isinstance(spec, dict):
+                    value = render(spec)
+                else:
+                    missing = [name for name in spec.columns if name not in index]
+                    if missing:
+                        raise KeyError(f"{self.name}: result has no column {', '.join(missing)}")
+                    value = spec.expression.format(*(f"c{index[name]}" for name in spec.columns))
+                items.append(f"{key!r}: {value}")
+            return "{" + ", ".join(items) + "}"
+
+        unpack = "".join(f"c{i}, " for i in range(len(names)))
+        source = f"def project(row):\n    {unpack}= row\n    return {render(self.shape)}\n"
+        namespace = {}
+        exec(compile(source, f"<projection {self.name}>", "exec"), namespace)
+        return namespace["project"]
+
+    def __call__(self, cursor):
+        # psycopg row factory protocol: called once per result, returns the row maker
+        if cursor.description is None:
+            return tuple
+        names = tuple(col.name for col in cursor.description)
+        project = self._compiled.get(names)
+        if project is None:
+            project = self._compiled[names] = self.compile(names)
+        return project
+
+
+_LISTED_CLAIM = {
+    "claim_id": column("claim_id"),
+    "claim_number": column("claim_number"),
+    "patient_name": full_name("patient_first_name", "patient_last_name"),
+    "service_date": date("service_date"),
+    "service_type": column("service_type"),
+    "submitted_amount": amount("submitted_amount"),
+    "claim_status": column("claim_status"),
+    "received_date": date("received_date"),
+}
+
+RECENT_CLAIM = Projection("recent_claim", _LISTED_CLAIM)
+
+OLD_PENDING_CLAIM = Projection("old_pending_claim", {
+    **_LISTED_CLAIM,
+    "days_pending": column("days_pending"),
+})
+
+CLAIM_BY_STATUS = Projection("claim_by_status", {
+    **_LISTED_CLAIM,
+    "processed_date": date("processed_date"),
+    "payment_date": date("payment_date"),
+    "days_since_received": column("days_since_received"),
+})
+
+CLAIM_DETAIL = Projection("claim_detail", {
+    "claim_id": column("claim_id"),
+    "claim_number": column("claim_number"),
+    "patient": {
+        "patient_id": column("patient_id"),
+        "name": full_name("patient_first_name", "patient_last_name"),
+        "dob": date("patient_dob"),
+        "gender": column("patient_gender"),
+        "region": column("patient_region"),
+        "district": column("patient_district"),
+        "ward": column("patient_ward"),
+    },
+    "insurance": {
+        "policy_number": column("insurance_policy_number"),
+        "scheme": column("insurance_scheme"),
+        "company": column("insurance_company"),
+    },
+    "provider": {
+        "name": column("provider_name"),
+        "type": column("provider_type"),
+        "region": column("provider_region"),
+    },
+    "service": {
+        "date": date("service_date"),
+        "type": column("service_type"),
+        "description": column("service_description"),
+    },
+    "diagnosis": {
+        "code": column("diagnosis_code"),
+        "description": column("diagnosis_description"),
+    },
+    "procedure": {
+        "code": column("procedure_code"),
+        "description": column("procedure_description"),
+    },
+    "financial": {
+        "submitted_amount": amount("submitted_amount"),
+        "allowed_amount": amount("allowed_amount"),
+        "paid_amount": amount("paid_amount"),
+        "patient_responsibility": amount("patient_responsibility"),
+    },
+    "status": {
+        "claim_status": column("claim_status"),
+        "received_date": date("received_date"),
+        "processed_date": date("processed_date"),
+        "payment_date": date("payment_date"),
+    },
+    "clinical_details": {
+        "referral_from": column("referral_from"),
+        "referral_reason": column("referral_reason"),
+        "treatment_outcome": column("treatment_outcome"),
+        "discharge_date": date("discharge_date"),
+        "length_of_stay": column("length_of_stay"),
+    },
+    "health_indicators": {
+        "malaria_test_done": column("malaria_test_done"),
+        "hiv_status_known": column("hiv_status_known"),
+        "tb_screening_done": column("tb_screening_done"),
+        "maternal_health": column("maternal_health"),
+        "child_under_5": column("child_under_5"),
+        "emergency_case": column("emergency_case"),
+    },
+    "additional": {
+        "claim_type": column("claim_type"),
+        "authorization_number": column("authorization_number"),
+        "created_at": date("created_at"),
+        "updated_at": date("updated_at"),
+        "notes": column("notes"),
+        "reviewed_by": column("reviewed_by"),
+        "reviewed_date": date("reviewed_date"),
+    },
+})
+
+# Sections dropped first when a detail response has to fit a max_bytes budget
+CLAIM_DETAIL_TRIM_ORDER = [
+    "health_indicators", "clinical_details", "additional", "procedure", "diagnosis",
+    "provider", "insurance", "service", "patient", "status", "financial",
+]
+
+CLAIM_STATUS = Projection("claim_status", {
+    "claim_id": column("claim_id"),
+    "claim_number": column("claim_number"),
+    "patient_name": full_name("patient_first_name", "patient_last_name"),
+    "claim_status": column("claim_status"),
+    "received_date": date("received_date"),
+    "processed_date": date("processed_date"),
+    "payment_date": date("payment_date"),
+    "submitted_amount": amount("submitted_amount"),
+    "allowed_amount": amount("allowed_amount"),
+    "paid_amount": amount("paid_amount"),
+    "reviewed_by": column("reviewed_by"),
+    "reviewed_date": date("reviewed_date"),
+    "notes": column("notes"),
+})
+
+SEARCH_RESULT = Projection("search_result", {
+    "claim_id": column("claim_id"),
+    "claim_number": column("claim_number"),
+    "patient_id": column("patient_id"),
+    "patient_name": full_name("patient_first_name", "patient_last_name"),
+    "patient_region": column("patient_region"),
+    "provider_name": column("provider_name"),
+    "service_date": date("service_date"),
+    "service_type": column("service_type"),
+    "diagnosis": column("diagnosis_description"),
+    "submitted_amount": amount("submitted_amount"),
+    "claim_status": column("claim_status"),
+    "received_date": date("received_date"),
+    "score": column("score"),
+    "name_similarity": column("name_similarity"),
+    "provider_similarity": column("provider_similarity"),
+    "text_rank": column("text_rank"),
+})
+
+
+# approve_claim / reject_claim: previous_status and patient_id sit beside the claim
+# so the tool can report the transition and invalidate the patient's cache entry
+UPDATED_CLAIM = Projection("updated_claim", {
+    "previous_status": column("previous_status"),
+    "patient_id": column("patient_id"),
+    "updated_claim": {
+        "claim_id": column("claim_id"),
+        "claim_number": column("claim_number"),
+        "patient_name": full_name("patient_first_name", "patient_last_name"),
+        "service_date": date("service_date"),
+        "service_type": column("service_type"),
+        "service_description": column("service_description"),
+        "diagnosis": column("diagnosis_description"),
+        "financial": {
+            "submitted_amount": amount("submitted_amount"),
+            "allowed_amount": amount("allowed_amount"),
+            "paid_amount": amount("paid_amount"),
+            "patient_responsibility": amount("patient_responsibility"),
+        },
+        "status": {
+            "claim_status": column("claim_status"),
+            "received_date": date("received_date"),
+            "processed_date": date("processed_date"),
+            "payment_date": date("payment_date"),
+        },
+        "review": {
+            "reviewed_by": column("reviewed_by"),
+            "reviewed_date": date("reviewed_date"),
+            "notes": column("notes"),
+        },
+    },
+})
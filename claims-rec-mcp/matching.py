@@ -0,0 +1,212 @@
+import re
+from datetime import date
+
+import numpy as np
+
+import queries
+from db import execute_query
+
+# Reconciles claims extracted from documents (OCR) against tanzania_claims.
+# Candidates are gathered in one set-based query over three blocking keys
+# (claim number; patient ID near the service date; date of birth near the
+# service date), then every (record, candidate) pair is scored at once with
+# NumPy arrays, so a batch of 10k records costs one query and a few array passes.
+
+# Relative weight of each field in the match score; fields the record does not
+# carry are left out and the remaining weights renormalized.
+WEIGHTS = {
+    "claim_number": 0.35,
+    "patient_id": 0.20,
+    "patient_name": 0.20,
+    "patient_dob": 0.15,
+    "service_date": 0.15,
+    "submitted_amount": 0.10,
+    "provider_name": 0.05,
+}
+FIELDS = list(WEIGHTS)
+_COLUMN = {field: column for column, field in enumerate(FIELDS)}
+
+# Names are compared as 256-bit sets of hashed character trigrams
+SIGNATURE_BYTES = 32
+_NON_LETTERS = re.compile(r"[^a-z ]+")
+
+# Field scores below this are reported as discrepancies on the best match
+DISCREPANCY_BELOW = {
+    "claim_number": 1.0,
+    "patient_id": 1.0,
+    "patient_name": 0.8,
+    "patient_dob": 1.0,
+    "service_date": 1.0,
+    "submitted_amount": 1.0,
+    "provider_name": 0.6,
+}
+
+
+def _normalize_claim_number(value: str) -> str:
+    return re.sub(r"\s+", "", value or "").upper()
+
+
+def _signatures(names: list) -> np.ndarray:
+    """Trigram bit signatures, one row of SIGNATURE_BYTES per name; word order is ignored."""
+    width = SIGNATURE_BYTES * 8
+    rows, columns, seen = [], [], {}
+    for row, name in enumerate(names):
+        # Batches repeat names (one patient, many candidates), so trigram sets are memoized
+        trigrams = seen.get(name)
+        if trigrams is None:
+            words = sorted(_NON_LETTERS.sub(" ", (name or "").lower()).split())
+            text = f"  {' '.join(words)} " if words else ""
+            trigrams = seen[name] = [hash(text[i:i + 3]) % width for i in range(len(text) - 2)]
+        rows.extend([row] * len(trigrams))
+        columns.extend(trigrams)
+    bits = np.zeros((len(names), width), dtype=bool)
+    bits[rows, columns] = True
+    return np.packbits(bits, axis=1)
+
+
+def _popcount(packed: np.ndarray) -> np.ndarray:
+    return np.unpackbits(packed, axis=1).sum(axis=1)
+
+
+def _name_similarity(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Dice coefficient of trigram signatures; NaN where either name is empty."""
+    sizes = _popcount(left) + _popcount(right)
+    shared = _popcount(left & right)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        similarity = 2.0 * shared / sizes
+    similarity[(_popcount(left) == 0) | (_popcount(right) == 0)] = np.nan
+    return similarity
+
+
+def _days(values: list) -> np.ndarray:
+    return np.array([value.toordinal() if value else np.nan for value in values], dtype=float)
+
+
+def _amounts(values: list) -> np.ndarray:
+    return np.array([float(value) if value is not None else np.nan for value in values], dtype=float)
+
+
+async def fetch_candidates(records: list, date_tolerance_days: int) -> list:
+    """Candidate rows for every record: (ordinal, claim columns...), ordinals 1-based in input order."""
+    return await execute_query(queries.MATCH_CANDIDATES, {
+        "claim_numbers": [_normalize_claim_number(record.claim_number) or None for record in records],
+        "patient_ids": [record.patient_id or None for record in records],
+        "dobs": [record.patient_dob for record in records],
+        "service_dates": [record.service_date for record in records],
+        "days": date_tolerance_days,
+    })
+
+
+def score_candidates(records: list, candidates: list, date_tolerance_days: int, amount_tolerance: float):
+    """Score every (record, candidate) pair; returns record index per pair, total and per-field scores, and candidate columns."""
+    index = np.array([row[0] - 1 for row in candidates], dtype=np.int64)
+    columns = list(zip(*candidates)) if candidates else [[] for _ in range(len(queries.MATCH_CANDIDATE_COLUMNS) + 1)]
+    claim = dict(zip(queries.MATCH_CANDIDATE_COLUMNS, columns[1:]))
+    scores = np.full((len(candidates), len(FIELDS)), np.nan)
+
+    # claim number: exact after normalization
+    wanted = np.array([_normalize_claim_number(record.claim_number) for record in records], dtype=object)[index]
+    found = np.array([_normalize_claim_number(value) for value in claim["claim_number"]], dtype=object)
+    scores[:, _COLUMN["claim_number"]] = np.where(wanted != "", (wanted == found).astype(float), np.nan)
+
+    # patient ID: exact; it is also a blocking key, so a record carrying only the ID still scores
+    wanted = np.array([(record.patient_id or "").strip() for record in records], dtype=object)[index]
+    found = np.array([(value or "").strip() for value in claim["patient_id"]], dtype=object)
+    scores[:, _COLUMN["patient_id"]] = np.where(wanted != "", (wanted == found).astype(float), np.nan)
+
+    # patient name: trigram similarity, independent of first/last order
+    record_names = _signatures([record.patient_name for record in records])
+    claim_names = _signatures([f"{first or ''} {last or ''}" for first, last in zip(claim["patient_first_name"], claim["patient_last_name"])])
+    scores[:, _COLUMN["patient_name"]] = _name_similarity(record_names[index], claim_names)
+
+    # date of birth: exact
+    record_dob = _days([record.patient_dob for record in records])[index]
+    claim_dob = _days(claim["patient_dob"])
+    scores[:, _COLUMN["patient_dob"]] = np.where(np.isnan(record_dob) | np.isnan(claim_dob), np.nan, (record_dob == claim_dob).astype(float))
+
+    # service date: full marks on the day, falling linearly to 0 just past the tolerance
+    delta_days = np.abs(_days([record.service_date for record in records])[index] - _days(claim["service_date"]))
+    scores[:, _COLUMN["service_date"]] = np.clip(1.0 - delta_days / (date_tolerance_days + 1), 0.0, 1.0)
+
+    # submitted amount: full marks when equal, 0 at amount_tolerance relative difference or more
+    record_amount = _amounts([record.submitted_amount for record in records])[index]
+    claim_amount = _amounts(claim["submitted_amount"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        relative = np.abs(record_amount - claim_amount) / np.maximum(np.abs(record_amount), np.abs(claim_amount))
+    relative[(record_amount == 0) & (claim_amount == 0)] = 0.0
+    scores[:, _COLUMN["submitted_amount"]] = np.clip(1.0 - relative / amount_tolerance, 0.0, 1.0) if amount_tolerance > 0 else (relative == 0).astype(float)
+    scores[np.isnan(relative), _COLUMN["submitted_amount"]] = np.nan
+
+    # provider: trigram similarity
+    scores[:, _COLUMN["provider_name"]] = _name_similarity(_signatures([record.provider_name for record in records])[index], _signatures(claim["provider_name"]))
+
+    weights = np.array([WEIGHTS[field] for field in FIELDS])
+    present = ~np.isnan(scores)
+    weight_sum = (present * weights).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = np.where(weight_sum > 0, np.nansum(scores * weights, axis=1) / weight_sum, 0.0)
+    return index, total, scores, claim
+
+
+def _discrepancies(record, claim: dict, position: int, field_scores: np.ndarray) -> list:
+    values = {
+        "claim_number": (record.claim_number, claim["claim_number"][position]),
+        "patient_id": (record.patient_id, claim["patient_id"][position]),
+        "patient_name": (record.patient_name, f"{claim['patient_first_name'][position]} {claim['patient_last_name'][position]}"),
+        "patient_dob": (record.patient_dob, claim["patient_dob"][position]),
+        "service_date": (record.service_date, claim["service_date"][position]),
+        "submitted_amount": (record.submitted_amount, claim["submitted_amount"][position]),
+        "provider_name": (record.provider_name, claim["provider_name"][position]),
+    }
+    found = []
+    for column, field in enumerate(FIELDS):
+        score = field_scores[column]
+        if np.isnan(score) or score >= DISCREPANCY_BELOW[field]:
+            continue
+        extracted, stored = values[field]
+        discrepancy = {
+            "field": field,
+            "extracted": str(extracted) if isinstance(extracted, date) else extracted,
+            "database": str(stored) if isinstance(stored, date) else (float(stored) if field == "submitted_amount" and stored is not None else stored),
+            "score": round(float(score), 3),
+        }
+        if field == "service_date":
+            discrepancy["days_apart"] = abs((extracted - stored).days)
+        elif field == "submitted_amount":
+            discrepancy["difference"] = round(float(extracted) - float(stored), 2)
+        found.append(discrepancy)
+    return found
+
+
+async def match_records(records: list, top_k: int = 3, date_tolerance_days: int = 3,
+                        amount_tolerance: float = 0.05, match_threshold: float = 0.8,
+                        review_threshold: float = 0.5) -> list:
+    """Ranked candidate claims, with field-level discrepancies on the best one, for each record in order."""
+    candidates = await fetch_candidates(records, date_tolerance_days)
+    index, total, scores, claim = score_candidates(records, candidates, date_tolerance_days, amount_tolerance)
+
+    # Best candidates first within each record
+    order = np.lexsort((-total, index))
+    bounds = np.searchsorted(index[order], np.arange(len(records) + 1))
+
+    results = []
+    for i, record in enumerate(records):
+        ranked = order[bounds[i]:bounds[i + 1]][:top_k]
+        matches = [{
+            "claim_number": claim["claim_number"][position],
+            "claim_id": claim["claim_id"][position],
+            "patient_id": claim["patient_id"][position],
+            "claim_status": claim["claim_status"][position],
+            "score": round(float(total[position]), 3),
+        } for position in ranked]
+
+        best = total[ranked[0]] if len(ranked) else 0.0
+        result = {
+            "reference": record.reference or record.claim_number,
+            "outcome": "matched" if best >= match_threshold else "review" if best >= review_threshold else "unmatched",
+            "matches": matches,
+        }
+        if len(ranked) and best >= review_threshold:
+            result["discrepancies"] = _discrepancies(record, claim, ranked[0], scores[ranked[0]])
+        results.append(result)
+    return results
@@ -0,0 +1,179 @@
+import functools
+import logging
+import os
+import re
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+slow_query_ms = float(os.getenv("MCP_SLOW_QUERY_MS", "0"))
+slow_query_param_chars = int(os.getenv("MCP_SLOW_QUERY_PARAM_CHARS", "500"))
+# Parameter values carry patient data; only their names and types are logged unless this is set
+slow_query_log_params = os.getenv("MCP_SLOW_QUERY_LOG_PARAMS", "false").lower() == "true"
+
+slow_query_log = logging.getLogger("claims-rec-mcp.slow_query")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class Histogram:
+    """Prometheus-style histogram per label value; observations are O(log buckets)."""
+
+    def __init__(self, name: str, help: str, buckets: tuple, label: str = "tool"):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.label = label
+        self._series = {}
+
+    def observe(self, label_value: str, value: float):
+        series = self._series.get(label_value)
+        if series is None:
+            # counts per bucket (non-cumulative), then sum
+            series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_value, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{label_value}"}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{self.label}="{label_value}"}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label: str = "tool"):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values = {}
+
+    def inc(self, label_value: str, amount: float = 1):
+        self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+
+calls = Counter("mcp_tool_calls_total", "Tool calls.")
+errors = Counter("mcp_tool_errors_total", "Tool calls that returned an error response or raised.")
+rows = Counter("mcp_tool_rows_total", "Rows read from the database by tool calls.")
+response_bytes_total = Counter("mcp_tool_response_bytes_total", "Bytes of tool responses.")
+duration = Histogram("mcp_tool_duration_seconds", "Tool call latency.", LATENCY_BUCKETS)
+db_duration = Histogram("mcp_tool_db_duration_seconds", "Time a tool call spent waiting on the database.", LATENCY_BUCKETS)
+app_duration = Histogram(
+    "mcp_tool_app_duration_seconds",
+    "Time a tool call spent outside the database: validation, mapping, scoring and serialization.",
+    LATENCY_BUCKETS,
+)
+rows_per_call = Histogram("mcp_tool_rows", "Rows read from the database per tool call.", ROW_BUCKETS)
+response_bytes = Histogram("mcp_tool_response_bytes", "Tool response size.", BYTE_BUCKETS)
+slow_queries = Counter("mcp_slow_queries_total", "Statements slower than MCP_SLOW_QUERY_MS.")
+
+METRICS = (calls, errors, rows, response_bytes_total, duration, db_duration, app_duration, rows_per_call,
+           response_bytes, slow_queries)
+
+
+class _Call:
+    __slots__ = ("tool", "db_seconds", "rows")
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.db_seconds = 0.0
+        self.rows = 0
+
+
+_current_call = ContextVar("mcp_tool_call", default=None)
+
+
+def _param_type(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def describe_params(params):
+    """Parameter names and types without their values, e.g. {'claim_number': 'str'}."""
+    if isinstance(params, dict):
+        return {name: _param_type(value) for name, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [_param_type(value) for value in params]
+    return params
+
+
+def record_query(query: str, params, seconds: float, row_count: int):
+    """Called by db.py after each statement; attributes it to the tool call in progress."""
+    call = _current_call.get()
+    if call is not None:
+        call.db_seconds += seconds
+        call.rows += row_count
+    if slow_query_ms and seconds * 1000 >= slow_query_ms:
+        tool = call.tool if call is not None else "-"
+        slow_queries.inc(tool)
+        slow_query_log.warning(
+            "slow query tool=%s ms=%.1f rows=%d statement=%s params=%s",
+            tool, seconds * 1000, row_count, _WHITESPACE.sub(" ", query).strip(),
+            repr(params if slow_query_log_params else describe_params(params))[:slow_query_param_chars],
+        )
+
+
+def _is_error(response) -> bool:
+    return isinstance(response, str) and response.lstrip("{ \n").startswith('"error"')
+
+
+def instrumented(fn):
+    """Wrap an async tool so each call is counted, timed and sized; apply below @mcp.tool."""
+    tool = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        call = _Call(tool)
+        token = _current_call.set(call)
+        started = time.perf_counter()
+        failed = True
+        response = None
+        try:
+            response = await fn(*args, **kwargs)
+            failed = _is_error(response)
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_call.reset(token)
+            size = 0
+            if isinstance(response, str):
+                # isascii() is O(1) in CPython; orjson output is nearly always ASCII
+                size = len(response) if response.isascii() else len(response.encode())
+            calls.inc(tool)
+            if failed:
+                errors.inc(tool)
+            rows.inc(tool, call.rows)
+            response_bytes_total.inc(tool, size)
+            duration.observe(tool, elapsed)
+            db_duration.observe(tool, call.db_seconds)
+            app_duration.observe(tool, max(elapsed - call.db_seconds, 0.0))
+            rows_per_call.observe(tool, call.rows)
+            response_bytes.observe(tool, size)
+
+    return wrapper
+
+
+def render(gauges: dict = None) -> str:
+    """Prometheus text exposition of every metric, plus unlabeled gauges passed in."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, (help, value) in (gauges or {}).items():
+        lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,67 @@
+"""Apply the schema migrations in init-test-db/ that a database has not run yet.
+
+01/02 create and seed tanzania_claims on a fresh database; every later script is
+a versioned migration, recorded in schema_migrations by its file name once
+applied. A fresh test-db container runs them all at init; run this against an
+existing database to bring it up to date:
+
+    TEST_DB_HOST=localhost TEST_DB_PORT=1339 python migrate.py
+"""
+import argparse
+import os
+import re
+
+import psycopg
+
+from db import conninfo
+
+FIRST_MIGRATION = 3
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "init-test-db")
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(100) PRIMARY KEY,
+        applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def migrations(directory: str) -> list:
+    """(version, path) of every migration script, in order."""
+    found = []
+    for name in sorted(os.listdir(directory)):
+        match = re.match(r"(\d+)_.+\.sql$", name)
+        if match and int(match.group(1)) >= FIRST_MIGRATION:
+            found.append((name[:-len(".sql")], os.path.join(directory, name)))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dir", default=MIGRATIONS_DIR, help="directory holding the NN_*.sql scripts")
+    parser.add_argument("--dry-run", action="store_true", help="only list the migrations that would run")
+    args = parser.parse_args()
+
+    with psycopg.connect(conninfo) as conn:
+        conn.execute(CREATE_MIGRATIONS_TABLE)
+        applied = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+        conn.commit()
+
+        for version, path in migrations(args.dir):
+            if version in applied:
+                continue
+            print(f"{'would apply' if args.dry_run else 'applying'} {version}")
+            if args.dry_run:
+                continue
+            with open(path) as f:
+                script = f.read()
+            # Each script and its record commit together, so a failed one can be rerun
+            with conn.transaction():
+                conn.execute(script)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version) VALUES (%s) ON CONFLICT DO NOTHING", (version,)
+                )
+
+
+if __name__ == "__main__":
+    main()
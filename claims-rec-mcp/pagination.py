@@ -0,0 +1,45 @@
+import base64
+import datetime
+import hashlib
+import json
+
+# Listing tools page with keyset pagination on (received_date, claim_id). The
+# continuation token handed to the agent is the last key it saw, base64-encoded
+# so it is treated as opaque; each token is bound to the tool that issued it and
+# to a hash of its filters, since a key taken under one filter skips or repeats
+# rows under another.
+# received_date is NOT NULL (init-test-db/09), so every claim has a full key.
+
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _filter_hash(filters: dict) -> str:
+    return hashlib.sha256(json.dumps(filters, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def encode_cursor(tool: str, filters: dict, received_date, claim_id: int) -> str:
+    payload = {"t": tool, "f": _filter_hash(filters), "r": str(received_date), "i": claim_id}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(tool: str, filters: dict, cursor: str) -> dict:
+    """Return keyset parameters for the page after `cursor`, which must come from the same tool and filters."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["t"] != tool:
+            raise InvalidCursor(f"cursor was issued by {payload['t']}, not {tool}")
+        if payload.get("f") != _filter_hash(filters):
+            raise InvalidCursor("cursor was issued for different filters; repeat the first call without a cursor")
+        return {
+            "after_received_date": datetime.date.fromisoformat(payload["r"]),
+            "after_claim_id": int(payload["i"]),
+        }
+    except InvalidCursor:
+        raise
+    except Exception:
+        raise InvalidCursor("cursor is not a valid continuation token")
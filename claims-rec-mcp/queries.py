@@ -0,0 +1,596 @@
+# Named, parameterized statements for every tool. They are executed as
+# server-side prepared statements (see db.py), so each pooled connection parses
+# and plans a statement once and reuses that plan on later calls.
+
+CLAIM_DETAIL_COLUMNS = """
+    claim_id, claim_number, patient_id,
+    patient_first_name, patient_last_name, patient_dob, patient_gender,
+    patient_region, patient_district, patient_ward,
+    insurance_policy_number, insurance_scheme, insurance_company,
+    provider_name, provider_type, provider_region,
+    service_date, service_type, service_description,
+    diagnosis_code, diagnosis_description,
+    procedure_code, procedure_description,
+    submitted_amount, allowed_amount, paid_amount, patient_responsibility,
+    claim_status, received_date, processed_date, payment_date,
+    referral_from, referral_reason, treatment_outcome,
+    discharge_date, length_of_stay,
+    malaria_test_done, hiv_status_known, tb_screening_done,
+    maternal_health, child_under_5, emergency_case,
+    claim_type, authorization_number,
+    created_at, updated_at, notes, reviewed_by, reviewed_date
+"""
+
+# Listing statements come in two variants: the first page, and the page after a
+# keyset cursor. Keeping them separate (rather than an optional OR predicate)
+# lets each use an index range scan on (received_date, claim_id) with no OFFSET.
+KEYSET_AFTER = "(received_date, claim_id) > (%(after_received_date)s, %(after_claim_id)s)"
+KEYSET_BEFORE = "(received_date, claim_id) < (%(after_received_date)s, %(after_claim_id)s)"
+
+_LIST_RECENT_CLAIMS = """
+    SELECT
+        claim_id,
+        claim_number,
+        patient_first_name,
+        patient_last_name,
+        service_date,
+        service_type,
+        submitted_amount,
+        claim_status,
+        received_date
+    FROM tanzania_claims
+    {page_filter}
+    ORDER BY received_date DESC, claim_id DESC
+    LIMIT %(limit)s
+"""
+
+LIST_RECENT_CLAIMS = _LIST_RECENT_CLAIMS.format(page_filter="")
+LIST_RECENT_CLAIMS_PAGE = _LIST_RECENT_CLAIMS.format(page_filter=f"WHERE {KEYSET_BEFORE}")
+
+_LIST_OLD_PENDING_CLAIMS = """
+    SELECT
+        claim_id,
+        claim_number,
+        patient_first_name,
+        patient_last_name,
+        service_date,
+        service_type,
+        submitted_amount,
+        claim_status,
+        received_date,
+        CURRENT_DATE - received_date as days_pending
+    FROM tanzania_claims
+    WHERE claim_status = 'Pending'
+    AND received_date <= CURRENT_DATE - %(days_old)s::integer
+    {page_filter}
+    ORDER BY received_date ASC, claim_id ASC
+    LIMIT %(limit)s
+"""
+
+LIST_OLD_PENDING_CLAIMS = _LIST_OLD_PENDING_CLAIMS.format(page_filter="")
+LIST_OLD_PENDING_CLAIMS_PAGE = _LIST_OLD_PENDING_CLAIMS.format(page_filter=f"AND {KEYSET_AFTER}")
+
+_LIST_CLAIMS_BY_STATUS = """
+    SELECT
+        claim_id,
+        claim_number,
+        patient_first_name,
+        patient_last_name,
+        service_date,
+        service_type,
+        submitted_amount,
+        claim_status,
+        received_date,
+        processed_date,
+        payment_date,
+        CURRENT_DATE - received_date as days_since_received
+    FROM tanzania_claims
+    WHERE claim_status = %(status)s
+    {days_filter}
+    {page_filter}
+    ORDER BY received_date ASC, claim_id ASC
+    LIMIT %(limit)s
+"""
+
+# Also split on the optional days_old predicate, so each combination gets its own plan
+_DAYS_FILTER = "AND received_date <= CURRENT_DATE - %(days_old)s::integer"
+LIST_CLAIMS_BY_STATUS = _LIST_CLAIMS_BY_STATUS.format(days_filter="", page_filter="")
+LIST_CLAIMS_BY_STATUS_PAGE = _LIST_CLAIMS_BY_STATUS.format(days_filter="", page_filter=f"AND {KEYSET_AFTER}")
+LIST_CLAIMS_BY_STATUS_OLDER_THAN = _LIST_CLAIMS_BY_STATUS.format(days_filter=_DAYS_FILTER, page_filter="")
+LIST_CLAIMS_BY_STATUS_OLDER_THAN_PAGE = _LIST_CLAIMS_BY_STATUS.format(
+    days_filter=_DAYS_FILTER, page_filter=f"AND {KEYSET_AFTER}"
+)
+
+_GET_CLAIM_BY_NUMBER = """
+    SELECT {columns}
+    FROM tanzania_claims
+    WHERE claim_number = %(claim_number)s
+    LIMIT 10
+"""
+
+_GET_CLAIMS_BY_PATIENT_ID = """
+    SELECT {columns}
+    FROM tanzania_claims
+    WHERE patient_id = %(patient_id)s
+    ORDER BY service_date DESC
+    LIMIT 10
+"""
+
+GET_CLAIM_BY_NUMBER = _GET_CLAIM_BY_NUMBER.format(columns=CLAIM_DETAIL_COLUMNS)
+GET_CLAIMS_BY_PATIENT_ID = _GET_CLAIMS_BY_PATIENT_ID.format(columns=CLAIM_DETAIL_COLUMNS)
+
+
+# The detail tools can ask for a subset of sections; only the columns those
+# sections read are selected. Column names come from mapping.py projections,
+# never from tool arguments.
+def get_claim_by_number_statement(columns: list) -> str:
+    return _GET_CLAIM_BY_NUMBER.format(columns=", ".join(columns))
+
+
+def get_claims_by_patient_id_statement(columns: list) -> str:
+    return _GET_CLAIMS_BY_PATIENT_ID.format(columns=", ".join(columns))
+
+CHECK_CLAIM_STATUS = """
+    SELECT
+        claim_id,
+        claim_number,
+        patient_first_name,
+        patient_last_name,
+        claim_status,
+        received_date,
+        processed_date,
+        payment_date,
+        submitted_amount,
+        allowed_amount,
+        paid_amount,
+        reviewed_by,
+        reviewed_date,
+        notes
+    FROM tanzania_claims
+    WHERE claim_number = %(claim_number)s
+"""
+
+GET_CLAIM_STATUS = """
+    SELECT claim_status
+    FROM tanzania_claims
+    WHERE claim_number = %(claim_number)s
+"""
+
+# Approve/reject run as one statement: the CTE locks the row and captures the
+# status it had before the change, the UPDATE only fires if that status matches
+# %(expected_status)s (when given), and RETURNING hands back the updated claim.
+# reviewed_by / notes are only overwritten when a non-empty value is passed.
+_UPDATE_CLAIM_STATUS = """
+    WITH previous AS (
+        SELECT claim_id, claim_status
+        FROM tanzania_claims
+        WHERE claim_number = %(claim_number)s
+        FOR UPDATE
+    )
+    UPDATE tanzania_claims AS c
+    SET
+        claim_status = {new_status},
+        processed_date = CURRENT_DATE,
+        {payment_columns},
+        reviewed_date = CURRENT_DATE,
+        updated_at = CURRENT_TIMESTAMP,
+        reviewed_by = COALESCE(NULLIF(%(reviewed_by)s, ''), c.reviewed_by),
+        notes = COALESCE(NULLIF(%(notes)s, ''), c.notes)
+    FROM previous
+    WHERE c.claim_id = previous.claim_id
+    AND (%(expected_status)s::text IS NULL OR previous.claim_status = %(expected_status)s::text)
+    RETURNING
+        previous.claim_status AS previous_status,
+        c.claim_id, c.claim_number, c.patient_first_name, c.patient_last_name,
+        c.service_date, c.service_type, c.service_description,
+        c.diagnosis_description, c.submitted_amount, c.allowed_amount,
+        c.paid_amount, c.patient_responsibility,
+        c.claim_status, c.received_date, c.processed_date, c.payment_date,
+        c.reviewed_by, c.reviewed_date, c.notes,
+        c.patient_id
+"""
+
+APPROVE_CLAIM = _UPDATE_CLAIM_STATUS.format(
+    new_status="'Approved'",
+    payment_columns="payment_date = CURRENT_DATE + 2,\n        paid_amount = COALESCE(c.allowed_amount, c.submitted_amount)",
+)
+
+REJECT_CLAIM = _UPDATE_CLAIM_STATUS.format(
+    new_status="'Rejected'",
+    payment_columns="paid_amount = 0",
+)
+
+# Set-based bulk approve/reject. Inputs arrive as parallel arrays and are joined
+# to the table once; rows are locked in claim_id order so concurrent batches
+# cannot deadlock. Every input item comes back in input order: previous_status
+# is NULL when the claim does not exist, new_status is NULL when it was not
+# updated (missing, or not in expected_status).
+BULK_UPDATE_CLAIM_STATUS = """
+    WITH input AS (
+        SELECT *
+        FROM unnest(
+            %(claim_numbers)s::text[], %(decisions)s::text[], %(reviewers)s::text[],
+            %(notes)s::text[], %(expected_statuses)s::text[]
+        ) WITH ORDINALITY AS t(claim_number, decision, reviewed_by, notes, expected_status, ord)
+    ),
+    locked AS (
+        SELECT c.claim_id, c.patient_id, c.claim_status AS previous_status, i.*
+        FROM input i
+        JOIN tanzania_claims c ON c.claim_number = i.claim_number
+        ORDER BY c.claim_id
+        FOR UPDATE OF c
+    ),
+    updated AS (
+        UPDATE tanzania_claims AS c
+        SET
+            claim_status = l.decision,
+            processed_date = CURRENT_DATE,
+            payment_date = CASE WHEN l.decision = 'Approved' THEN CURRENT_DATE + 2 ELSE c.payment_date END,
+            paid_amount = CASE WHEN l.decision = 'Approved' THEN COALESCE(c.allowed_amount, c.submitted_amount) ELSE 0 END,
+            reviewed_date = CURRENT_DATE,
+            updated_at = CURRENT_TIMESTAMP,
+            reviewed_by = COALESCE(NULLIF(l.reviewed_by, ''), c.reviewed_by),
+            notes = COALESCE(NULLIF(l.notes, ''), c.notes)
+        FROM locked l
+        WHERE c.claim_id = l.claim_id
+        AND (l.expected_status IS NULL OR l.previous_status = l.expected_status)
+        RETURNING c.claim_id, c.claim_status, c.paid_amount
+    )
+    SELECT i.claim_number, l.previous_status, u.claim_status, u.paid_amount, l.patient_id
+    FROM input i
+    LEFT JOIN locked l ON l.ord = i.ord
+    LEFT JOIN updated u ON u.claim_id = l.claim_id
+    ORDER BY i.ord
+"""
+
+# summarize_claims reads trigger-maintained rollups instead of aggregating
+# claims: the grouping set of tanzania_claims_rollup
+# (init-test-db/11_claims_summary_rollups.sql) that covers the requested groups
+# and filters, or the full-key tanzania_claims_summary
+# (init-test-db/04_claims_summary.sql) when none does. Group-by keys map to
+# summary columns; only these fixed names are ever put into the SQL.
+SUMMARY_DIMENSIONS = {
+    "status": "claim_status",
+    "scheme": "insurance_scheme",
+    "region": "patient_region",
+    "provider_type": "provider_type",
+    "service_type": "service_type",
+    "month": "service_month",
+}
+
+# Dimensions tanzania_claims_rollup may roll up, in GROUPING() bit order; each of
+# its grouping sets keeps at most two of them besides status and month
+ROLLUP_DIMENSIONS = ("service_month", "insurance_scheme", "patient_region", "provider_type", "service_type")
+ROLLUP_MAX_DIMENSIONS = 2
+
+_SUMMARIZE_CLAIMS = """
+    SELECT
+        {select_columns}
+        {is_total} AS is_total,
+        sum(claim_count)::bigint AS claim_count,
+        sum(submitted_amount) AS submitted_amount,
+        sum(allowed_amount) AS allowed_amount,
+        sum(paid_amount) AS paid_amount
+    FROM {source}
+    WHERE {rollup}(%(claim_status)s::text IS NULL OR claim_status = %(claim_status)s::text)
+    AND (%(insurance_scheme)s::text IS NULL OR insurance_scheme = %(insurance_scheme)s::text)
+    AND (%(patient_region)s::text IS NULL OR patient_region = %(patient_region)s::text)
+    AND (%(provider_type)s::text IS NULL OR provider_type = %(provider_type)s::text)
+    AND (%(service_type)s::text IS NULL OR service_type = %(service_type)s::text)
+    AND (%(month_from)s::date IS NULL OR service_month >= %(month_from)s::date)
+    AND (%(month_to)s::date IS NULL OR service_month <= %(month_to)s::date)
+    {group_clause}
+    HAVING sum(claim_count) > 0
+    ORDER BY is_total DESC{order_columns}
+    LIMIT %(limit)s
+"""
+
+
+def summarize_claims_statement(group_by: tuple, params: dict = None) -> str:
+    """Statement for one combination of SUMMARY_DIMENSIONS keys; the grand total row comes first.
+
+    The rollup read is chosen from the filters set in params as well, since a
+    grouping set that rolls a dimension up cannot filter on it.
+    """
+    used = {SUMMARY_DIMENSIONS[key] for key in group_by}
+    if params:
+        used.update(column for column in ROLLUP_DIMENSIONS if params.get(column))
+        if params.get("month_from") or params.get("month_to"):
+            used.add("service_month")
+    rolled_up = [column not in used for column in ROLLUP_DIMENSIONS]
+    if len(used - {"claim_status", "service_month"}) <= ROLLUP_MAX_DIMENSIONS:
+        mask = sum(1 << bit for bit, rolled in enumerate(reversed(rolled_up)) if rolled)
+        source = {"source": "tanzania_claims_rollup", "rollup": f"rollup = {mask}\n    AND "}
+    else:
+        source = {"source": "tanzania_claims_summary", "rollup": ""}
+    columns = ", ".join(SUMMARY_DIMENSIONS[key] for key in group_by)
+    if not columns:
+        return _SUMMARIZE_CLAIMS.format(**source, select_columns="", is_total="true", group_clause="", order_columns="")
+    return _SUMMARIZE_CLAIMS.format(
+        **source,
+        select_columns=f"{columns},",
+        is_total=f"GROUPING({columns}) <> 0",
+        group_clause=f"GROUP BY GROUPING SETS (({columns}), ())",
+        order_columns=f", {columns}",
+    )
+
+# Candidate claims for a batch of extracted records (matching.py). Each blocking
+# key is its own index-driven join; UNION removes pairs found by several keys.
+MATCH_CANDIDATE_COLUMNS = [
+    "claim_id", "claim_number", "patient_id", "patient_first_name", "patient_last_name",
+    "patient_dob", "service_date", "provider_name", "submitted_amount", "claim_status",
+]
+
+MATCH_CANDIDATES = f"""
+    WITH input AS (
+        SELECT *
+        FROM unnest(
+            %(claim_numbers)s::text[], %(patient_ids)s::text[], %(dobs)s::date[], %(service_dates)s::date[]
+        ) WITH ORDINALITY AS t(claim_number, patient_id, patient_dob, service_date, ord)
+    ),
+    candidates AS (
+        SELECT i.ord, c.claim_id
+        FROM input i
+        JOIN tanzania_claims c ON c.claim_number = i.claim_number
+        UNION
+        SELECT i.ord, c.claim_id
+        FROM input i
+        JOIN tanzania_claims c ON c.patient_id = i.patient_id
+        WHERE i.service_date IS NULL
+        OR c.service_date BETWEEN i.service_date - %(days)s::integer AND i.service_date + %(days)s::integer
+        UNION
+        SELECT i.ord, c.claim_id
+        FROM input i
+        JOIN tanzania_claims c ON c.patient_dob = i.patient_dob
+        AND c.service_date BETWEEN i.service_date - %(days)s::integer AND i.service_date + %(days)s::integer
+    )
+    SELECT k.ord, {", ".join(f"c.{column}" for column in MATCH_CANDIDATE_COLUMNS)}
+    FROM candidates k
+    JOIN tanzania_claims c ON c.claim_id = k.claim_id
+    ORDER BY k.ord
+"""
+
+# Incremental duplicate scan (find_duplicate_claims). One statement checks the
+# next batch of claims past the (updated_at, claim_id) watermark against the
+# same patient's claims within %(window)s days of the service date, refreshes
+# the pairs involving them and advances the watermark. Claims updated in the last
+# %(settle)s seconds wait for a later run, so a transaction that commits late
+# with an earlier updated_at is not skipped. The advisory lock keeps concurrent
+# scans from checking the same batch; a caller that does not get it checks nothing.
+SCAN_DUPLICATES = """
+    WITH lock AS (
+        SELECT pg_try_advisory_xact_lock(hashtext('claim_duplicate_scan')) AS acquired
+    ),
+    state AS (
+        SELECT s.last_updated_at, s.last_claim_id
+        FROM claim_duplicate_scan s, lock
+        WHERE lock.acquired
+    ),
+    batch AS (
+        SELECT c.claim_id, c.claim_number, c.patient_id, c.service_date, c.procedure_code,
+               c.provider_name, c.submitted_amount, c.updated_at
+        FROM tanzania_claims c, state s
+        WHERE (c.updated_at, c.claim_id) > (s.last_updated_at, s.last_claim_id)
+        AND c.updated_at < now() - make_interval(secs => %(settle)s::integer)
+        ORDER BY c.updated_at, c.claim_id
+        LIMIT %(batch_size)s
+    ),
+    pairs AS (
+        SELECT DISTINCT ON (claim_id_a, claim_id_b) *
+        FROM (
+            SELECT
+                LEAST(b.claim_id, c.claim_id) AS claim_id_a,
+                GREATEST(b.claim_id, c.claim_id) AS claim_id_b,
+                abs(b.service_date - c.service_date) AS days_apart,
+                b.procedure_code IS NOT DISTINCT FROM c.procedure_code AS same_procedure,
+                lower(b.provider_name) IS NOT DISTINCT FROM lower(c.provider_name) AS same_provider,
+                abs(b.submitted_amount - c.submitted_amount)
+                    / NULLIF(GREATEST(abs(b.submitted_amount), abs(c.submitted_amount)), 0) AS amount_delta
+            FROM batch b
+            JOIN tanzania_claims c ON c.patient_id = b.patient_id
+            AND c.service_date BETWEEN b.service_date - %(window)s::integer AND b.service_date + %(window)s::integer
+            AND c.claim_number <> b.claim_number
+        ) found
+        ORDER BY claim_id_a, claim_id_b
+    ),
+    -- Pairs that no longer qualify are removed; ones that still do are refreshed
+    -- below. The two sets are disjoint, so no row is modified twice.
+    removed AS (
+        DELETE FROM claim_duplicates d
+        WHERE (d.claim_id_a IN (SELECT claim_id FROM batch) OR d.claim_id_b IN (SELECT claim_id FROM batch))
+        AND (d.claim_id_a, d.claim_id_b) NOT IN (SELECT claim_id_a, claim_id_b FROM pairs)
+        RETURNING 1
+    ),
+    upserted AS (
+        INSERT INTO claim_duplicates (claim_id_a, claim_id_b, days_apart, same_procedure, same_provider, amount_delta)
+        SELECT claim_id_a, claim_id_b, days_apart, same_procedure, same_provider, round(amount_delta, 4)
+        FROM pairs
+        ON CONFLICT (claim_id_a, claim_id_b) DO UPDATE SET
+            days_apart = EXCLUDED.days_apart,
+            same_procedure = EXCLUDED.same_procedure,
+            same_provider = EXCLUDED.same_provider,
+            amount_delta = EXCLUDED.amount_delta,
+            detected_at = CURRENT_TIMESTAMP
+        RETURNING 1
+    ),
+    last AS (
+        SELECT updated_at, claim_id FROM batch ORDER BY updated_at DESC, claim_id DESC LIMIT 1
+    ),
+    advanced AS (
+        UPDATE claim_duplicate_scan s
+        SET last_updated_at = last.updated_at, last_claim_id = last.claim_id, last_run_at = now()
+        FROM last
+        RETURNING s.last_updated_at
+    )
+    SELECT
+        (SELECT acquired FROM lock),
+        (SELECT count(*) FROM batch),
+        (SELECT count(*) FROM upserted),
+        (SELECT count(*) FROM removed),
+        (SELECT last_updated_at FROM advanced)
+"""
+
+# Scan watermark and the oldest claim past it that a scan will pick up, read
+# through the (updated_at, claim_id) index. No row past it means the stored
+# pairs are current. The watermark starts at -infinity, which has no Python
+# datetime, so it reads as NULL until the first batch moves it.
+DUPLICATE_SCAN_STATUS = """
+    SELECT NULLIF(s.last_updated_at, '-infinity'), s.last_run_at, pending.updated_at,
+           extract(epoch FROM now() - pending.updated_at)
+    FROM claim_duplicate_scan s
+    LEFT JOIN LATERAL (
+        SELECT c.updated_at
+        FROM tanzania_claims c
+        WHERE (c.updated_at, c.claim_id) > (s.last_updated_at, s.last_claim_id)
+        ORDER BY c.updated_at, c.claim_id
+        LIMIT 1
+    ) pending ON true
+"""
+
+# Stored pairs scored with the caller's thresholds: procedure and provider
+# agreement count 0.3 each, service-date closeness and amount closeness 0.2 each.
+FIND_DUPLICATE_CLAIMS = """
+    WITH scored AS (
+        SELECT d.*,
+            0.3 * d.same_procedure::integer
+            + 0.3 * d.same_provider::integer
+            + 0.2 * (1 - d.days_apart::numeric / (%(window)s::integer + 1))
+            + 0.2 * GREATEST(0, 1 - COALESCE(d.amount_delta, 1) / GREATEST(%(amount_tolerance)s::numeric, 0.0001)) AS score
+        FROM claim_duplicates d
+        WHERE d.days_apart <= %(window)s::integer
+        AND (NOT %(require_same_procedure)s::boolean OR d.same_procedure)
+    )
+    SELECT
+        round(s.score, 3) AS score, s.days_apart, s.same_procedure, s.same_provider, s.amount_delta,
+        a.patient_id,
+        a.claim_number, a.service_date, a.procedure_code, a.provider_name, a.submitted_amount, a.claim_status,
+        b.claim_number, b.service_date, b.procedure_code, b.provider_name, b.submitted_amount, b.claim_status
+    FROM scored s
+    JOIN tanzania_claims a ON a.claim_id = s.claim_id_a
+    JOIN tanzania_claims b ON b.claim_id = s.claim_id_b
+    WHERE s.score >= %(min_score)s::numeric
+    AND (%(patient_id)s::text IS NULL OR a.patient_id = %(patient_id)s::text)
+    ORDER BY s.score DESC, s.claim_id_a, s.claim_id_b
+    LIMIT %(limit)s
+"""
+
+# search_claims: candidates come from three GIN indexes (08_claim_search.sql), each
+# capped at %(candidates)s rows, and only those are scored. `<%%` is pg_trgm word
+# similarity, so a partial or misspelled name still matches; the patient name
+# expression is the indexed one. Filters are optional (NULL = any).
+_SEARCH_PATIENT_NAME = "(coalesce(c.patient_first_name, '') || ' ' || coalesce(c.patient_last_name, ''))"
+
+_SEARCH_FILTERS = """
+            AND (%(status)s::text IS NULL OR c.claim_status = %(status)s::text)
+            AND (%(region)s::text IS NULL OR c.patient_region = %(region)s::text)
+            AND (%(service_date_from)s::date IS NULL OR c.service_date >= %(service_date_from)s::date)
+            AND (%(service_date_to)s::date IS NULL OR c.service_date <= %(service_date_to)s::date)"""
+
+SEARCH_CLAIMS = f"""
+    WITH terms AS (
+        SELECT websearch_to_tsquery('english', %(query)s::text) AS tsquery
+    ),
+    candidates AS (
+        (SELECT c.claim_id FROM tanzania_claims c
+            WHERE %(query)s::text <%% {_SEARCH_PATIENT_NAME}{_SEARCH_FILTERS}
+            LIMIT %(candidates)s)
+        UNION
+        (SELECT c.claim_id FROM tanzania_claims c
+            WHERE %(query)s::text <%% c.provider_name{_SEARCH_FILTERS}
+            LIMIT %(candidates)s)
+        UNION
+        (SELECT c.claim_id FROM tanzania_claims c, terms t
+            WHERE c.search_document @@ t.tsquery{_SEARCH_FILTERS}
+            LIMIT %(candidates)s)
+    ),
+    scored AS (
+        SELECT
+            c.claim_id, c.claim_number, c.patient_id, c.patient_first_name, c.patient_last_name,
+            c.provider_name, c.patient_region, c.service_date, c.service_type,
+            c.diagnosis_description, c.submitted_amount, c.claim_status, c.received_date,
+            round(word_similarity(%(query)s::text, {_SEARCH_PATIENT_NAME})::numeric, 3)::float8 AS name_similarity,
+            round(word_similarity(%(query)s::text, coalesce(c.provider_name, ''))::numeric, 3)::float8 AS provider_similarity,
+            -- rank / (rank + 1): 0-1 like the similarities
+            round(ts_rank_cd(c.search_document, t.tsquery, 32)::numeric, 3)::float8 AS text_rank
+        FROM candidates
+        JOIN tanzania_claims c USING (claim_id)
+        CROSS JOIN terms t
+    )
+    SELECT *, GREATEST(name_similarity, provider_similarity, text_rank) AS score
+    FROM scored
+    ORDER BY score DESC, claim_id DESC
+    LIMIT %(limit)s
+"""
+
+# Bulk ingestion (ingest.py). Column names come from the table's own catalog
+# entries, never from the input file. Rows are validated against these before
+# COPY, so a bad row is rejected on its own instead of aborting the load.
+INGEST_TABLE_COLUMNS = """
+    SELECT column_name, data_type, character_maximum_length, numeric_precision, numeric_scale,
+           is_nullable = 'NO' AND column_default IS NULL AS required, column_default
+    FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = 'tanzania_claims'
+    AND is_generated = 'NEVER'
+    ORDER BY ordinal_position
+"""
+
+INGEST_CHECK_CONSTRAINTS = """
+    SELECT pg_get_constraintdef(oid)
+    FROM pg_constraint
+    WHERE conrelid = 'tanzania_claims'::regclass AND contype = 'c'
+"""
+
+# Session-private and dropped at commit; no constraints, so every valid row copies in
+_CREATE_INGEST_STAGING = """
+    CREATE TEMP TABLE claims_staging ON COMMIT DROP AS
+    SELECT {columns}, 0::bigint AS ingest_line FROM tanzania_claims WITH NO DATA
+"""
+
+_COPY_INGEST_STAGING = "COPY claims_staging ({columns}, ingest_line) FROM STDIN"
+
+# A claim_number repeated within one load keeps its last row. Existing claims are
+# updated, new ones inserted; a blank value never erases a stored one, and a new
+# claim's blank value takes the column default.
+_UPSERT_INGESTED_CLAIMS = """
+    WITH latest AS (
+        SELECT DISTINCT ON (claim_number) *
+        FROM claims_staging
+        ORDER BY claim_number, ingest_line DESC
+    ),
+    updated AS (
+        UPDATE tanzania_claims c SET
+            {updates}
+        FROM latest l
+        WHERE c.claim_number = l.claim_number
+        RETURNING 1
+    ),
+    inserted AS (
+        INSERT INTO tanzania_claims ({columns})
+        SELECT {values}
+        FROM latest l
+        WHERE NOT EXISTS (SELECT 1 FROM tanzania_claims c WHERE c.claim_number = l.claim_number)
+        ON CONFLICT (claim_number) DO NOTHING
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM inserted), (SELECT count(*) FROM updated)
+"""
+
+
+def ingest_statements(columns: list, defaults: dict) -> tuple:
+    """(create staging, COPY, upsert) statements for loading these tanzania_claims columns.
+
+    defaults maps a column to its default expression, as read from the catalog.
+    """
+    column_list = ", ".join(columns)
+    updates = ",\n            ".join(
+        [f"{column} = COALESCE(l.{column}, c.{column})" for column in columns if column != "claim_number"]
+        + ["updated_at = CURRENT_TIMESTAMP"]
+    )
+    values = ", ".join(
+        f"COALESCE(l.{column}, {defaults[column]})" if defaults.get(column) else f"l.{column}" for column in columns
+    )
+    return (
+        _CREATE_INGEST_STAGING.format(columns=column_list),
+        _COPY_INGEST_STAGING.format(columns=column_list),
+        _UPSERT_INGESTED_CLAIMS.format(columns=column_list, updates=updates, values=values),
+    )
@@ -1,9 +1,51 @@
+from contextlib import asynccontextmanager
 from fastmcp import FastMCP
-import json
-from db import execute_query, execute_update, close_connection
+from datetime import date, datetime
+from db import execute_query, execute_returning, iter_rows, open_pool, close_connection, conninfo, pool_stats
+from claim_cache import claim_cache
+from mapping import dumps
+import mapping
+import metrics
+from metrics import instrumented
+from matching import match_records
+from duplicates import duplicate_scanner, scan_duplicates, scan_status, scan_window_days
+from ingest import ingest, ingest_file, resolve_path
+from pagination import encode_cursor, decode_cursor, MAX_PAGE_SIZE
+import queries
+from pydantic import BaseModel
 from typing import Optional, List
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
 
-mcp = FastMCP("Claims Recommendation MCP")
+
+@asynccontextmanager
+async def lifespan(server):
+    await open_pool()
+    claim_cache.start(conninfo)
+    duplicate_scanner.start()
+    try:
+        yield
+    finally:
+        await duplicate_scanner.stop()
+        await claim_cache.stop()
+        await close_connection()
+
+
+mcp = FastMCP("Claims Recommendation MCP", lifespan=lifespan)
+
+BULK_MAX_ITEMS = 5000
+MATCH_MAX_RECORDS = 10000
+INGEST_MAX_RECORDS = 10000
+SEARCH_MAX_RESULTS = 100
+# Rows taken from each search index before ranking; bounds search_claims latency
+SEARCH_CANDIDATES = 1000
+
+DECISIONS = {
+    "approve": "Approved",
+    "approved": "Approved",
+    "reject": "Rejected",
+    "rejected": "Rejected",
+}
 
 # Add all n8n injected arguments here to hide them from the AI tool definition
 HIDDEN_ARGS = [
@@ -16,9 +58,24 @@ HIDDEN_ARGS = [
     "total_messages"
 ]
 
+def _cacheable(response: str) -> bool:
+    """Only keep answers that came from the database; errors are retried on the next call."""
+    return not response.lstrip("{ \n").startswith('"error"')
+
+
+def _page_params(tool: str, cursor: str, filters: dict, limit: int) -> dict:
+    """Query parameters: the filters, keyset parameters for the page after cursor, and one extra row to detect a next page."""
+    params = dict(filters, limit=limit + 1)
+    if cursor:
+        params.update(decode_cursor(tool, filters, cursor))
+    return params
+
+
 @mcp.tool(exclude_args=HIDDEN_ARGS)
-def list_recent_claims(
+@instrumented
+async def list_recent_claims(
     limit: int = 5, 
+    cursor: str = "", 
     chatInput: str = None, 
     toolCallId: str = None,
     thread_id: str = None,
@@ -28,58 +85,44 @@ def list_recent_claims(
     total_messages: int = None
 ) -> str:
     """
-    List the most recent claims (1-5 claims).
+    List the most recent claims, newest first. Pass next_cursor from a response to get the next page.
     
     Args:
-        limit: Number of recent claims to retrieve (1-5, default: 5)
-    """
-    if limit < 1 or limit > 5:
-        return json.dumps({"error": "Limit must be between 1 and 5"})
-    
-    query = f"""
-        SELECT 
-            claim_id,
-            claim_number,
-            patient_first_name,
-            patient_last_name,
-            service_date,
-            service_type,
-            submitted_amount,
-            claim_status,
-            received_date
-        FROM tanzania_claims
-        ORDER BY received_date DESC, claim_id DESC
-        LIMIT {limit}
+        limit: Number of claims per page (1-1000, default: 5)
+        cursor: next_cursor from the previous page (optional)
     """
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return dumps({"error": f"Limit must be between 1 and {MAX_PAGE_SIZE}"})
     
     try:
-        results = execute_query(query)
+        filters = {}
+        params = _page_params("list_recent_claims", cursor, filters, limit)
+        statement = queries.LIST_RECENT_CLAIMS_PAGE if cursor else queries.LIST_RECENT_CLAIMS
         claims = []
-        for row in results:
-            claims.append({
-                "claim_id": row[0],
-                "claim_number": row[1],
-                "patient_name": f"{row[2]} {row[3]}",
-                "service_date": str(row[4]),
-                "service_type": row[5],
-                "submitted_amount": float(row[6]),
-                "claim_status": row[7],
-                "received_date": str(row[8])
-            })
+        next_cursor = None
+        async for claim in iter_rows(statement, params, params["limit"], mapping.RECENT_CLAIM):
+            if len(claims) == limit:
+                last = claims[-1]
+                next_cursor = encode_cursor("list_recent_claims", filters, last["received_date"], last["claim_id"])
+                continue
+            claims.append(claim)
         
-        return json.dumps({
+        return dumps({
             "success": True,
             "count": len(claims),
-            "claims": claims
-        }, indent=2)
+            "claims": claims,
+            "next_cursor": next_cursor
+        })
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
 
 
 @mcp.tool(exclude_args=HIDDEN_ARGS)
-def list_old_pending_claims(
+@instrumented
+async def list_old_pending_claims(
     limit: int = 10, 
     days_old: int = 30, 
+    cursor: str = "", 
     chatInput: str = None, 
     toolCallId: str = None,
     thread_id: str = None,
@@ -89,71 +132,54 @@ def list_old_pending_claims(
     total_messages: int = None
 ) -> str:
     """
-    List old pending claims that have been in pending status for a specified number of days.
+    List old pending claims that have been in pending status for a specified number of days, oldest first.
+    Pass next_cursor from a response to get the next page.
     
     Args:
-        limit: Number of claims to retrieve (1-50, default: 10)
+        limit: Number of claims per page (1-1000, default: 10)
         days_old: Minimum number of days the claim has been pending (default: 30)
+        cursor: next_cursor from the previous page (optional)
     """
-    if limit < 1 or limit > 50:
-        return json.dumps({"error": "Limit must be between 1 and 50"})
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return dumps({"error": f"Limit must be between 1 and {MAX_PAGE_SIZE}"})
     
     if days_old < 1:
-        return json.dumps({"error": "days_old must be at least 1"})
-    
-    query = f"""
-        SELECT 
-            claim_id,
-            claim_number,
-            patient_first_name,
-            patient_last_name,
-            service_date,
-            service_type,
-            submitted_amount,
-            claim_status,
-            received_date,
-            CURRENT_DATE - received_date as days_pending
-        FROM tanzania_claims
-        WHERE claim_status = 'Pending'
-        AND received_date <= CURRENT_DATE - INTERVAL '{days_old} days'
-        ORDER BY received_date ASC, claim_id ASC
-        LIMIT {limit}
-    """
+        return dumps({"error": "days_old must be at least 1"})
     
     try:
-        results = execute_query(query)
+        filters = {"days_old": days_old}
+        params = _page_params("list_old_pending_claims", cursor, filters, limit)
+        statement = queries.LIST_OLD_PENDING_CLAIMS_PAGE if cursor else queries.LIST_OLD_PENDING_CLAIMS
         claims = []
-        for row in results:
-            claims.append({
-                "claim_id": row[0],
-                "claim_number": row[1],
-                "patient_name": f"{row[2]} {row[3]}",
-                "service_date": str(row[4]),
-                "service_type": row[5],
-                "submitted_amount": float(row[6]),
-                "claim_status": row[7],
-                "received_date": str(row[8]),
-                "days_pending": row[9]
-            })
+        next_cursor = None
+        async for claim in iter_rows(statement, params, params["limit"], mapping.OLD_PENDING_CLAIM):
+            if len(claims) == limit:
+                last = claims[-1]
+                next_cursor = encode_cursor("list_old_pending_claims", filters, last["received_date"], last["claim_id"])
+                continue
+            claims.append(claim)
         
-        return json.dumps({
+        return dumps({
             "success": True,
             "count": len(claims),
             "filter": {
                 "status": "Pending",
                 "minimum_days_old": days_old
             },
-            "claims": claims
-        }, indent=2)
+            "claims": claims,
+            "next_cursor": next_cursor
+        })
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
 
 
 @mcp.tool(exclude_args=HIDDEN_ARGS)
-def list_claims_by_status(
+@instrumented
+async def list_claims_by_status(
     status: str, 
     limit: int = 10, 
     days_old: int = 0, 
+    cursor: str = "", 
     chatInput: str = None, 
     toolCallId: str = None,
     thread_id: str = None,
@@ -163,80 +189,92 @@ def list_claims_by_status(
     total_messages: int = None
 ) -> str:
     """
-    List claims filtered by status (Approved, Rejected, or Pending), optionally older than specified days.
+    List claims filtered by status (Approved, Rejected, or Pending), optionally older than specified days, oldest first.
+    Pass next_cursor from a response to get the next page.
     
     Args:
         status: Claim status to filter by ('Approved', 'Rejected', or 'Pending')
-        limit: Number of claims to retrieve (1-50, default: 10)
+        limit: Number of claims per page (1-1000, default: 10)
         days_old: Minimum number of days old (0 for all claims, default: 0)
+        cursor: next_cursor from the previous page (optional)
     """
-    if limit < 1 or limit > 50:
-        return json.dumps({"error": "Limit must be between 1 and 50"})
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return dumps({"error": f"Limit must be between 1 and {MAX_PAGE_SIZE}"})
     
     if status not in ['Approved', 'Rejected', 'Pending']:
-        return json.dumps({"error": "Status must be 'Approved', 'Rejected', or 'Pending'"})
-    
-    status = status.replace("'", "''")
+        return dumps({"error": "Status must be 'Approved', 'Rejected', or 'Pending'"})
     
-    days_filter = ""
     if days_old > 0:
-        days_filter = f"AND received_date <= CURRENT_DATE - INTERVAL '{days_old} days'"
-    
-    query = f"""
-        SELECT 
-            claim_id,
-            claim_number,
-            patient_first_name,
-            patient_last_name,
-            service_date,
-            service_type,
-            submitted_amount,
-            claim_status,
-            received_date,
-            processed_date,
-            payment_date,
-            CURRENT_DATE - received_date as days_since_received
-        FROM tanzania_claims
-        WHERE claim_status = '{status}'
-        {days_filter}
-        ORDER BY received_date ASC, claim_id ASC
-        LIMIT {limit}
-    """
+        statement = queries.LIST_CLAIMS_BY_STATUS_OLDER_THAN_PAGE if cursor else queries.LIST_CLAIMS_BY_STATUS_OLDER_THAN
+    else:
+        statement = queries.LIST_CLAIMS_BY_STATUS_PAGE if cursor else queries.LIST_CLAIMS_BY_STATUS
     
     try:
-        results = execute_query(query)
+        filters = {"status": status, "days_old": days_old}
+        params = _page_params("list_claims_by_status", cursor, filters, limit)
         claims = []
-        for row in results:
-            claims.append({
-                "claim_id": row[0],
-                "claim_number": row[1],
-                "patient_name": f"{row[2]} {row[3]}",
-                "service_date": str(row[4]),
-                "service_type": row[5],
-                "submitted_amount": float(row[6]),
-                "claim_status": row[7],
-                "received_date": str(row[8]),
-                "processed_date": str(row[9]) if row[9] else None,
-                "payment_date": str(row[10]) if row[10] else None,
-                "days_since_received": row[11]
-            })
+        next_cursor = None
+        async for claim in iter_rows(statement, params, params["limit"], mapping.CLAIM_BY_STATUS):
+            if len(claims) == limit:
+                last = claims[-1]
+                next_cursor = encode_cursor("list_claims_by_status", filters, last["received_date"], last["claim_id"])
+                continue
+            claims.append(claim)
         
-        return json.dumps({
+        return dumps({
             "success": True,
             "count": len(claims),
             "filter": {
                 "status": status,
                 "minimum_days_old": days_old if days_old > 0 else "all"
             },
-            "claims": claims
-        }, indent=2)
+            "claims": claims,
+            "next_cursor": next_cursor
+        })
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
+
+
+def _detail_projection(sections: str):
+    """CLAIM_DETAIL limited to the comma-separated sections, or all of it; raises ValueError on unknown names."""
+    names = sorted({name.strip() for name in sections.split(",") if name.strip()})
+    return mapping.CLAIM_DETAIL.only(names) if names else mapping.CLAIM_DETAIL
+
+
+def _fit_claim_details(response: dict, max_bytes: int) -> str:
+    """Serialize a detail response within max_bytes by dropping low-priority sections, then trailing claims."""
+    body = dumps(response)
+    if not max_bytes or len(body.encode()) <= max_bytes:
+        return body
+    
+    claims = response["claims"]
+    omitted = []
+    for section in mapping.CLAIM_DETAIL_TRIM_ORDER:
+        if not any(section in claim for claim in claims):
+            continue
+        for claim in claims:
+            claim.pop(section, None)
+        omitted.append(section)
+        response["omitted_sections"] = omitted
+        body = dumps(response)
+        if len(body.encode()) <= max_bytes:
+            return body
+    
+    total = len(claims)
+    while len(claims) > 1 and len(body.encode()) > max_bytes:
+        claims.pop()
+        response["count"] = len(claims)
+        response["claims_omitted"] = total - len(claims)
+        body = dumps(response)
+    return body
 
 
 @mcp.tool(exclude_args=HIDDEN_ARGS)
-def get_claim_by_number(
+@instrumented
+async def get_claim_by_number(
     claim_number: str, 
+    sections: str = "", 
+    max_bytes: int = 0, 
     chatInput: str = None, 
     toolCallId: str = None,
     thread_id: str = None,
@@ -250,128 +288,52 @@ def get_claim_by_number(
     
     Args:
         claim_number: Unique claim number (e.g., 'ZNB-2024-001')
+        sections: Comma-separated sections to return, e.g. 'financial,status' (patient, insurance, provider, service, diagnosis, procedure, financial, status, clinical_details, health_indicators, additional; default: all)
+        max_bytes: Keep the response under this size by leaving out the least important sections (0 for no limit, default: 0)
     """
-    claim_number = claim_number.replace("'", "''")
-    
-    query = f"""
-        SELECT 
-            claim_id, claim_number, patient_id,
-            patient_first_name, patient_last_name, patient_dob, patient_gender,
-            patient_region, patient_district, patient_ward,
-            insurance_policy_number, insurance_scheme, insurance_company,
-            provider_name, provider_type, provider_region,
-            service_date, service_type, service_description,
-            diagnosis_code, diagnosis_description,
-            procedure_code, procedure_description,
-            submitted_amount, allowed_amount, paid_amount, patient_responsibility,
-            claim_status, received_date, processed_date, payment_date,
-            referral_from, referral_reason, treatment_outcome,
-            discharge_date, length_of_stay,
-            malaria_test_done, hiv_status_known, tb_screening_done,
-            maternal_health, child_under_5, emergency_case,
-            claim_type, authorization_number,
-            created_at, updated_at, notes, reviewed_by, reviewed_date
-        FROM tanzania_claims
-        WHERE claim_number = '{claim_number}'
-        LIMIT 10
-    """
+    try:
+        projection = _detail_projection(sections)
+    except ValueError as e:
+        return dumps({"error": str(e)})
+    if max_bytes < 0:
+        return dumps({"error": "max_bytes must be 0 or more"})
     
+    return await claim_cache.get_or_load(
+        ("get_claim_by_number", claim_number, projection.name, max_bytes),
+        lambda: _get_claim_by_number(claim_number, projection, max_bytes),
+        _cacheable
+    )
+
+
+async def _get_claim_by_number(claim_number: str, projection, max_bytes: int) -> str:
     try:
-        results = execute_query(query)
+        claims = await execute_query(
+            queries.get_claim_by_number_statement(projection.columns),
+            {"claim_number": claim_number},
+            row_factory=projection
+        )
         
-        if not results:
-            return json.dumps({
+        if not claims:
+            return dumps({
                 "success": False,
                 "message": "No claims found matching the criteria"
             })
         
-        claims = []
-        for row in results:
-            claims.append({
-                "claim_id": row[0],
-                "claim_number": row[1],
-                "patient": {
-                    "patient_id": row[2],
-                    "name": f"{row[3]} {row[4]}",
-                    "dob": str(row[5]) if row[5] else None,
-                    "gender": row[6],
-                    "region": row[7],
-                    "district": row[8],
-                    "ward": row[9]
-                },
-                "insurance": {
-                    "policy_number": row[10],
-                    "scheme": row[11],
-                    "company": row[12]
-                },
-                "provider": {
-                    "name": row[13],
-                    "type": row[14],
-                    "region": row[15]
-                },
-                "service": {
-                    "date": str(row[16]),
-                    "type": row[17],
-                    "description": row[18]
-                },
-                "diagnosis": {
-                    "code": row[19],
-                    "description": row[20]
-                },
-                "procedure": {
-                    "code": row[21],
-                    "description": row[22]
-                },
-                "financial": {
-                    "submitted_amount": float(row[23]) if row[23] else 0,
-                    "allowed_amount": float(row[24]) if row[24] else 0,
-                    "paid_amount": float(row[25]) if row[25] else 0,
-                    "patient_responsibility": float(row[26]) if row[25] else 0
-                },
-                "status": {
-                    "claim_status": row[27],
-                    "received_date": str(row[28]) if row[28] else None,
-                    "processed_date": str(row[29]) if row[29] else None,
-                    "payment_date": str(row[30]) if row[30] else None
-                },
-                "clinical_details": {
-                    "referral_from": row[31],
-                    "referral_reason": row[32],
-                    "treatment_outcome": row[33],
-                    "discharge_date": str(row[34]) if row[34] else None,
-                    "length_of_stay": row[35]
-                },
-                "health_indicators": {
-                    "malaria_test_done": row[36],
-                    "hiv_status_known": row[37],
-                    "tb_screening_done": row[38],
-                    "maternal_health": row[39],
-                    "child_under_5": row[40],
-                    "emergency_case": row[41]
-                },
-                "additional": {
-                    "claim_type": row[42],
-                    "authorization_number": row[43],
-                    "created_at": str(row[44]) if row[44] else None,
-                    "updated_at": str(row[45]) if row[45] else None,
-                    "notes": row[46],
-                    "reviewed_by": row[47],
-                    "reviewed_date": str(row[48]) if row[48] else None
-                }
-            })
-        
-        return json.dumps({
+        return _fit_claim_details({
             "success": True,
             "count": len(claims),
             "claims": claims
-        }, indent=2)
+        }, max_bytes)
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
 
 
 @mcp.tool(exclude_args=HIDDEN_ARGS)
-def get_claim_by_patient_id(
+@instrumented
+async def get_claim_by_patient_id(
     patient_id: str, 
+    sections: str = "", 
+    max_bytes: int = 0, 
     chatInput: str = None, 
     toolCallId: str = None,
     thread_id: str = None,
@@ -385,128 +347,49 @@ def get_claim_by_patient_id(
     
     Args:
         patient_id: Patient ID (e.g., 'PAT-001')
+        sections: Comma-separated sections to return, e.g. 'financial,status' (patient, insurance, provider, service, diagnosis, procedure, financial, status, clinical_details, health_indicators, additional; default: all)
+        max_bytes: Keep the response under this size by leaving out the least important sections, then the oldest claims (0 for no limit, default: 0)
     """
-    patient_id = patient_id.replace("'", "''")
-    
-    query = f"""
-        SELECT 
-            claim_id, claim_number, patient_id,
-            patient_first_name, patient_last_name, patient_dob, patient_gender,
-            patient_region, patient_district, patient_ward,
-            insurance_policy_number, insurance_scheme, insurance_company,
-            provider_name, provider_type, provider_region,
-            service_date, service_type, service_description,
-            diagnosis_code, diagnosis_description,
-            procedure_code, procedure_description,
-            submitted_amount, allowed_amount, paid_amount, patient_responsibility,
-            claim_status, received_date, processed_date, payment_date,
-            referral_from, referral_reason, treatment_outcome,
-            discharge_date, length_of_stay,
-            malaria_test_done, hiv_status_known, tb_screening_done,
-            maternal_health, child_under_5, emergency_case,
-            claim_type, authorization_number,
-            created_at, updated_at, notes, reviewed_by, reviewed_date
-        FROM tanzania_claims
-        WHERE patient_id = '{patient_id}'
-        ORDER BY service_date DESC
-        LIMIT 10
-    """
+    try:
+        projection = _detail_projection(sections)
+    except ValueError as e:
+        return dumps({"error": str(e)})
+    if max_bytes < 0:
+        return dumps({"error": "max_bytes must be 0 or more"})
     
+    return await claim_cache.get_or_load(
+        ("get_claim_by_patient_id", patient_id, projection.name, max_bytes),
+        lambda: _get_claim_by_patient_id(patient_id, projection, max_bytes),
+        _cacheable
+    )
+
+
+async def _get_claim_by_patient_id(patient_id: str, projection, max_bytes: int) -> str:
     try:
-        results = execute_query(query)
+        claims = await execute_query(
+            queries.get_claims_by_patient_id_statement(projection.columns),
+            {"patient_id": patient_id},
+            row_factory=projection
+        )
         
-        if not results:
-            return json.dumps({
+        if not claims:
+            return dumps({
                 "success": False,
                 "message": "No claims found matching the criteria"
             })
         
-        claims = []
-        for row in results:
-            claims.append({
-                "claim_id": row[0],
-                "claim_number": row[1],
-                "patient": {
-                    "patient_id": row[2],
-                    "name": f"{row[3]} {row[4]}",
-                    "dob": str(row[5]) if row[5] else None,
-                    "gender": row[6],
-                    "region": row[7],
-                    "district": row[8],
-                    "ward": row[9]
-                },
-                "insurance": {
-                    "policy_number": row[10],
-                    "scheme": row[11],
-                    "company": row[12]
-                },
-                "provider": {
-                    "name": row[13],
-                    "type": row[14],
-                    "region": row[15]
-                },
-                "service": {
-                    "date": str(row[16]),
-                    "type": row[17],
-                    "description": row[18]
-                },
-                "diagnosis": {
-                    "code": row[19],
-                    "description": row[20]
-                },
-                "procedure": {
-                    "code": row[21],
-                    "description": row[22]
-                },
-                "financial": {
-                    "submitted_amount": float(row[23]) if row[23] else 0,
-                    "allowed_amount": float(row[24]) if row[24] else 0,
-                    "paid_amount": float(row[25]) if row[25] else 0,
-                    "patient_responsibility": float(row[26]) if row[25] else 0
-                },
-                "status": {
-                    "claim_status": row[27],
-                    "received_date": str(row[28]) if row[28] else None,
-                    "processed_date": str(row[29]) if row[29] else None,
-                    "payment_date": str(row[30]) if row[30] else None
-                },
-                "clinical_details": {
-                    "referral_from": row[31],
-                    "referral_reason": row[32],
-                    "treatment_outcome": row[33],
-                    "discharge_date": str(row[34]) if row[34] else None,
-                    "length_of_stay": row[35]
-                },
-                "health_indicators": {
-                    "malaria_test_done": row[36],
-                    "hiv_status_known": row[37],
-                    "tb_screening_done": row[38],
-                    "maternal_health": row[39],
-                    "child_under_5": row[40],
-                    "emergency_case": row[41]
-                },
-                "additional": {
-                    "claim_type": row[42],
-                    "authorization_number": row[43],
-                    "created_at": str(row[44]) if row[44] else None,
-                    "updated_at": str(row[45]) if row[45] else None,
-                    "notes": row[46],
-                    "reviewed_by": row[47],
-                    "reviewed_date": str(row[48]) if row[48] else None
-                }
-            })
-        
-        return json.dumps({
+        return _fit_claim_details({
             "success": True,
             "count": len(claims),
             "claims": claims
-        }, indent=2)
+        }, max_bytes)
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
 
 
 @mcp.tool(exclude_args=HIDDEN_ARGS)
-def check_claim_status(
+@instrumented
+async def check_claim_status(
     claim_number: str, 
     chatInput: str = None, 
     toolCallId: str = None,
@@ -522,66 +405,140 @@ def check_claim_status(
     Args:
         claim_number: Unique claim number (e.g., 'ZNB-2024-001')
     """
-    claim_number = claim_number.replace("'", "''")
-    
-    query = f"""
-        SELECT 
-            claim_id,
-            claim_number,
-            patient_first_name,
-            patient_last_name,
-            claim_status,
-            received_date,
-            processed_date,
-            payment_date,
-            submitted_amount,
-            allowed_amount,
-            paid_amount,
-            reviewed_by,
-            reviewed_date,
-            notes
-        FROM tanzania_claims
-        WHERE claim_number = '{claim_number}'
-    """
-    
+    return await claim_cache.get_or_load(
+        ("check_claim_status", claim_number), lambda: _check_claim_status(claim_number), _cacheable
+    )
+
+
+async def _check_claim_status(claim_number: str) -> str:
     try:
-        results = execute_query(query)
+        results = await execute_query(queries.CHECK_CLAIM_STATUS, {"claim_number": claim_number}, row_factory=mapping.CLAIM_STATUS)
         
         if not results:
-            return json.dumps({
+            return dumps({
                 "success": False,
                 "message": f"No claim found with number: {claim_number}"
             })
         
-        row = results[0]
-        
-        return json.dumps({
+        return dumps({
             "success": True,
-            "claim": {
-                "claim_id": row[0],
-                "claim_number": row[1],
-                "patient_name": f"{row[2]} {row[3]}",
-                "claim_status": row[4],
-                "received_date": str(row[5]) if row[5] else None,
-                "processed_date": str(row[6]) if row[6] else None,
-                "payment_date": str(row[7]) if row[7] else None,
-                "submitted_amount": float(row[8]) if row[8] else 0,
-                "allowed_amount": float(row[9]) if row[9] else 0,
-                "paid_amount": float(row[10]) if row[10] else 0,
-                "reviewed_by": row[11],
-                "reviewed_date": str(row[12]) if row[12] else None,
-                "notes": row[13]
+            "claim": results[0]
+        })
+    except Exception as e:
+        return dumps({"error": str(e)})
+
+
+def _parse_month(value: str):
+    """'YYYY-MM' to the first day of that month; raises ValueError on anything else."""
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+@mcp.tool(exclude_args=HIDDEN_ARGS)
+@instrumented
+async def summarize_claims(
+    group_by: str = "status", 
+    claim_status: str = "", 
+    insurance_scheme: str = "", 
+    patient_region: str = "", 
+    provider_type: str = "", 
+    service_type: str = "", 
+    month_from: str = "", 
+    month_to: str = "", 
+    limit: int = 100, 
+    chatInput: str = None, 
+    toolCallId: str = None,
+    thread_id: str = None,
+    user_message: str = None,
+    conversation_history: str = None,
+    messages_array: list = None,
+    total_messages: int = None
+) -> str:
+    """
+    Count claims and total their submitted, allowed and paid amounts, grouped and filtered.
+    Use this instead of listing claims to answer "how many / how much" questions.
+    
+    Args:
+        group_by: Comma-separated groupings from status, scheme, region, provider_type, service_type, month (empty for totals only, default: status)
+        claim_status: Only claims in this status ('Approved', 'Rejected', or 'Pending') (optional)
+        insurance_scheme: Only claims under this insurance scheme (optional)
+        patient_region: Only claims of patients in this region (optional)
+        provider_type: Only claims from this provider type (optional)
+        service_type: Only claims for this service type (optional)
+        month_from: First service month to include, as YYYY-MM (optional)
+        month_to: Last service month to include, as YYYY-MM (optional)
+        limit: Maximum number of groups to return (1-1000, default: 100)
+    """
+    keys = tuple(key.strip() for key in group_by.split(",") if key.strip())
+    unknown = [key for key in keys if key not in queries.SUMMARY_DIMENSIONS]
+    if unknown:
+        return dumps({"error": f"Unknown group_by {', '.join(unknown)}; use {', '.join(queries.SUMMARY_DIMENSIONS)}"})
+    keys = tuple(dict.fromkeys(keys))
+    
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return dumps({"error": f"Limit must be between 1 and {MAX_PAGE_SIZE}"})
+    
+    if claim_status and claim_status not in ['Approved', 'Rejected', 'Pending']:
+        return dumps({"error": "claim_status must be 'Approved', 'Rejected', or 'Pending'"})
+    
+    try:
+        months = {name: _parse_month(value) if value else None for name, value in (("month_from", month_from), ("month_to", month_to))}
+    except ValueError:
+        return dumps({"error": "month_from and month_to must be formatted YYYY-MM"})
+    
+    params = {
+        "claim_status": claim_status or None,
+        "insurance_scheme": insurance_scheme or None,
+        "patient_region": patient_region or None,
+        "provider_type": provider_type or None,
+        "service_type": service_type or None,
+        **months,
+        # the total row, the groups, and one more to tell whether groups were cut off
+        "limit": limit + 2,
+    }
+    
+    try:
+        results = await execute_query(queries.summarize_claims_statement(keys, params), params)
+        
+        totals = {"claim_count": 0, "submitted_amount": 0.0, "allowed_amount": 0.0, "paid_amount": 0.0}
+        groups = []
+        for row in results:
+            dimensions, (is_total, claim_count, submitted, allowed, paid) = row[:len(keys)], row[len(keys):]
+            amounts = {
+                "claim_count": claim_count,
+                "submitted_amount": float(submitted),
+                "allowed_amount": float(allowed),
+                "paid_amount": float(paid)
             }
-        }, indent=2)
+            if is_total:
+                totals = amounts
+                continue
+            group = {}
+            for key, value in zip(keys, dimensions):
+                group[key] = value.strftime("%Y-%m") if key == "month" else value
+            group.update(amounts)
+            groups.append(group)
+        
+        return dumps({
+            "success": True,
+            "group_by": list(keys),
+            "filter": {name: (value.strftime("%Y-%m") if hasattr(value, "strftime") else value)
+                       for name, value in params.items() if name != "limit" and value is not None},
+            "totals": totals,
+            "count": min(len(groups), limit),
+            "groups": groups[:limit],
+            "truncated": len(groups) > limit
+        })
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
 
 
 @mcp.tool(exclude_args=HIDDEN_ARGS)
-def approve_claim(
+@instrumented
+async def approve_claim(
     claim_number: str, 
     reviewed_by: str = "", 
     notes: str = "", 
+    expected_status: str = "", 
     chatInput: str = None, 
     toolCallId: str = None,
     thread_id: str = None,
@@ -597,15 +554,18 @@ def approve_claim(
         claim_number: Unique claim number (e.g., 'ZNB-2024-001')
         reviewed_by: Name of the person reviewing the claim (optional)
         notes: Notes about the decision (optional)
+        expected_status: Only change the claim if it is still in this status, e.g. 'Pending' (optional)
     """
-    return _update_claim_status_internal(claim_number, "Approved", reviewed_by, notes)
+    return await _update_claim_status_internal(claim_number, "Approved", reviewed_by, notes, expected_status)
 
 
 @mcp.tool(exclude_args=HIDDEN_ARGS)
-def reject_claim(
+@instrumented
+async def reject_claim(
     claim_number: str, 
     reviewed_by: str = "", 
     notes: str = "", 
+    expected_status: str = "", 
     chatInput: str = None, 
     toolCallId: str = None,
     thread_id: str = None,
@@ -621,126 +581,443 @@ def reject_claim(
         claim_number: Unique claim number (e.g., 'ZNB-2024-001')
         reviewed_by: Name of the person reviewing the claim (optional)
         notes: Notes about the decision (optional)
+        expected_status: Only change the claim if it is still in this status, e.g. 'Pending' (optional)
     """
-    return _update_claim_status_internal(claim_number, "Rejected", reviewed_by, notes)
+    return await _update_claim_status_internal(claim_number, "Rejected", reviewed_by, notes, expected_status)
 
 
-def _update_claim_status_internal(claim_number: str, new_status: str, reviewed_by: str, notes: str) -> str:
-    """Internal function to update claim status"""
-    claim_number = claim_number.replace("'", "''")
-    reviewed_by = reviewed_by.replace("'", "''") if reviewed_by else ""
-    notes = notes.replace("'", "''") if notes else ""
+async def _update_claim_status_internal(claim_number: str, new_status: str, reviewed_by: str, notes: str, expected_status: str = "") -> str:
+    """Internal function to update claim status in a single locked UPDATE ... RETURNING"""
+    if expected_status and expected_status not in ['Approved', 'Rejected', 'Pending']:
+        return dumps({"error": "expected_status must be 'Approved', 'Rejected', or 'Pending'"})
     
-    check_query = f"""
-        SELECT claim_id, claim_status, submitted_amount, allowed_amount
-        FROM tanzania_claims
-        WHERE claim_number = '{claim_number}'
-    """
+    params = {
+        "claim_number": claim_number,
+        "reviewed_by": reviewed_by or "",
+        "notes": notes or "",
+        "expected_status": expected_status or None,
+    }
+    statement = queries.APPROVE_CLAIM if new_status == "Approved" else queries.REJECT_CLAIM
     
     try:
-        results = execute_query(check_query)
+        updated_results = await execute_returning(statement, params, row_factory=mapping.UPDATED_CLAIM)
         
-        if not results:
-            return json.dumps({
+        if not updated_results:
+            # Only the failure path pays for a second round trip, to explain what happened
+            current = await execute_query(queries.GET_CLAIM_STATUS, {"claim_number": claim_number})
+            if not current:
+                return dumps({
+                    "success": False,
+                    "message": f"No claim found with number: {claim_number}"
+                })
+            return dumps({
                 "success": False,
-                "message": f"No claim found with number: {claim_number}"
+                "message": f"Claim {claim_number} is {current[0][0]}, expected {expected_status}; not updated",
+                "current_status": current[0][0]
             })
         
-        claim_id, current_status, submitted_amount, allowed_amount = results[0]
-        
-        reviewed_by_clause = f", reviewed_by = '{reviewed_by}'" if reviewed_by else ""
-        notes_clause = f", notes = '{notes}'" if notes else ""
+        updated = updated_results[0]
+        # The trigger's NOTIFY arrives asynchronously; drop our own entries right away
+        claim_cache.invalidate(claim_numbers=[claim_number], patient_ids=[updated.pop("patient_id")])
         
-        if new_status == "Approved":
-            paid_amount = allowed_amount if allowed_amount else submitted_amount
-            update_query = f"""
-                UPDATE tanzania_claims
-                SET 
-                    claim_status = '{new_status}',
-                    processed_date = CURRENT_DATE,
-                    payment_date = CURRENT_DATE + INTERVAL '2 days',
-                    paid_amount = {paid_amount},
-                    reviewed_date = CURRENT_DATE,
-                    updated_at = CURRENT_TIMESTAMP
-                    {reviewed_by_clause}
-                    {notes_clause}
-                WHERE claim_number = '{claim_number}'
-            """
+        return dumps({
+            "success": True,
+            "message": f"Claim {new_status.lower()} successfully",
+            "previous_status": updated["previous_status"],
+            "rows_updated": len(updated_results),
+            "updated_claim": updated["updated_claim"]
+        })
+    except Exception as e:
+        return dumps({"error": str(e)})
+
+
+class ClaimDecision(BaseModel):
+    claim_number: str
+    decision: str
+    reviewed_by: str = ""
+    notes: str = ""
+    expected_status: str = ""
+
+
+@mcp.tool(exclude_args=HIDDEN_ARGS)
+@instrumented
+async def bulk_update_claim_status(
+    items: List[ClaimDecision], 
+    reviewed_by: str = "", 
+    notes: str = "", 
+    only_failures: bool = False, 
+    chatInput: str = None, 
+    toolCallId: str = None,
+    thread_id: str = None,
+    user_message: str = None,
+    conversation_history: str = None,
+    messages_array: list = None,
+    total_messages: int = None
+) -> str:
+    """
+    Approve or reject many claims in one call, e.g. all claims on a remittance.
+    
+    Args:
+        items: Claims to update, each with claim_number, decision ('approve' or 'reject'), and optional reviewed_by, notes and expected_status (only update if the claim is still in this status, e.g. 'Pending')
+        reviewed_by: Reviewer applied to items that do not name one (optional)
+        notes: Notes applied to items that do not have their own (optional)
+        only_failures: Only list claims that were not updated in the results (default: false)
+    """
+    if not items:
+        return dumps({"error": "items must contain at least one claim"})
+    if len(items) > BULK_MAX_ITEMS:
+        return dumps({"error": f"At most {BULK_MAX_ITEMS} claims per call"})
+    
+    # Items that can be rejected without touching the database are reported per item
+    failures = {}
+    seen = set()
+    valid = []
+    for index, item in enumerate(items):
+        decision = DECISIONS.get(item.decision.strip().lower())
+        if decision is None:
+            failures[index] = {"claim_number": item.claim_number, "outcome": "invalid", "message": "decision must be 'approve' or 'reject'"}
+        elif item.expected_status and item.expected_status not in ['Approved', 'Rejected', 'Pending']:
+            failures[index] = {"claim_number": item.claim_number, "outcome": "invalid", "message": "expected_status must be 'Approved', 'Rejected', or 'Pending'"}
+        elif item.claim_number in seen:
+            failures[index] = {"claim_number": item.claim_number, "outcome": "invalid", "message": "claim_number appears more than once in this batch"}
         else:
-            update_query = f"""
-                UPDATE tanzania_claims
-                SET 
-                    claim_status = '{new_status}',
-                    processed_date = CURRENT_DATE,
-                    paid_amount = 0,
-                    reviewed_date = CURRENT_DATE,
-                    updated_at = CURRENT_TIMESTAMP
-                    {reviewed_by_clause}
-                    {notes_clause}
-                WHERE claim_number = '{claim_number}'
-            """
+            seen.add(item.claim_number)
+            valid.append((index, item, decision))
+    
+    try:
+        rows = []
+        if valid:
+            rows = await execute_returning(queries.BULK_UPDATE_CLAIM_STATUS, {
+                "claim_numbers": [item.claim_number for _, item, _ in valid],
+                "decisions": [decision for _, _, decision in valid],
+                "reviewers": [item.reviewed_by or reviewed_by or "" for _, item, _ in valid],
+                "notes": [item.notes or notes or "" for _, item, _ in valid],
+                "expected_statuses": [item.expected_status or None for _, item, _ in valid],
+            })
         
-        rows_affected = execute_update(update_query)
+        claim_cache.invalidate(
+            claim_numbers=[row[0] for row in rows if row[2] is not None],
+            patient_ids=[row[4] for row in rows if row[2] is not None],
+        )
         
-        if rows_affected == 0:
-            return json.dumps({
-                "success": False,
-                "message": "Failed to update claim status"
-            })
+        outcomes = dict(failures)
+        for (index, item, decision), row in zip(valid, rows):
+            claim_number, previous_status, new_status, paid_amount, _ = row
+            if previous_status is None:
+                outcomes[index] = {"claim_number": claim_number, "outcome": "not_found"}
+            elif new_status is None:
+                outcomes[index] = {
+                    "claim_number": claim_number,
+                    "outcome": "status_mismatch",
+                    "current_status": previous_status,
+                    "expected_status": item.expected_status,
+                }
+            else:
+                outcomes[index] = {
+                    "claim_number": claim_number,
+                    "outcome": "updated",
+                    "previous_status": previous_status,
+                    "claim_status": new_status,
+                    "paid_amount": float(paid_amount) if paid_amount else 0,
+                }
         
-        details_query = f"""
-            SELECT 
-                claim_id, claim_number, patient_first_name, patient_last_name,
-                service_date, service_type, service_description,
-                diagnosis_description, submitted_amount, allowed_amount, 
-                paid_amount, patient_responsibility,
-                claim_status, received_date, processed_date, payment_date,
-                reviewed_by, reviewed_date, notes
-            FROM tanzania_claims
-            WHERE claim_number = '{claim_number}'
-        """
+        results = [outcomes[index] for index in range(len(items))]
+        updated = sum(1 for result in results if result["outcome"] == "updated")
+        if only_failures:
+            results = [result for result in results if result["outcome"] != "updated"]
         
-        updated_results = execute_query(details_query)
-        row = updated_results[0]
+        return dumps({
+            "success": True,
+            "requested": len(items),
+            "updated": updated,
+            "failed": len(items) - updated,
+            "results": results
+        })
+    except Exception as e:
+        return dumps({"error": str(e)})
+
+
+@mcp.custom_route("/cache/stats", methods=["GET"])
+async def cache_stats(request: Request) -> JSONResponse:
+    """Hit ratio, size and invalidation counters of the claim cache."""
+    return JSONResponse(claim_cache.stats())
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """Per-tool call, error, latency, row and response-size metrics in Prometheus text format."""
+    pool = pool_stats()
+    cache = claim_cache.stats()
+    return PlainTextResponse(metrics.render({
+        "mcp_db_pool_size": ("Open database connections.", pool.get("pool_size", 0)),
+        "mcp_db_pool_available": ("Idle database connections.", pool.get("pool_available", 0)),
+        "mcp_db_pool_requests_waiting": ("Tool calls waiting for a database connection.", pool.get("requests_waiting", 0)),
+        "mcp_claim_cache_entries": ("Cached claim responses.", cache["entries"]),
+        "mcp_claim_cache_bytes": ("Size of cached claim responses.", cache["bytes"]),
+    }), media_type="text/plain; version=0.0.4")
+
+
+class ExtractedClaim(BaseModel):
+    reference: str = ""
+    claim_number: str = ""
+    patient_id: str = ""
+    patient_name: str = ""
+    patient_dob: Optional[date] = None
+    service_date: Optional[date] = None
+    provider_name: str = ""
+    submitted_amount: Optional[float] = None
+
+
+@mcp.tool(exclude_args=HIDDEN_ARGS)
+@instrumented
+async def match_extracted_claims(
+    records: List[ExtractedClaim], 
+    top_k: int = 3, 
+    date_tolerance_days: int = 3, 
+    amount_tolerance: float = 0.05, 
+    only_exceptions: bool = False, 
+    chatInput: str = None, 
+    toolCallId: str = None,
+    thread_id: str = None,
+    user_message: str = None,
+    conversation_history: str = None,
+    messages_array: list = None,
+    total_messages: int = None
+) -> str:
+    """
+    Match claims extracted from documents against the database in one call, instead of looking them up one by one.
+    Each record gets its best matching claims with a score and, for the best one, the fields that disagree.
+    
+    Args:
+        records: Extracted claims, each with any of reference (your own ID for the record), claim_number, patient_id, patient_name, patient_dob (YYYY-MM-DD), service_date (YYYY-MM-DD), provider_name, submitted_amount
+        top_k: Candidate claims to return per record (1-10, default: 3)
+        date_tolerance_days: How many days service dates may differ and still match (0-30, default: 3)
+        amount_tolerance: Relative amount difference at which the amount stops counting as a match (default: 0.05 = 5%)
+        only_exceptions: Only return records that are not a confident match without discrepancies (default: false)
+    """
+    if not records:
+        return dumps({"error": "records must contain at least one claim"})
+    if len(records) > MATCH_MAX_RECORDS:
+        return dumps({"error": f"At most {MATCH_MAX_RECORDS} records per call"})
+    if top_k < 1 or top_k > 10:
+        return dumps({"error": "top_k must be between 1 and 10"})
+    if date_tolerance_days < 0 or date_tolerance_days > 30:
+        return dumps({"error": "date_tolerance_days must be between 0 and 30"})
+    if amount_tolerance < 0:
+        return dumps({"error": "amount_tolerance must be 0 or more"})
+    
+    try:
+        results = await match_records(records, top_k, date_tolerance_days, amount_tolerance)
+        
+        outcomes = {"matched": 0, "review": 0, "unmatched": 0}
+        for result in results:
+            outcomes[result["outcome"]] += 1
+        if only_exceptions:
+            results = [result for result in results if result["outcome"] != "matched" or result.get("discrepancies")]
         
-        return json.dumps({
+        return dumps({
             "success": True,
-            "message": f"Claim {new_status.lower()} successfully",
-            "previous_status": current_status,
-            "rows_updated": rows_affected,
-            "updated_claim": {
-                "claim_id": row[0],
-                "claim_number": row[1],
-                "patient_name": f"{row[2]} {row[3]}",
-                "service_date": str(row[4]),
-                "service_type": row[5],
-                "service_description": row[6],
-                "diagnosis": row[7],
-                "financial": {
-                    "submitted_amount": float(row[8]) if row[8] else 0,
-                    "allowed_amount": float(row[9]) if row[9] else 0,
-                    "paid_amount": float(row[10]) if row[10] else 0,
-                    "patient_responsibility": float(row[11]) if row[11] else 0
-                },
-                "status": {
-                    "claim_status": row[12],
-                    "received_date": str(row[13]) if row[13] else None,
-                    "processed_date": str(row[14]) if row[14] else None,
-                    "payment_date": str(row[15]) if row[15] else None
-                },
-                "review": {
-                    "reviewed_by": row[16],
-                    "reviewed_date": str(row[17]) if row[17] else None,
-                    "notes": row[18]
-                }
-            }
-        }, indent=2)
+            "records": len(records),
+            **outcomes,
+            "results": results
+        })
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
 
 
-if __name__ == "__main__":
+@mcp.tool(exclude_args=HIDDEN_ARGS)
+@instrumented
+async def find_duplicate_claims(
+    min_score: float = 0.7, 
+    date_window_days: int = 3, 
+    amount_tolerance: float = 0.05, 
+    require_same_procedure: bool = False, 
+    patient_id: str = "", 
+    limit: int = 50, 
+    refresh: bool = False, 
+    chatInput: str = None, 
+    toolCallId: str = None,
+    thread_id: str = None,
+    user_message: str = None,
+    conversation_history: str = None,
+    messages_array: list = None,
+    total_messages: int = None
+) -> str:
+    """
+    Find likely duplicate billing: pairs of claims for the same patient with close service dates, often the same procedure, provider and amount, under different claim numbers.
+    Highest scoring pairs first.
+    
+    Args:
+        min_score: Minimum similarity score between 0 and 1 (default: 0.7)
+        date_window_days: Maximum days between the two service dates (default: 3)
+        amount_tolerance: Relative amount difference at which amounts stop counting as the same (default: 0.05 = 5%)
+        require_same_procedure: Only pairs with the same procedure code (default: false)
+        patient_id: Only pairs for this patient (optional)
+        limit: Maximum number of pairs to return (1-1000, default: 50)
+        refresh: Advance the duplicate scan before answering instead of relying on the background scan; can take several seconds (default: false)
+    """
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return dumps({"error": f"Limit must be between 1 and {MAX_PAGE_SIZE}"})
+    if date_window_days < 0 or date_window_days > scan_window_days:
+        return dumps({"error": f"date_window_days must be between 0 and {scan_window_days}"})
+    if min_score < 0 or min_score > 1:
+        return dumps({"error": "min_score must be between 0 and 1"})
+    if amount_tolerance < 0:
+        return dumps({"error": "amount_tolerance must be 0 or more"})
+    
     try:
-        mcp.run()
-    finally:
-        close_connection()
\ No newline at end of file
+        refreshed = await scan_duplicates() if refresh else None
+        scan = await scan_status()
+        if refreshed is not None:
+            scan["refresh"] = refreshed
+        results = await execute_query(queries.FIND_DUPLICATE_CLAIMS, {
+            "min_score": min_score,
+            "window": date_window_days,
+            "amount_tolerance": amount_tolerance,
+            "require_same_procedure": require_same_procedure,
+            "patient_id": patient_id or None,
+            "limit": limit,
+        })
+        
+        pairs = []
+        for row in results:
+            score, days_apart, same_procedure, same_provider, amount_delta, pair_patient_id = row[:6]
+            claims = []
+            for claim_number, service_date, procedure_code, provider_name, submitted_amount, claim_status in (row[6:12], row[12:18]):
+                claims.append({
+                    "claim_number": claim_number,
+                    "service_date": str(service_date) if service_date else None,
+                    "procedure_code": procedure_code,
+                    "provider_name": provider_name,
+                    "submitted_amount": float(submitted_amount) if submitted_amount else 0,
+                    "claim_status": claim_status
+                })
+            pairs.append({
+                "score": float(score),
+                "patient_id": pair_patient_id,
+                "days_apart": days_apart,
+                "same_procedure": same_procedure,
+                "same_provider": same_provider,
+                "amount_difference": float(amount_delta) if amount_delta is not None else None,
+                "claims": claims
+            })
+        
+        return dumps({
+            "success": True,
+            "count": len(pairs),
+            "pairs": pairs,
+            "scan": scan
+        })
+    except Exception as e:
+        return dumps({"error": str(e)})
+
+
+@mcp.tool(exclude_args=HIDDEN_ARGS)
+@instrumented
+async def ingest_claims(
+    path: str = "", 
+    records: List[dict] = None, 
+    file_format: str = "", 
+    dry_run: bool = False, 
+    chatInput: str = None, 
+    toolCallId: str = None,
+    thread_id: str = None,
+    user_message: str = None,
+    conversation_history: str = None,
+    messages_array: list = None,
+    total_messages: int = None
+) -> str:
+    """
+    Load new or corrected claims into the database, inserting new claim numbers and updating existing ones.
+    Each record is checked against the claims table first; invalid records are skipped and listed in a rejection file.
+    
+    Args:
+        path: A CSV or JSONL file in the ingest directory, e.g. a monthly provider submission
+        records: Claim records (e.g. structured OCR output) keyed by column name, instead of a file (max 10000)
+        file_format: "csv" or "jsonl" (default: from the file extension)
+        dry_run: Only validate and report, without changing any claims (default: false)
+    """
+    if bool(path) == bool(records):
+        return dumps({"error": "Provide either path or records"})
+    if file_format not in ("", "csv", "jsonl"):
+        return dumps({"error": "file_format must be csv or jsonl"})
+    if records and len(records) > INGEST_MAX_RECORDS:
+        return dumps({"error": f"At most {INGEST_MAX_RECORDS} records per call, use a file for larger loads"})
+    
+    try:
+        if path:
+            report = await ingest_file(resolve_path(path), file_format, dry_run)
+        else:
+            report = await ingest(enumerate(records, start=1), source="records", dry_run=dry_run)
+        return dumps({"success": True, **report})
+    except Exception as e:
+        return dumps({"error": str(e)})
+
+
+@mcp.tool(exclude_args=HIDDEN_ARGS)
+@instrumented
+async def search_claims(
+    query: str, 
+    claim_status: str = "", 
+    patient_region: str = "", 
+    service_date_from: str = "", 
+    service_date_to: str = "", 
+    limit: int = 10, 
+    chatInput: str = None, 
+    toolCallId: str = None,
+    thread_id: str = None,
+    user_message: str = None,
+    conversation_history: str = None,
+    messages_array: list = None,
+    total_messages: int = None
+) -> str:
+    """
+    Search claims by a possibly misspelled or partial patient name, provider name, or words from the diagnosis, service description or notes.
+    Use this when the claim number and patient ID are unknown. Best matches first, each with a 0-1 score.
+    
+    Args:
+        query: Text to search for, e.g. "Amina Mwakyusa", "Muhimbili", "malaria fever"
+        claim_status: Only claims in this status ('Approved', 'Rejected', or 'Pending') (optional)
+        patient_region: Only claims of patients in this region (optional)
+        service_date_from: First service date to include, as YYYY-MM-DD (optional)
+        service_date_to: Last service date to include, as YYYY-MM-DD (optional)
+        limit: Maximum number of claims to return (1-100, default: 10)
+    """
+    if not query.strip():
+        return dumps({"error": "query must not be empty"})
+    
+    if limit < 1 or limit > SEARCH_MAX_RESULTS:
+        return dumps({"error": f"Limit must be between 1 and {SEARCH_MAX_RESULTS}"})
+    
+    if claim_status and claim_status not in ['Approved', 'Rejected', 'Pending']:
+        return dumps({"error": "claim_status must be 'Approved', 'Rejected', or 'Pending'"})
+    
+    try:
+        date_from = date.fromisoformat(service_date_from) if service_date_from else None
+        date_to = date.fromisoformat(service_date_to) if service_date_to else None
+    except ValueError:
+        return dumps({"error": "service_date_from and service_date_to must be YYYY-MM-DD"})
+    
+    try:
+        claims = await execute_query(queries.SEARCH_CLAIMS, {
+            "query": query.strip(),
+            "status": claim_status or None,
+            "region": patient_region or None,
+            "service_date_from": date_from,
+            "service_date_to": date_to,
+            "candidates": SEARCH_CANDIDATES,
+            "limit": limit,
+        }, row_factory=mapping.SEARCH_RESULT)
+        
+        return dumps({
+            "success": True,
+            "count": len(claims),
+            "query": query.strip(),
+            "claims": claims
+        })
+    except Exception as e:
+        return dumps({"error": str(e)})
+
+
+if __name__ == "__main__":
+    mcp.run()
\ No newline at end of file
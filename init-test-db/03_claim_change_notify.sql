@@ -0,0 +1,30 @@
+-- Publishes every change to tanzania_claims on the tanzania_claims_changed
+-- channel, so services caching claims (claims-rec-mcp) can drop stale entries.
+-- The payload names the claim and patient, old and new, in case either moved.
+CREATE OR REPLACE FUNCTION notify_tanzania_claims_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('tanzania_claims_changed', json_build_object('op', TG_OP, 'truncate', true)::text);
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify('tanzania_claims_changed', json_build_object(
+        'op', TG_OP,
+        'claim_number', CASE WHEN TG_OP = 'DELETE' THEN OLD.claim_number ELSE NEW.claim_number END,
+        'patient_id', CASE WHEN TG_OP = 'DELETE' THEN OLD.patient_id ELSE NEW.patient_id END,
+        'old_claim_number', CASE WHEN TG_OP = 'UPDATE' THEN OLD.claim_number END,
+        'old_patient_id', CASE WHEN TG_OP = 'UPDATE' THEN OLD.patient_id END
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tanzania_claims_changed ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_changed
+    AFTER INSERT OR UPDATE OR DELETE ON tanzania_claims
+    FOR EACH ROW EXECUTE FUNCTION notify_tanzania_claims_changed();
+
+DROP TRIGGER IF EXISTS tanzania_claims_truncated ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_truncated
+    AFTER TRUNCATE ON tanzania_claims
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_tanzania_claims_changed();
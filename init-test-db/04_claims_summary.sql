@@ -0,0 +1,113 @@
+-- Pre-aggregated claim counts and amounts for the summarize_claims MCP tool.
+-- One row per (status, scheme, region, provider type, service type, service
+-- month); statement-level triggers fold every change to tanzania_claims into
+-- it as deltas, so the summary is always current without rescanning claims.
+CREATE TABLE IF NOT EXISTS tanzania_claims_summary (
+    claim_status VARCHAR(20),
+    insurance_scheme VARCHAR(100),
+    patient_region VARCHAR(50),
+    provider_type VARCHAR(100),
+    service_type VARCHAR(100),
+    service_month DATE NOT NULL,
+    claim_count BIGINT NOT NULL DEFAULT 0,
+    submitted_amount NUMERIC(18,2) NOT NULL DEFAULT 0,
+    allowed_amount NUMERIC(18,2) NOT NULL DEFAULT 0,
+    paid_amount NUMERIC(18,2) NOT NULL DEFAULT 0
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tanzania_claims_summary_key ON tanzania_claims_summary
+    (claim_status, insurance_scheme, patient_region, provider_type, service_type, service_month) NULLS NOT DISTINCT;
+CREATE INDEX IF NOT EXISTS idx_tanzania_claims_summary_month_status ON tanzania_claims_summary(service_month, claim_status);
+
+-- Adds the signed per-group totals of a change set to the summary; groups are
+-- upserted in key order so concurrent statements lock summary rows in the same order.
+CREATE OR REPLACE FUNCTION apply_tanzania_claims_summary_delta() RETURNS trigger AS $$
+DECLARE
+    changes TEXT;
+BEGIN
+    -- Only the transition tables of the firing event exist, so the source is chosen per event
+    changes := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS sign, * FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT -1 AS sign, * FROM old_rows'
+        ELSE 'SELECT 1 AS sign, * FROM new_rows UNION ALL SELECT -1 AS sign, * FROM old_rows'
+    END;
+
+    EXECUTE format($sql$
+        WITH changes AS (%s),
+        deltas AS (
+            SELECT
+                claim_status, insurance_scheme, patient_region, provider_type, service_type,
+                date_trunc('month', service_date)::date AS service_month,
+                sum(sign) AS claim_count,
+                sum(sign * COALESCE(submitted_amount, 0)) AS submitted_amount,
+                sum(sign * COALESCE(allowed_amount, 0)) AS allowed_amount,
+                sum(sign * COALESCE(paid_amount, 0)) AS paid_amount
+            FROM changes
+            GROUP BY 1, 2, 3, 4, 5, 6
+        )
+        INSERT INTO tanzania_claims_summary AS s (
+            claim_status, insurance_scheme, patient_region, provider_type, service_type, service_month,
+            claim_count, submitted_amount, allowed_amount, paid_amount
+        )
+        SELECT * FROM deltas
+        -- Updates that leave status, dimensions and amounts alone (e.g. notes) change nothing
+        WHERE claim_count <> 0 OR submitted_amount <> 0 OR allowed_amount <> 0 OR paid_amount <> 0
+        ORDER BY 1, 2, 3, 4, 5, 6
+        ON CONFLICT (claim_status, insurance_scheme, patient_region, provider_type, service_type, service_month)
+        DO UPDATE SET
+            claim_count = s.claim_count + EXCLUDED.claim_count,
+            submitted_amount = s.submitted_amount + EXCLUDED.submitted_amount,
+            allowed_amount = s.allowed_amount + EXCLUDED.allowed_amount,
+            paid_amount = s.paid_amount + EXCLUDED.paid_amount
+    $sql$, changes);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recomputes the summary from scratch, for the initial load or to repair drift.
+CREATE OR REPLACE FUNCTION rebuild_tanzania_claims_summary() RETURNS void AS $$
+BEGIN
+    LOCK TABLE tanzania_claims IN SHARE MODE;
+    DELETE FROM tanzania_claims_summary;
+    INSERT INTO tanzania_claims_summary (
+        claim_status, insurance_scheme, patient_region, provider_type, service_type, service_month,
+        claim_count, submitted_amount, allowed_amount, paid_amount
+    )
+    SELECT
+        claim_status, insurance_scheme, patient_region, provider_type, service_type,
+        date_trunc('month', service_date)::date,
+        count(*), COALESCE(sum(submitted_amount), 0), COALESCE(sum(allowed_amount), 0), COALESCE(sum(paid_amount), 0)
+    FROM tanzania_claims
+    GROUP BY 1, 2, 3, 4, 5, 6;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION clear_tanzania_claims_summary() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM tanzania_claims_summary;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS tanzania_claims_summary_insert ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_summary_insert
+    AFTER INSERT ON tanzania_claims REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tanzania_claims_summary_delta();
+
+DROP TRIGGER IF EXISTS tanzania_claims_summary_update ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_summary_update
+    AFTER UPDATE ON tanzania_claims REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tanzania_claims_summary_delta();
+
+DROP TRIGGER IF EXISTS tanzania_claims_summary_delete ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_summary_delete
+    AFTER DELETE ON tanzania_claims REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tanzania_claims_summary_delta();
+
+DROP TRIGGER IF EXISTS tanzania_claims_summary_truncate ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_summary_truncate
+    AFTER TRUNCATE ON tanzania_claims
+    FOR EACH STATEMENT EXECUTE FUNCTION clear_tanzania_claims_summary();
+
+SELECT rebuild_tanzania_claims_summary();
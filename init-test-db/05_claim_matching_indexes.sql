@@ -0,0 +1,3 @@
+-- Blocking index for the claim matching engine (claims-rec-mcp/matching.py):
+-- candidates by date of birth within a few days of the service date.
+CREATE INDEX IF NOT EXISTS idx_tanzania_claims_patient_dob_service_date ON tanzania_claims(patient_dob, service_date);
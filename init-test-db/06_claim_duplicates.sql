@@ -0,0 +1,29 @@
+-- Candidate duplicate claim pairs found by the find_duplicate_claims MCP tool,
+-- and the watermark of its incremental scan. Each pair stores the raw
+-- comparison features; the tool scores and filters them with the caller's thresholds.
+CREATE TABLE IF NOT EXISTS claim_duplicates (
+    claim_id_a INTEGER NOT NULL REFERENCES tanzania_claims(claim_id) ON DELETE CASCADE,
+    claim_id_b INTEGER NOT NULL REFERENCES tanzania_claims(claim_id) ON DELETE CASCADE,
+    days_apart INTEGER NOT NULL,
+    same_procedure BOOLEAN NOT NULL,
+    same_provider BOOLEAN NOT NULL,
+    amount_delta NUMERIC(8,4),
+    detected_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (claim_id_a, claim_id_b),
+    CHECK (claim_id_a < claim_id_b)
+);
+
+CREATE INDEX IF NOT EXISTS idx_claim_duplicates_claim_id_b ON claim_duplicates(claim_id_b);
+
+-- Single row: the (updated_at, claim_id) of the last claim the scan has checked
+CREATE TABLE IF NOT EXISTS claim_duplicate_scan (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    last_updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT '-infinity',
+    last_claim_id INTEGER NOT NULL DEFAULT 0,
+    last_run_at TIMESTAMP WITH TIME ZONE
+);
+
+INSERT INTO claim_duplicate_scan DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+-- The scan walks claims in (updated_at, claim_id) order
+CREATE INDEX IF NOT EXISTS idx_tanzania_claims_updated_at_claim_id ON tanzania_claims(updated_at, claim_id);
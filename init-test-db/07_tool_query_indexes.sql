@@ -0,0 +1,45 @@
+-- Versioned schema changes: scripts from 03 onwards are recorded here once
+-- applied, so claims-rec-mcp/migrate.py can bring an existing database up to date.
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(100) PRIMARY KEY,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Indexes matched to the MCP tool queries (claims-rec-mcp/queries.py).
+
+-- list_recent_claims: newest first by (received_date, claim_id), read backwards
+CREATE INDEX IF NOT EXISTS idx_tanzania_claims_received_date_claim_id
+    ON tanzania_claims(received_date, claim_id);
+
+-- list_claims_by_status: one status, oldest first, keyset on (received_date, claim_id)
+CREATE INDEX IF NOT EXISTS idx_tanzania_claims_status_received_date_claim_id
+    ON tanzania_claims(claim_status, received_date, claim_id);
+
+-- list_old_pending_claims: Pending claims only, oldest first; covers the listed
+-- columns so the page is an index-only scan on a mostly all-visible table
+CREATE INDEX IF NOT EXISTS idx_tanzania_claims_pending_received_date_claim_id
+    ON tanzania_claims(received_date, claim_id)
+    INCLUDE (claim_number, patient_first_name, patient_last_name, service_date, service_type, submitted_amount)
+    WHERE claim_status = 'Pending';
+
+-- get_claim_by_patient_id (newest service first), the matching engine's patient
+-- block and the duplicate scan's self-join: patient_id with a service_date range
+CREATE INDEX IF NOT EXISTS idx_tanzania_claims_patient_id_service_date
+    ON tanzania_claims(patient_id, service_date);
+
+-- Made redundant: claim_number is already indexed by its UNIQUE constraint, and
+-- the two single-column indexes are prefixes of the composites above
+DROP INDEX IF EXISTS idx_tanzania_claims_claim_number;
+DROP INDEX IF EXISTS idx_tanzania_claims_patient_id;
+DROP INDEX IF EXISTS idx_tanzania_claims_claim_status;
+
+ANALYZE tanzania_claims;
+
+-- On a fresh database every earlier script has just run in order
+INSERT INTO schema_migrations (version) VALUES
+    ('03_claim_change_notify'),
+    ('04_claims_summary'),
+    ('05_claim_matching_indexes'),
+    ('06_claim_duplicates'),
+    ('07_tool_query_indexes')
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,27 @@
+-- Fuzzy and full-text search behind the search_claims tool (claims-rec-mcp/queries.py).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Everything searchable as words: patient and provider names weigh most, then
+-- diagnosis and service text, then reviewer notes. Kept by the database on every write.
+ALTER TABLE tanzania_claims ADD COLUMN IF NOT EXISTS search_document tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(patient_first_name, '') || ' ' || coalesce(patient_last_name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(provider_name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(diagnosis_description, '') || ' ' || coalesce(service_description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(notes, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_tanzania_claims_search_document
+    ON tanzania_claims USING gin (search_document);
+
+-- Misspelled or partial names (OCR output): trigram word similarity. The patient
+-- name expression must match the one in queries.SEARCH_CLAIMS exactly.
+CREATE INDEX IF NOT EXISTS idx_tanzania_claims_patient_name_trgm
+    ON tanzania_claims USING gin ((coalesce(patient_first_name, '') || ' ' || coalesce(patient_last_name, '')) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_tanzania_claims_provider_name_trgm
+    ON tanzania_claims USING gin (provider_name gin_trgm_ops);
+
+ANALYZE tanzania_claims;
+
+INSERT INTO schema_migrations (version) VALUES ('08_claim_search') ON CONFLICT DO NOTHING;
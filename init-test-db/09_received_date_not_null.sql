@@ -0,0 +1,11 @@
+-- The listing tools page on the keyset (received_date, claim_id). A NULL
+-- received_date breaks it: the row comparison is NULL, so such claims never
+-- appear after the first page, and a cursor taken from one matches nothing.
+-- Claims without one were received when they were created.
+UPDATE tanzania_claims
+SET received_date = coalesce(created_at::date, CURRENT_DATE)
+WHERE received_date IS NULL;
+
+ALTER TABLE tanzania_claims ALTER COLUMN received_date SET NOT NULL;
+
+INSERT INTO schema_migrations (version) VALUES ('09_received_date_not_null') ON CONFLICT DO NOTHING;
@@ -0,0 +1,68 @@
+-- Replaces the per-row tanzania_claims_changed trigger from 03 with
+-- statement-level ones: a bulk update or load sends one notification per
+-- statement instead of one per row. The payload lists every claim number and
+-- patient ID the statement touched, old and new, in case either moved. A
+-- statement touching more than 200 claims, or whose lists would not fit in a
+-- NOTIFY payload (8000 bytes), sends {"flush": true} and listeners drop
+-- everything they cache instead.
+CREATE OR REPLACE FUNCTION notify_tanzania_claims_changed() RETURNS trigger AS $$
+DECLARE
+    changes TEXT;
+    touched BIGINT;
+    payload TEXT;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('tanzania_claims_changed', json_build_object('op', TG_OP, 'truncate', true)::text);
+        RETURN NULL;
+    END IF;
+
+    -- Only the transition tables of the firing event exist, so the source is chosen per event
+    changes := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT claim_number, patient_id FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT claim_number, patient_id FROM old_rows'
+        ELSE 'SELECT claim_number, patient_id FROM new_rows UNION ALL SELECT claim_number, patient_id FROM old_rows'
+    END;
+
+    EXECUTE format('SELECT count(*) FROM %I', CASE TG_OP WHEN 'DELETE' THEN 'old_rows' ELSE 'new_rows' END) INTO touched;
+    IF touched = 0 THEN
+        RETURN NULL;
+    END IF;
+
+    IF touched <= 200 THEN
+        EXECUTE format($sql$
+            SELECT json_build_object(
+                'op', %L,
+                'claim_numbers', (SELECT json_agg(DISTINCT claim_number) FROM (%s) changes),
+                'patient_ids', (SELECT json_agg(DISTINCT patient_id) FROM (%s) changes)
+            )::text
+        $sql$, TG_OP, changes, changes) INTO payload;
+    END IF;
+
+    IF payload IS NULL OR octet_length(payload) >= 8000 THEN
+        payload := json_build_object('op', TG_OP, 'flush', true, 'rows', touched)::text;
+    END IF;
+
+    PERFORM pg_notify('tanzania_claims_changed', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tanzania_claims_changed ON tanzania_claims;
+
+-- Transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS tanzania_claims_changed_insert ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_changed_insert
+    AFTER INSERT ON tanzania_claims REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_tanzania_claims_changed();
+
+DROP TRIGGER IF EXISTS tanzania_claims_changed_update ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_changed_update
+    AFTER UPDATE ON tanzania_claims REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_tanzania_claims_changed();
+
+DROP TRIGGER IF EXISTS tanzania_claims_changed_delete ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_changed_delete
+    AFTER DELETE ON tanzania_claims REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_tanzania_claims_changed();
+
+INSERT INTO schema_migrations (version) VALUES ('10_claim_change_notify_statement') ON CONFLICT DO NOTHING;
@@ -0,0 +1,128 @@
+-- Coarser rollups behind summarize_claims. tanzania_claims_summary is keyed on
+-- all six dimensions, so with varied data it approaches one row per claim and
+-- every summary reads most of it. tanzania_claims_rollup keeps one grouping
+-- set per combination of at most two of scheme, region, provider type and
+-- service type, each keyed on status and kept both with and without the
+-- service month. Its size is bounded by the distinct values of those few
+-- columns, not by the number of claims. The rollup column is the GROUPING()
+-- mask of the optional dimensions (16 = service month, 8 = scheme, 4 = region,
+-- 2 = provider type, 1 = service type; a set bit means the dimension is rolled
+-- up and NULL). Summaries that filter or group on three or more of the four
+-- still read tanzania_claims_summary.
+CREATE TABLE IF NOT EXISTS tanzania_claims_rollup (
+    rollup SMALLINT NOT NULL,
+    claim_status VARCHAR(20),
+    service_month DATE,
+    insurance_scheme VARCHAR(100),
+    patient_region VARCHAR(50),
+    provider_type VARCHAR(100),
+    service_type VARCHAR(100),
+    claim_count BIGINT NOT NULL DEFAULT 0,
+    submitted_amount NUMERIC(18,2) NOT NULL DEFAULT 0,
+    allowed_amount NUMERIC(18,2) NOT NULL DEFAULT 0,
+    paid_amount NUMERIC(18,2) NOT NULL DEFAULT 0
+);
+
+-- Leads with rollup so each summary reads only its own grouping set
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tanzania_claims_rollup_key ON tanzania_claims_rollup
+    (rollup, claim_status, service_month, insurance_scheme, patient_region, provider_type, service_type) NULLS NOT DISTINCT;
+
+-- Signed per-group totals of a change set for every rollup, grouped over `changes`
+CREATE OR REPLACE FUNCTION tanzania_claims_rollup_totals(changes TEXT) RETURNS TEXT AS $$
+    SELECT format($sql$
+        SELECT
+            GROUPING(service_month, insurance_scheme, patient_region, provider_type, service_type) AS rollup,
+            claim_status, service_month, insurance_scheme, patient_region, provider_type, service_type,
+            sum(sign) AS claim_count,
+            sum(sign * COALESCE(submitted_amount, 0)) AS submitted_amount,
+            sum(sign * COALESCE(allowed_amount, 0)) AS allowed_amount,
+            sum(sign * COALESCE(paid_amount, 0)) AS paid_amount
+        FROM (
+            SELECT *, date_trunc('month', service_date)::date AS service_month FROM (%s) changes
+        ) changes
+        GROUP BY claim_status, CUBE (service_month), GROUPING SETS (
+            (),
+            (insurance_scheme), (patient_region), (provider_type), (service_type),
+            (insurance_scheme, patient_region), (insurance_scheme, provider_type), (insurance_scheme, service_type),
+            (patient_region, provider_type), (patient_region, service_type), (provider_type, service_type)
+        )
+    $sql$, changes);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Same delta upsert as 04, in key order so concurrent statements lock rollup rows in the same order
+CREATE OR REPLACE FUNCTION apply_tanzania_claims_rollup_delta() RETURNS trigger AS $$
+DECLARE
+    changes TEXT;
+BEGIN
+    -- Only the transition tables of the firing event exist, so the source is chosen per event
+    changes := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS sign, * FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT -1 AS sign, * FROM old_rows'
+        ELSE 'SELECT 1 AS sign, * FROM new_rows UNION ALL SELECT -1 AS sign, * FROM old_rows'
+    END;
+
+    EXECUTE format($sql$
+        WITH deltas AS (%s)
+        INSERT INTO tanzania_claims_rollup AS s (
+            rollup, claim_status, service_month, insurance_scheme, patient_region, provider_type, service_type,
+            claim_count, submitted_amount, allowed_amount, paid_amount
+        )
+        SELECT * FROM deltas
+        -- Updates that leave status, dimensions and amounts alone (e.g. notes) change nothing
+        WHERE claim_count <> 0 OR submitted_amount <> 0 OR allowed_amount <> 0 OR paid_amount <> 0
+        ORDER BY 1, 2, 3, 4, 5, 6, 7
+        ON CONFLICT (rollup, claim_status, service_month, insurance_scheme, patient_region, provider_type, service_type)
+        DO UPDATE SET
+            claim_count = s.claim_count + EXCLUDED.claim_count,
+            submitted_amount = s.submitted_amount + EXCLUDED.submitted_amount,
+            allowed_amount = s.allowed_amount + EXCLUDED.allowed_amount,
+            paid_amount = s.paid_amount + EXCLUDED.paid_amount
+    $sql$, tanzania_claims_rollup_totals(changes));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recomputes the rollups from scratch, for the initial load or to repair drift.
+CREATE OR REPLACE FUNCTION rebuild_tanzania_claims_rollup() RETURNS void AS $$
+BEGIN
+    LOCK TABLE tanzania_claims IN SHARE MODE;
+    DELETE FROM tanzania_claims_rollup;
+    EXECUTE format(
+        'INSERT INTO tanzania_claims_rollup SELECT * FROM (%s) totals',
+        tanzania_claims_rollup_totals('SELECT 1 AS sign, * FROM tanzania_claims')
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION clear_tanzania_claims_rollup() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM tanzania_claims_rollup;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS tanzania_claims_rollup_insert ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_rollup_insert
+    AFTER INSERT ON tanzania_claims REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tanzania_claims_rollup_delta();
+
+DROP TRIGGER IF EXISTS tanzania_claims_rollup_update ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_rollup_update
+    AFTER UPDATE ON tanzania_claims REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tanzania_claims_rollup_delta();
+
+DROP TRIGGER IF EXISTS tanzania_claims_rollup_delete ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_rollup_delete
+    AFTER DELETE ON tanzania_claims REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tanzania_claims_rollup_delta();
+
+DROP TRIGGER IF EXISTS tanzania_claims_rollup_truncate ON tanzania_claims;
+CREATE TRIGGER tanzania_claims_rollup_truncate
+    AFTER TRUNCATE ON tanzania_claims
+    FOR EACH STATEMENT EXECUTE FUNCTION clear_tanzania_claims_rollup();
+
+SELECT rebuild_tanzania_claims_rollup();
+ANALYZE tanzania_claims_rollup;
+
+INSERT INTO schema_migrations (version) VALUES ('11_claims_summary_rollups') ON CONFLICT DO NOTHING;
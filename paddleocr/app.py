@@ -1,36 +1,462 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
 import base64
+import itertools
+import json
 import tempfile
 import os
-from paddleocr import PPStructureV3
+import time
+from documents import DocumentError, decode_base64, load_pages, PDF_DPI
+from pipelines import document_cache_key, get_pool, pools, load_pools_in_background, pools_ready, predict_pages, PoolNotReady, UnknownProfile, OCR_BATCH_SIZE
+from jobs import job_queue, QueueFull
+from cache import result_cache
+import metrics
 
-app = FastAPI()
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+OCR_MAX_UPLOAD_MB = int(os.getenv("OCR_MAX_UPLOAD_MB", "50"))
+MAX_UPLOAD_BYTES = OCR_MAX_UPLOAD_MB * 1024 * 1024
+# Room for part headers, boundaries and small form fields around the file in a multipart body
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load off the event loop so /health can report progress meanwhile
+    load_pools_in_background()
+    job_queue.start()
+    yield
+    job_queue.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+@app.middleware("http")
+async def time_ocr_requests(request: Request, call_next):
+    """Per-request stage timings for /process* endpoints; X-OCR-Profile: 1 also records a cProfile trace."""
+    if not request.url.path.startswith("/process"):
+        return await call_next(request)
+    timer = metrics.start(request.url.path, profile=request.headers.get("x-ocr-profile") == "1")
+    status = 500
+    try:
+        with metrics.activate(timer):
+            response = await call_next(request)
+        status = response.status_code
+    finally:
+        if not timer.deferred:
+            metrics.finish(timer, status)
+    response.headers["X-Request-Id"] = timer.id
+    if not timer.deferred:
+        response.headers["Server-Timing"] = timer.server_timing()
+        if timer.profile_path:
+            response.headers["X-OCR-Profile-Path"] = timer.profile_path
+    return response
 
 class ImageRequest(BaseModel):
     image: str  # base64
+    profile: Optional[str] = None  # OCR profile, defaults to OCR_DEFAULT_PROFILE
+
+class BatchRequest(BaseModel):
+    images: List[str] = []  # base64 images and/or PDFs, pages are returned in this order
+    pdf: Optional[str] = None  # base64 PDF, appended after images
+    dpi: int = PDF_DPI
+    batch_size: Optional[int] = None
+    profile: Optional[str] = None
+
+def _ocr_documents(documents: list, dpi: int, batch_size: int, profile: Optional[str] = None) -> list:
+    """OCR raw documents, serving whole documents from the result cache where possible."""
+    pending = []
+    pages = []
+    for data in documents:
+        key = document_cache_key(data, dpi, profile)
+        cached = result_cache.get(key)
+        if cached is None:
+            with metrics.stage("decode"):
+                document_pages = load_pages(data, dpi)
+            pending.append((key, None, len(pages), len(document_pages)))
+            pages.extend(document_pages)
+        else:
+            pending.append((key, cached, 0, 0))
+
+    predicted = predict_pages(pages, batch_size, profile=profile)
+
+    results = []
+    for key, cached, start, count in pending:
+        if cached is not None:
+            results.extend({"markdown": markdown, "seconds": 0.0, "cached": True} for markdown in cached)
+            continue
+        document_results = predicted[start:start + count]
+        result_cache.put(key, [page["markdown"] for page in document_results])
+        results.extend(dict(page, cached=False) for page in document_results)
+    for number, page in enumerate(results, start=1):
+        page["page"] = number
+    cached_pages = sum(1 for page in results if page["cached"])
+    metrics.count_pages(cached_pages, cached=True)
+    metrics.count_pages(len(results) - cached_pages)
+    return results
+
+@app.get("/health")
+def health():
+    status = {
+        "ready": pools_ready(),
+        "default_profile": get_pool().profile,
+        "profiles": {name: pool.status() for name, pool in pools.items()},
+        "cache": result_cache.stats(),
+    }
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats()
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Request, page and stage metrics plus RSS, in-flight requests, pipeline and job queue gauges."""
+    return Response(metrics.render(pools, job_queue.counts()), media_type="text/plain; version=0.0.4")
+
+class _FirstFilePart:
+    """Multipart parser callbacks that keep the first file part in memory and skip everything else."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.found = False
+        self.done = False
+        self._in_file = False
+        self._header = b""
+        self._value = b""
+        self._disposition = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field,
+            "on_header_value": self._header_value,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self):
+        self._disposition = b""
+
+    def _header_field(self, data, start, end):
+        self._header += data[start:end]
+
+    def _header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _header_end(self):
+        if self._header.lower() == b"content-disposition":
+            self._disposition = self._value
+        self._header = self._value = b""
+
+    def _headers_finished(self):
+        self._in_file = not self.found and b"filename=" in self._disposition
+        self.found = self.found or self._in_file
+
+    def _part_data(self, data, start, end):
+        if self._in_file:
+            self.data += data[start:end]
+
+    def _part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self.done = True
+
+
+async def _read_multipart(request: Request) -> bytes:
+    # Parsed as it arrives rather than through request.form(), which spools the
+    # whole part to a temp file before its size can be checked
+    _, options = parse_options_header(request.headers["content-type"])
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Multipart body has no boundary")
+    part = _FirstFilePart()
+    parser = MultipartParser(boundary, part.callbacks())
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        parser.write(chunk)
+        if len(part.data) > MAX_UPLOAD_BYTES or received > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {OCR_MAX_UPLOAD_MB} MB")
+        if part.done:
+            break
+    else:
+        parser.finalize()
+    if not part.found:
+        raise HTTPException(status_code=422, detail="Multipart body has no file part")
+    return bytes(part.data)
+
+async def _read_upload(request: Request) -> bytes:
+    """Read the document from a raw body or the first multipart file, enforcing the size cap."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {OCR_MAX_UPLOAD_MB} MB")
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        data = await _read_multipart(request)
+    else:
+        body = bytearray()
+        async for chunk in request.stream():
+            body.extend(chunk)
+            if len(body) > MAX_UPLOAD_BYTES:
+                break
+        data = bytes(body)
+
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {OCR_MAX_UPLOAD_MB} MB")
+    if not data:
+        raise HTTPException(status_code=422, detail="Empty upload")
+    return data
 
 @app.post("/process")
 def process_image(req: ImageRequest):
+    temp_file_path = None
     try:
         encoded_string = req.image
+        with metrics.stage("decode"):
+            data = base64.b64decode(encoded_string)
+
+        pool = get_pool(req.profile)
+        cache_key = document_cache_key(data, PDF_DPI, req.profile)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            metrics.count_pages(len(cached), cached=True)
+            return {"markdown": cached, "cached": True}
+
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
+            temp_file_path = temp_file.name
+            temp_file.write(data)
+
+        with pool.borrow() as pipeline:
+            output = pipeline.predict(temp_file_path)
 
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-        temp_file_path = temp_file.name
+            markdowns = []
+            for res in output:
+                markdown_content = pool.to_markdown(res)
+                markdowns.append(markdown_content)
+
+        result_cache.put(cache_key, markdowns)
+        metrics.count_pages(len(markdowns))
+        return {"markdown": markdowns, "cached": False}
+    except UnknownProfile as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except PoolNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if temp_file_path:
+            try:
+                os.remove(temp_file_path)
+            except OSError:
+                pass
 
-        with open(temp_file_path, "wb") as f:
-            f.write(base64.b64decode(encoded_string))
+@app.post("/process/upload")
+async def process_upload(request: Request, dpi: int = PDF_DPI, profile: Optional[str] = None):
+    """OCR a document sent as raw bytes or multipart/form-data, decoded straight to numpy in memory."""
+    data = await _read_upload(request)
+    try:
+        results = await run_in_threadpool(_ocr_documents, [data], dpi, OCR_BATCH_SIZE, profile)
+    except UnknownProfile as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except DocumentError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "markdown": [page["markdown"] for page in results],
+        "pages": results,
+        "cached": bool(results) and all(page["cached"] for page in results),
+        "timings": metrics.stage_summary(),
+    }
 
-        pipeline = PPStructureV3(lang="en")
-        output = pipeline.predict(temp_file_path)
+@app.post("/process/batch")
+def process_batch(req: BatchRequest):
+    try:
+        started = time.perf_counter()
+        documents = list(req.images)
+        if req.pdf:
+            documents.append(req.pdf)
+        if not documents:
+            raise HTTPException(status_code=422, detail="Provide at least one image or a pdf")
 
-        markdowns = []
-        for res in output:
-            markdown_content = res._to_markdown()['markdown_texts']
-            markdowns.append(markdown_content)
+        with metrics.stage("decode"):
+            decoded = [decode_base64(encoded) for encoded in documents]
+        decode_seconds = time.perf_counter() - started
 
-        os.remove(temp_file_path)
+        results = _ocr_documents(decoded, req.dpi, req.batch_size or OCR_BATCH_SIZE, req.profile)
 
-        return {"markdown": markdowns}
+        total_seconds = time.perf_counter() - started
+        return {
+            "markdown": [page["markdown"] for page in results],
+            "pages": results,
+            "page_count": len(results),
+            "cached_pages": sum(1 for page in results if page["cached"]),
+            "decode_seconds": round(decode_seconds, 3),
+            "total_seconds": round(total_seconds, 3),
+            "pages_per_second": round(len(results) / total_seconds, 3) if total_seconds else None,
+            "timings": metrics.stage_summary(),
+        }
+    except HTTPException:
+        raise
+    except (DocumentError, UnknownProfile) as e:
+        raise HTTPException(status_code=400 if isinstance(e, DocumentError) else 422, detail=str(e))
+    except PoolNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/jobs", status_code=202)
+def create_job(req: BatchRequest):
+    documents = list(req.images)
+    if req.pdf:
+        documents.append(req.pdf)
+    if not documents:
+        raise HTTPException(status_code=422, detail="Provide at least one image or a pdf")
+    try:
+        pool = get_pool(req.profile)
+        if pool.state == "failed":
+            raise HTTPException(status_code=503, detail=f"OCR pipeline is {pool.state}")
+        job_id = job_queue.submit([decode_base64(encoded) for encoded in documents], req.dpi, pool.profile)
+    except UnknownProfile as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    except DocumentError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def _stream_events(pool, pages: Optional[list], cache_key: str, cached: Optional[list], timer):
+    """Yield one event per page as soon as the pipeline produces it, then a summary event.
+
+    The response body runs after the request middleware has returned, so the
+    request's timer is finished here; it is activated only around work that
+    does not yield, since each page may be produced on a different thread.
+    """
+    started = time.perf_counter()
+    status = 500
+    try:
+        if cached is not None:
+            for number, markdown in enumerate(cached, start=1):
+                yield "page", {"page": number, "markdown": markdown, "seconds": 0.0, "cached": True}
+            markdowns = cached
+            timer.count_pages(len(cached), cached=True)
+        else:
+            markdowns = []
+            with pool.borrow() as pipeline:
+                last = time.perf_counter()
+                # predict() would recognize every page before returning the first
+                with metrics.activate(timer):
+                    output = pipeline.predict_iter(pages)
+                for number in itertools.count(1):
+                    with metrics.activate(timer):
+                        res = next(output, None)
+                        if res is None:
+                            break
+                        markdown = pool.to_markdown(res)
+                    now = time.perf_counter()
+                    markdowns.append(markdown)
+                    yield "page", {"page": number, "markdown": markdown, "seconds": round(now - last, 3), "cached": False}
+                    last = now
+            result_cache.put(cache_key, markdowns)
+            timer.count_pages(len(markdowns))
+        status = 200
+        yield "done", {
+            "page_count": len(markdowns),
+            "total_seconds": round(time.perf_counter() - started, 3),
+            "timings": timer.summary(),
+        }
+    except GeneratorExit:
+        # closed before the end: the client went away
+        status = 499
+        raise
+    except Exception as e:
+        yield "error", {"detail": str(e)}
+    finally:
+        metrics.finish(timer, status)
+
+class _TimedStreamingResponse(StreamingResponse):
+    """Streams formatted events and finishes their deferred request timer however the response ends.
+
+    A client that disconnects mid-stream leaves the events suspended while they
+    hold a pipeline, so they are closed here. One that disconnects before the
+    body starts means _stream_events never runs and never finishes the timer,
+    and Starlette skips background tasks on a disconnect, so the timer is
+    finished here as 499; finishing an already finished timer does nothing.
+    """
+
+    def __init__(self, timer, events, formatter, **kwargs):
+        super().__init__(formatter(events), **kwargs)
+        self.timer = timer
+        self.events = events
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                self.events.close()
+            except ValueError:
+                pass  # a page is still being recognized on a worker thread; it stops at its next yield
+            metrics.finish(self.timer, 499)
+
+def _format_sse(events):
+    for event, payload in events:
+        yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def _format_ndjson(events):
+    for event, payload in events:
+        yield json.dumps(dict(payload, type=event)) + "\n"
+
+@app.post("/process/stream")
+async def process_stream(request: Request, dpi: int = PDF_DPI, format: str = "sse", profile: Optional[str] = None):
+    """Stream per-page markdown as Server-Sent Events (default) or NDJSON while the document is recognized."""
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=422, detail="format must be 'sse' or 'ndjson'")
+    try:
+        pool = get_pool(profile)
+    except UnknownProfile as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    data = await _read_upload(request)
+
+    cache_key = document_cache_key(data, dpi, profile)
+    cached = result_cache.get(cache_key)
+    pages = None
+    if cached is None:
+        if not pool.ready:
+            raise HTTPException(status_code=503, detail=f"OCR pipeline is {pool.state}")
+        try:
+            pages = await run_in_threadpool(metrics.timed("decode", load_pages), data, dpi)
+        except DocumentError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    timer = metrics.current()
+    timer.deferred = True
+    events = _stream_events(pool, pages, cache_key, cached, timer)
+    if format == "ndjson":
+        return _TimedStreamingResponse(timer, events, _format_ndjson, media_type="application/x-ndjson")
+    return _TimedStreamingResponse(
+        timer,
+        events,
+        _format_sse,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
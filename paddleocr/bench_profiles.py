@@ -0,0 +1,68 @@
+"""Measure throughput and CPU cost of each OCR profile.
+
+Runs every page through each profile in-process (no HTTP) and reports
+pages/sec and CPU-seconds/page, so the cheapest acceptable profile can be chosen:
+
+    python bench_profiles.py ../page.jpg samples/*.pdf --profiles fast_text,tables,full
+"""
+import argparse
+import json
+import os
+import time
+
+
+def bench_profile(profile: str, pages: list, rounds: int) -> dict:
+    from pipelines import PipelinePool, predict_pages, pools
+
+    pool = PipelinePool(profile, size=1)
+    pool.load()
+    pools[profile] = pool
+
+    predict_pages(pages[:1], profile=profile)  # warm-up, first inference allocates buffers
+
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    characters = 0
+    for _ in range(rounds):
+        results = predict_pages(pages, profile=profile)
+        characters += sum(len(page["markdown"]) for page in results)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+    page_count = len(pages) * rounds
+
+    return {
+        "profile": profile,
+        "load_seconds": round(pool.load_seconds, 2),
+        "pages": page_count,
+        "pages_per_second": round(page_count / wall, 3),
+        "cpu_seconds_per_page": round(cpu / page_count, 3),
+        "wall_seconds_per_page": round(wall / page_count, 3),
+        "avg_markdown_chars": round(characters / page_count),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("documents", nargs="*",
+                        default=[os.path.join(os.path.dirname(__file__), "..", "page.jpg")])
+    parser.add_argument("--profiles", default="fast_text,tables,full")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    from documents import load_pages
+
+    pages = []
+    for path in args.documents:
+        with open(path, "rb") as f:
+            pages.extend(load_pages(f.read()))
+
+    results = [bench_profile(profile.strip(), pages, args.rounds) for profile in args.profiles.split(",")]
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
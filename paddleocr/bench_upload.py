@@ -0,0 +1,104 @@
+"""Compare the base64 JSON /process path with the raw-bytes /process/upload path.
+
+Each mode runs in its own process so peak RSS is not shared between them:
+
+    python bench_upload.py --image ../page.jpg --runs 10
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def _sample_peak_rss(process, stop, peak):
+    while not stop.is_set():
+        peak[0] = max(peak[0], process.memory_info().rss)
+        time.sleep(0.005)
+
+
+def run_child(mode: str, image_path: str, runs: int) -> dict:
+    import psutil
+    from fastapi.testclient import TestClient
+    from app import app
+    from pipelines import get_pool
+
+    with open(image_path, "rb") as f:
+        data = f.read()
+
+    with TestClient(app) as client:
+        get_pool().wait_ready()
+
+        def call():
+            if mode == "base64":
+                response = client.post("/process", json={"image": base64.b64encode(data).decode()})
+            else:
+                response = client.post("/process/upload", content=data,
+                                       headers={"content-type": "application/octet-stream"})
+            response.raise_for_status()
+
+        call()  # warm-up, so one-time allocations don't skew the numbers
+        process = psutil.Process()
+        baseline = process.memory_info().rss
+        peak = [baseline]
+        stop = threading.Event()
+        sampler = threading.Thread(target=_sample_peak_rss, args=(process, stop, peak), daemon=True)
+        sampler.start()
+
+        latencies = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - started)
+        stop.set()
+        sampler.join()
+
+    return {
+        "mode": mode,
+        "runs": runs,
+        "payload_bytes": len(base64.b64encode(data)) if mode == "base64" else len(data),
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "latency_mean_ms": round(statistics.fmean(latencies) * 1000, 1),
+        "baseline_rss_mb": round(baseline / 2**20, 1),
+        "peak_rss_mb": round(peak[0] / 2**20, 1),
+        "peak_rss_delta_mb": round((peak[0] - baseline) / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", default=os.path.join(os.path.dirname(__file__), "..", "page.jpg"))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--child", choices=["base64", "upload"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.image, args.runs)))
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            OCR_CACHE_ENABLED="false",
+            OCR_JOB_DB=os.path.join(workdir, "jobs.sqlite3"),
+            OCR_JOB_SPOOL=os.path.join(workdir, "spool"),
+        )
+        results = []
+        for mode in ("base64", "upload"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--image", args.image, "--runs", str(args.runs)],
+                env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
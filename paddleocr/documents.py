@@ -0,0 +1,51 @@
+import base64
+
+import cv2
+import numpy as np
+import pymupdf
+
+PDF_DPI = 200
+
+
+class DocumentError(Exception):
+    pass
+
+
+def is_pdf(data: bytes) -> bool:
+    return data[:5] == b"%PDF-"
+
+
+def decode_base64(encoded: str) -> bytes:
+    if encoded.startswith("data:") and "," in encoded:
+        encoded = encoded.split(",", 1)[1]
+    try:
+        return base64.b64decode(encoded, validate=False)
+    except ValueError as e:
+        raise DocumentError(f"Invalid base64 payload: {e}")
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode encoded image bytes into a BGR array, as PaddleOCR expects."""
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise DocumentError("Could not decode image")
+    return image
+
+
+def rasterize_pdf(data: bytes, dpi: int = PDF_DPI):
+    """Yield one BGR array per PDF page, in page order."""
+    try:
+        doc = pymupdf.open(stream=data, filetype="pdf")
+    except Exception as e:
+        raise DocumentError(f"Could not open PDF: {e}")
+    with doc:
+        for page in doc:
+            pix = page.get_pixmap(dpi=dpi, alpha=False)
+            rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+            yield cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+def load_pages(data: bytes, dpi: int = PDF_DPI) -> list:
+    if is_pdf(data):
+        return list(rasterize_pdf(data, dpi))
+    return [decode_image(data)]
@@ -0,0 +1,276 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+import metrics
+from cache import result_cache
+from documents import load_pages
+from pipelines import document_cache_key, predict_pages, pools, OCR_BATCH_SIZE, OCR_DEFAULT_PROFILE, OCR_POOL_SIZE
+
+OCR_JOB_DB = os.getenv("OCR_JOB_DB", "/var/lib/ocr-jobs/jobs.sqlite3")
+OCR_JOB_SPOOL = os.getenv("OCR_JOB_SPOOL", "/var/lib/ocr-jobs/spool")
+OCR_JOB_WORKERS = int(os.getenv("OCR_JOB_WORKERS", str(OCR_POOL_SIZE)))
+OCR_JOB_QUEUE_MAX = int(os.getenv("OCR_JOB_QUEUE_MAX", "100"))
+OCR_JOB_RETENTION_HOURS = float(os.getenv("OCR_JOB_RETENTION_HOURS", "24"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    dpi INTEGER NOT NULL,
+    profile TEXT,
+    document_count INTEGER NOT NULL,
+    page_count INTEGER,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at);
+CREATE TABLE IF NOT EXISTS job_pages (
+    job_id TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    markdown TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (job_id, page)
+);
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """Persistent OCR job queue: SQLite holds job state, the spool dir holds uploads.
+
+    A fixed number of worker threads drain queued jobs in submission order.
+    Jobs that were running when the process died are re-queued on start.
+    """
+
+    def __init__(self, db_path: str = OCR_JOB_DB, spool_dir: str = OCR_JOB_SPOOL,
+                 workers: int = OCR_JOB_WORKERS, max_pending: int = OCR_JOB_QUEUE_MAX):
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self._claim_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "profile" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN profile TEXT")
+            conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL, pages_done = 0 WHERE status = 'running'")
+            conn.execute("DELETE FROM job_pages WHERE job_id IN (SELECT id FROM jobs WHERE status = 'queued')")
+        self._prune()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"ocr-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def counts(self) -> dict:
+        """Number of retained jobs per status."""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def pending(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def submit(self, documents: list, dpi: int, profile: str = None) -> str:
+        """Spool raw document bytes to disk and enqueue them as one job."""
+        if self.pending() >= self.max_pending:
+            raise QueueFull(f"OCR job queue is full ({self.max_pending} pending)")
+
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(job_dir)
+        for i, data in enumerate(documents):
+            with open(os.path.join(job_dir, f"{i:04d}"), "wb") as f:
+                f.write(data)
+
+        # The check above only saves spooling when the queue is plainly full; this
+        # count and insert are one statement, so concurrent submits cannot overshoot
+        with self._connect() as conn:
+            inserted = conn.execute(
+                "INSERT INTO jobs (id, status, dpi, profile, document_count, created_at) "
+                "SELECT ?, 'queued', ?, ?, ?, ? "
+                "WHERE (SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')) < ?",
+                (job_id, dpi, profile, len(documents), time.time(), self.max_pending),
+            ).rowcount
+        if not inserted:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise QueueFull(f"OCR job queue is full ({self.max_pending} pending)")
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str):
+        with self._connect() as conn:
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            pages = conn.execute(
+                "SELECT page, markdown, seconds FROM job_pages WHERE job_id = ? ORDER BY page", (job_id,)
+            ).fetchall()
+
+        response = {
+            "job_id": job["id"],
+            "status": job["status"],
+            "profile": job["profile"],
+            "page_count": job["page_count"],
+            "pages_done": job["pages_done"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "pages": [dict(page) for page in pages],
+        }
+        if job["status"] == "done":
+            response["markdown"] = [page["markdown"] for page in pages]
+        if job["error"]:
+            response["error"] = job["error"]
+        return response
+
+    def _claim(self):
+        """The oldest queued job whose profile's pipelines are loaded, marked running."""
+        ready = [profile for profile, pool in pools.items() if pool.ready]
+        if not ready:
+            return None
+        with self._claim_lock, self._connect() as conn:
+            # Jobs queued before profiles were recorded use the default one
+            job = conn.execute(
+                "SELECT id, dpi, profile, document_count FROM jobs WHERE status = 'queued' "
+                f"AND COALESCE(profile, ?) IN ({', '.join('?' * len(ready))}) ORDER BY created_at LIMIT 1",
+                (OCR_DEFAULT_PROFILE, *ready),
+            ).fetchone()
+            if job is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job["id"]))
+            return dict(job)
+
+    def _fail_unrunnable(self):
+        """Fail queued jobs whose profile failed to load or is no longer enabled; they would never run."""
+        with self._claim_lock, self._connect() as conn:
+            jobs = conn.execute(
+                "SELECT id, COALESCE(profile, ?) AS profile FROM jobs WHERE status = 'queued'", (OCR_DEFAULT_PROFILE,)
+            ).fetchall()
+            for job in jobs:
+                pool = pools.get(job["profile"])
+                if pool is None:
+                    error = f"OCR profile '{job['profile']}' is not enabled"
+                elif pool.state == "failed":
+                    error = f"OCR profile '{job['profile']}' failed to load: {pool.error}"
+                else:
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                    (error, time.time(), job["id"]),
+                )
+                shutil.rmtree(os.path.join(self.spool_dir, job["id"]), ignore_errors=True)
+
+    def _work(self):
+        # Each job waits only for its own profile's pool, so one profile that is
+        # still loading (or failed) does not hold up jobs for the others
+        while not self._stop.is_set():
+            self._fail_unrunnable()
+            job = self._claim()
+            if job is None:
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: dict):
+        with metrics.track("job") as timer:
+            timer.status = self._run_job(job)
+
+    def _run_job(self, job: dict):
+        job_id = job["id"]
+        job_dir = os.path.join(self.spool_dir, job_id)
+        try:
+            # Documents already in the result cache are not decoded or recognized again
+            pages = []
+            page_numbers = []
+            uncached = []
+            cached_pages = []
+            page_count = 0
+            for i in range(job["document_count"]):
+                with open(os.path.join(job_dir, f"{i:04d}"), "rb") as f:
+                    data = f.read()
+                key = document_cache_key(data, job["dpi"], job["profile"])
+                cached = result_cache.get(key)
+                if cached is not None:
+                    cached_pages.extend(enumerate(cached, start=page_count + 1))
+                    page_count += len(cached)
+                    continue
+                with metrics.stage("decode"):
+                    document_pages = load_pages(data, job["dpi"])
+                uncached.append((key, len(pages), len(document_pages)))
+                page_numbers.extend(range(page_count + 1, page_count + len(document_pages) + 1))
+                pages.extend(document_pages)
+                page_count += len(document_pages)
+            with self._connect() as conn:
+                conn.execute("UPDATE jobs SET page_count = ? WHERE id = ?", (page_count, job_id))
+
+            def record(number, markdown, seconds):
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO job_pages (job_id, page, markdown, seconds) VALUES (?, ?, ?, ?)",
+                        (job_id, number, markdown, seconds),
+                    )
+                    conn.execute("UPDATE jobs SET pages_done = pages_done + 1 WHERE id = ?", (job_id,))
+
+            for number, markdown in cached_pages:
+                record(number, markdown, 0.0)
+            predicted = predict_pages(
+                pages, OCR_BATCH_SIZE, profile=job["profile"],
+                on_page=lambda page: record(page_numbers[page["page"] - 1], page["markdown"], page["seconds"]),
+            )
+            for key, start, count in uncached:
+                result_cache.put(key, [page["markdown"] for page in predicted[start:start + count]])
+            metrics.count_pages(len(cached_pages), cached=True)
+            metrics.count_pages(len(pages))
+            status, error = "done", None
+        except Exception as e:
+            status, error = "failed", str(e)
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+        shutil.rmtree(job_dir, ignore_errors=True)
+        self._prune()
+        return status
+
+    def _prune(self):
+        cutoff = time.time() - OCR_JOB_RETENTION_HOURS * 3600
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM job_pages WHERE job_id IN (SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?)",
+                (cutoff,),
+            )
+            conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,))
+
+
+job_queue = JobQueue()
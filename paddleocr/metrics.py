@@ -0,0 +1,356 @@
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import types
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+import psutil
+
+OCR_TIMING_LOG = os.getenv("OCR_TIMING_LOG", "true").lower() == "true"
+OCR_PROFILING_ENABLED = os.getenv("OCR_PROFILING_ENABLED", "false").lower() == "true"
+OCR_PROFILE_DIR = os.getenv("OCR_PROFILE_DIR", "/tmp/ocr-profiles")
+
+# Stages are decode, preprocessing, layout, recognition, table, pipeline and
+# markdown. Time is exclusive: a stage nested in another (e.g. recognition
+# inside the pipeline) is not counted again in the outer one, so stages add up
+# to the request's busy time. "pipeline" is whatever predict() spends outside
+# the sub-models found below.
+
+# PaddleX sub-models and sub-pipelines by attribute name, for the stages they
+# belong to. Whatever a profile does not load is simply not there.
+COMPONENT_STAGES = {
+    "doc_preprocessor_pipeline": "preprocessing",
+    "layout_det_model": "layout",
+    "region_detection_model": "layout",
+    "general_ocr_pipeline": "recognition",
+    "text_det_model": "recognition",
+    "text_rec_model": "recognition",
+    "textline_orientation_model": "recognition",
+    "table_recognition_pipeline": "table",
+    "table_recognition_model": "table",
+}
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+timing_log = logging.getLogger("paddleocr.timing")
+if OCR_TIMING_LOG and not timing_log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    timing_log.addHandler(_handler)
+    timing_log.setLevel(logging.INFO)
+    timing_log.propagate = False
+
+_process = psutil.Process()
+_lock = threading.Lock()
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name, self.help, self.labels = name, help, labels
+        self._values = {}
+
+    def inc(self, values: tuple, amount: float = 1):
+        with _lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            for values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.labels, values)}}} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series = {}
+
+    def observe(self, values: tuple, value: float):
+        with _lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            for values, (counts, total) in sorted(self._series.items()):
+                labels = _labels(self.labels, values)
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+                lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+requests_total = Counter("ocr_requests_total", "OCR requests and jobs by outcome.", ("endpoint", "status"))
+pages_total = Counter("ocr_pages_total", "Pages returned, cached or recognized.", ("endpoint", "cached"))
+request_seconds = Histogram("ocr_request_seconds", "OCR request or job latency.", ("endpoint",), LATENCY_BUCKETS)
+stage_seconds = Histogram("ocr_stage_seconds", "Time per request spent in each processing stage.", ("stage",), STAGE_BUCKETS)
+
+METRICS = (requests_total, pages_total, request_seconds, stage_seconds)
+
+_in_flight = 0
+
+
+class RequestTimer:
+    """Stage timings, page counts and (optionally) a cProfile trace for one request or job."""
+
+    def __init__(self, endpoint: str, profile: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.pages = 0
+        self.cached_pages = 0
+        self.profile = profile and OCR_PROFILING_ENABLED
+        self.profile_path = None
+        # outcome label for work that is not an HTTP response, e.g. a job's status
+        self.status = None
+        # streaming responses finish after the endpoint returns
+        self.deferred = False
+        self.finished = False
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count_pages(self, pages: int, cached: bool = False):
+        with self._lock:
+            if cached:
+                self.cached_pages += pages
+            else:
+                self.pages += pages
+
+    def summary(self) -> dict:
+        return {stage: round(seconds, 4) for stage, seconds in sorted(self.stages.items())}
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in sorted(self.stages.items()))
+
+
+_current = contextvars.ContextVar("ocr_request_timer", default=None)
+_stacks = threading.local()
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def activate(timer: RequestTimer):
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as `name` for the current request; outer stages do not count it again."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    stack = _stacks.__dict__.setdefault("stack", [])
+    frame = [time.perf_counter(), 0.0]
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        elapsed = time.perf_counter() - frame[0]
+        timer.add(name, elapsed - frame[1])
+        if stack:
+            stack[-1][1] += elapsed
+
+
+@contextmanager
+def _profiled():
+    timer = _current.get()
+    # predict() runs predict_iter(), and both are wrapped; only the outer call profiles
+    if timer is None or not timer.profile or getattr(_stacks, "profiling", False):
+        yield
+        return
+    # cProfile only sees the thread it is enabled in, so each inference thread keeps its own
+    profiler = cProfile.Profile()
+    _stacks.profiling = True
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _stacks.profiling = False
+        with timer._lock:
+            timer._profiles.append(profiler)
+
+
+def _timed_iterator(name: str, iterator, profile: bool):
+    # Only time spent producing each item counts, not the consumer's work between items
+    while True:
+        with stage(name), (_profiled() if profile else nullcontext()):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def timed(name: str, fn, profile: bool = False):
+    """Wrap fn so its calls (and, for generators, its iteration) count towards stage `name`.
+
+    With profile, the work also goes into the request's cProfile trace when one was asked for.
+    """
+    def wrapper(*args, **kwargs):
+        with stage(name), (_profiled() if profile else nullcontext()):
+            result = fn(*args, **kwargs)
+        if isinstance(result, types.GeneratorType):
+            return _timed_iterator(name, result, profile)
+        return result
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def instrument_pipeline(pipeline):
+    """Time a pipeline's predict() / predict_iter() and the PaddleX sub-models it is built from, by stage."""
+    pipeline.predict = timed("pipeline", pipeline.predict, profile=True)
+    if callable(getattr(pipeline, "predict_iter", None)):
+        pipeline.predict_iter = timed("pipeline", pipeline.predict_iter, profile=True)
+    seen = {id(pipeline)}
+    # PaddleOCR wraps a PaddleX pipeline, which may itself wrap the real one
+    candidates = [pipeline, getattr(pipeline, "paddlex_pipeline", None)]
+    candidates.append(getattr(candidates[-1], "_pipeline", None))
+    for owner in candidates:
+        if owner is None:
+            continue
+        for attribute, stage_name in COMPONENT_STAGES.items():
+            component = getattr(owner, attribute, None)
+            if component is None or id(component) in seen:
+                continue
+            seen.add(id(component))
+            # Models are called through apply(), pipelines through predict()
+            for method in ("predict", "apply"):
+                if callable(getattr(component, method, None)):
+                    setattr(component, method, timed(stage_name, getattr(component, method)))
+    return pipeline
+
+
+def count_pages(pages: int, cached: bool = False):
+    timer = _current.get()
+    if timer is not None:
+        timer.count_pages(pages, cached)
+
+
+def stage_summary() -> dict:
+    """Stage timings so far for the current request, for inclusion in a response."""
+    timer = _current.get()
+    return timer.summary() if timer is not None else {}
+
+
+def start(endpoint: str, profile: bool = False) -> RequestTimer:
+    global _in_flight
+    with _lock:
+        _in_flight += 1
+    return RequestTimer(endpoint, profile)
+
+
+def finish(timer: RequestTimer, status) -> RequestTimer:
+    """Record a finished request: counters, histograms, the timing log line and any profile.
+
+    Only the first call for a timer records anything, so a streaming response
+    can be finished both by its body and by a fallback once the response ends.
+    """
+    global _in_flight
+    elapsed = time.perf_counter() - timer.started
+    with _lock:
+        if timer.finished:
+            return timer
+        timer.finished = True
+        _in_flight -= 1
+    requests_total.inc((timer.endpoint, str(status)))
+    request_seconds.observe((timer.endpoint,), elapsed)
+    pages_total.inc((timer.endpoint, "false"), timer.pages)
+    pages_total.inc((timer.endpoint, "true"), timer.cached_pages)
+    for stage_name, seconds in timer.stages.items():
+        stage_seconds.observe((stage_name,), seconds)
+
+    if timer._profiles:
+        os.makedirs(OCR_PROFILE_DIR, exist_ok=True)
+        timer.profile_path = os.path.join(OCR_PROFILE_DIR, f"{timer.endpoint.strip('/').replace('/', '_')}-{timer.id}.prof")
+        stats = pstats.Stats(timer._profiles[0])
+        for profiler in timer._profiles[1:]:
+            stats.add(profiler)
+        stats.dump_stats(timer.profile_path)
+
+    if OCR_TIMING_LOG:
+        timing_log.info(json.dumps({
+            "request_id": timer.id,
+            "endpoint": timer.endpoint,
+            "status": status,
+            "seconds": round(elapsed, 4),
+            "pages": timer.pages,
+            "cached_pages": timer.cached_pages,
+            "pages_per_second": round(timer.pages / elapsed, 3) if timer.pages and elapsed else None,
+            "stages": timer.summary(),
+            "profile": timer.profile_path,
+        }))
+    return timer
+
+
+@contextmanager
+def track(endpoint: str):
+    """Time a unit of work outside HTTP (e.g. a background job) like a request."""
+    timer = start(endpoint)
+    status = None
+    try:
+        with activate(timer):
+            yield timer
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        finish(timer, status or timer.status or "ok")
+
+
+def render(pools: dict, jobs: dict) -> str:
+    """Prometheus text exposition: request/stage metrics plus process, pool and queue gauges."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    gauges = [
+        ("ocr_in_flight_requests", "Requests currently being processed.", (), {(): _in_flight}),
+        ("ocr_process_rss_bytes", "Resident memory of the OCR process.", (), {(): _process.memory_info().rss}),
+        ("ocr_model_load_seconds", "Time taken to load a profile's pipelines.", ("profile",),
+         {(name,): pool.load_seconds for name, pool in pools.items() if pool.load_seconds is not None}),
+        ("ocr_pipelines_available", "Idle pipelines per profile.", ("profile",),
+         {(name,): pool.status()["available"] for name, pool in pools.items()}),
+        ("ocr_pipeline_waiting", "Requests waiting for a free pipeline, per profile.", ("profile",),
+         {(name,): pool.waiting for name, pool in pools.items()}),
+        ("ocr_jobs", "Background jobs by status.", ("status",), {(status,): count for status, count in jobs.items()}),
+    ]
+    for name, help, label_names, values in gauges:
+        lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge"])
+        for label_values, value in values.items():
+            labels = _labels(label_names, label_values)
+            lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,213 @@
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from importlib.metadata import version
+
+from paddleocr import PaddleOCR, PPStructureV3
+
+import metrics
+from cache import result_cache
+from documents import is_pdf
+
+OCR_LANG = os.getenv("OCR_LANG", "en")
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "1"))
+OCR_POOL_TIMEOUT = float(os.getenv("OCR_POOL_TIMEOUT", "300"))
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", str(os.cpu_count() or 1)))
+OCR_PROFILES = [name.strip() for name in os.getenv("OCR_PROFILES", "full").split(",") if name.strip()]
+OCR_DEFAULT_PROFILE = os.getenv("OCR_DEFAULT_PROFILE", OCR_PROFILES[0] if OCR_PROFILES else "full")
+
+
+def _structure_markdown(result) -> str:
+    return result._to_markdown()['markdown_texts']
+
+
+def _plain_text_markdown(result) -> str:
+    return "\n".join(result["rec_texts"])
+
+
+# Each profile is a pipeline class, the sub-modules it enables, and how its results become markdown.
+# fast_text skips layout analysis entirely; tables keeps layout + tables but drops the heavier extras.
+PROFILES = {
+    "full": (PPStructureV3, {}, _structure_markdown),
+    "tables": (PPStructureV3, {
+        "use_doc_orientation_classify": False,
+        "use_doc_unwarping": False,
+        "use_seal_recognition": False,
+        "use_formula_recognition": False,
+        "use_chart_recognition": False,
+        "use_table_recognition": True,
+    }, _structure_markdown),
+    "fast_text": (PaddleOCR, {
+        "use_doc_orientation_classify": False,
+        "use_doc_unwarping": False,
+        "use_textline_orientation": False,
+    }, _plain_text_markdown),
+}
+
+
+class PoolNotReady(Exception):
+    pass
+
+
+class UnknownProfile(ValueError):
+    pass
+
+
+class PipelinePool:
+    """A fixed set of warm pipeline instances for one profile that requests borrow and return."""
+
+    def __init__(self, profile: str = "full", size: int = OCR_POOL_SIZE, lang: str = OCR_LANG):
+        if profile not in PROFILES:
+            raise UnknownProfile(f"Unknown OCR profile '{profile}', expected one of {sorted(PROFILES)}")
+        self.profile = profile
+        self.pipeline_class, self.options, to_markdown = PROFILES[profile]
+        self.to_markdown = metrics.timed("markdown", to_markdown)
+        self.size = max(1, size)
+        self.lang = lang
+        self.state = "idle"
+        self.error = None
+        self.load_seconds = None
+        self.waiting = 0
+        # Identifies everything that changes OCR output, used to key cached results
+        self.config_key = (
+            f"{self.pipeline_class.__name__};profile={profile};lang={lang};"
+            f"paddleocr={version('paddleocr')};paddlex={version('paddlex')}"
+        )
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+
+    def load(self):
+        with self._lock:
+            if self.state in ("loading", "ready"):
+                return
+            self.state = "loading"
+        started = time.perf_counter()
+        try:
+            for _ in range(self.size):
+                self._idle.put(metrics.instrument_pipeline(self.pipeline_class(lang=self.lang, **self.options)))
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            raise
+        self.load_seconds = time.perf_counter() - started
+        self.state = "ready"
+        self._loaded.set()
+
+    def load_in_background(self):
+        thread = threading.Thread(target=self._load_quietly, name=f"ocr-pipeline-loader-{self.profile}", daemon=True)
+        thread.start()
+        return thread
+
+    def _load_quietly(self):
+        try:
+            self.load()
+        except Exception:
+            pass
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._loaded.wait(timeout)
+
+    @contextmanager
+    def borrow(self, timeout: float = OCR_POOL_TIMEOUT):
+        if not self.ready:
+            raise PoolNotReady(f"OCR pipeline is {self.state}")
+        with self._lock:
+            self.waiting += 1
+        try:
+            pipeline = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolNotReady(f"No OCR pipeline free after {timeout}s")
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        try:
+            yield pipeline
+        finally:
+            self._idle.put(pipeline)
+
+    def status(self) -> dict:
+        return {
+            "profile": self.profile,
+            "state": self.state,
+            "lang": self.lang,
+            "size": self.size,
+            "available": self._idle.qsize(),
+            "waiting": self.waiting,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+pools = {
+    profile: PipelinePool(profile, int(os.getenv(f"OCR_POOL_SIZE_{profile.upper()}", OCR_POOL_SIZE)))
+    for profile in OCR_PROFILES
+}
+
+
+def get_pool(profile: str = None) -> PipelinePool:
+    profile = profile or OCR_DEFAULT_PROFILE
+    if profile not in pools:
+        raise UnknownProfile(f"OCR profile '{profile}' is not enabled, expected one of {sorted(pools)}")
+    return pools[profile]
+
+
+def load_pools_in_background():
+    for pool in pools.values():
+        pool.load_in_background()
+
+
+def pools_ready() -> bool:
+    return all(pool.ready for pool in pools.values())
+
+
+def predict_pages(pages: list, batch_size: int = OCR_BATCH_SIZE, on_page=None, profile: str = None) -> list:
+    """Run pages through the profile's pool in batches, one batch per free pipeline.
+
+    Returns one {"page", "markdown", "seconds"} entry per input page, in input order.
+    `on_page` is called with each entry as soon as its page is recognized.
+    """
+    pool = get_pool(profile)
+    batch_size = max(1, batch_size)
+    batches = [(start, pages[start:start + batch_size]) for start in range(0, len(pages), batch_size)]
+    results = [None] * len(pages)
+
+    def run(start, batch):
+        with pool.borrow() as pipeline:
+            last = time.perf_counter()
+            # predict() collects predict_iter() into a list; iterating reports each page as it is done
+            for offset, res in enumerate(pipeline.predict_iter(batch)):
+                markdown = pool.to_markdown(res)
+                now = time.perf_counter()
+                results[start + offset] = {
+                    "page": start + offset + 1,
+                    "markdown": markdown,
+                    "seconds": round(now - last, 3),
+                }
+                last = now
+                if on_page:
+                    on_page(results[start + offset])
+
+    if not batches:
+        return results
+    with ThreadPoolExecutor(max_workers=min(pool.size, len(batches))) as executor:
+        # Each batch runs in the caller's context so its stage timings reach the caller's request
+        for future in [executor.submit(contextvars.copy_context().run, run, start, batch) for start, batch in batches]:
+            future.result()
+    return results
+
+
+def document_cache_key(data: bytes, dpi: int, profile: str = None) -> str:
+    """Result cache key for a whole document under a profile's pipeline config (and dpi, for PDFs)."""
+    config = get_pool(profile).config_key
+    if is_pdf(data):
+        config += f";dpi={dpi}"
+    return result_cache.key(data, config)